@@ -1,173 +1,237 @@
 import streamlit as st
 import pandas as pd
-from datetime import date, datetime, timedelta
-import pytz
+from dataclasses import dataclass
+from datetime import date, timedelta
+from types import MappingProxyType
+import threading
+import time
 
 from gdrive.gdrive_upload import GoogleDriveUploader
-from gdrive.config import USERS_SHEET_NAME, ACCESS_REQUESTS_SHEET_NAME
+from gdrive.config import (
+    USERS_SHEET_NAME, USERS_CACHE_TTL_SECONDS, USERS_REFRESH_INTERVAL_SECONDS,
+    is_simulated_login_allowed
+)
+from gdrive import cache_backend
+from gdrive.single_flight import SharedCache
+from gdrive.sheet_schema import USERS_SCHEMA
 
+# Dados da sessão que pertencem ao usuário logado (descartados quando outro usuário entra)
+USER_SESSION_KEYS = (
+    'historico_avaliacoes', 'avaliacao_selecionada', 'avaliacao_realizada', 'dados_avaliacao',
+    'calculo_realizado', 'dados_calculo', 'admin_section_data',
+)
+
+# Diretório de usuários compartilhado por todas as sessões do processo (e pelas réplicas, com o cache em disco)
+_users_cache = SharedCache(ttl=USERS_CACHE_TTL_SECONDS, name="usuarios", backend=cache_backend.get_backend())
+USERS_REFRESHER_THREAD_NAME = "atualizador-usuarios"
+
+
+def _simulated_user():
+    """
+    Usuário simulado em st.session_state['usuario_simulado'] ({'email', 'nome'}), usado pelo
+    teste de carga (utils/teste_carga.py). Só é aceito com o backend fake das APIs do Google
+    e com a variável RQ12BR_ALLOW_SIMULATED_LOGIN=1 (ver gdrive/config.py).
+    """
+    simulated = st.session_state.get('usuario_simulado')
+    if simulated and is_simulated_login_allowed():
+        return simulated
+    return None
 
 def is_oidc_available():
     try: return hasattr(st.user, 'is_logged_in')
     except Exception: return False
 
 def is_user_logged_in():
+    if _simulated_user(): return True
     try: return st.user.is_logged_in
     except Exception: return False
 
-def is_superuser() -> bool:
+def _is_superuser_email(user_email) -> bool:
     try:
-        user_email = get_user_email()
         superuser_email = st.secrets["superuser"]["admin_email"].lower().strip()
         return user_email is not None and user_email == superuser_email
     except (KeyError, AttributeError):
         return False
 
+def is_superuser() -> bool:
+    context = get_user_context()
+    return context is not None and context.is_superuser
+
 def get_user_display_name():
     try:
         if is_superuser(): return "Desenvolvedor (Mestre)"
+        if _simulated_user(): return _simulated_user()['nome']
         if hasattr(st.user, 'name') and st.user.name: return st.user.name
         elif hasattr(st.user, 'email'): return st.user.email
         return "Usuário Anônimo"
     except Exception: return "Usuário Anônimo"
 
 def get_user_email() -> str | None:
+    simulated = _simulated_user()
+    if simulated: return simulated['email'].lower().strip()
     try:
         if hasattr(st.user, 'email') and st.user.email: return st.user.email.lower().strip()
         return None
     except Exception: return None
 
-def normalize_dataframe_columns(df, expected_columns):
+class UsersDirectory:
     """
-    Normaliza um DataFrame para ter as colunas esperadas, preenchendo com valores padrão
+    Usuários cadastrados indexados por email, com o número da linha de cada um
+    na aba de usuários (buscas O(1), sem varrer o DataFrame).
     """
-    if df.empty:
-        # Se o DataFrame está vazio, cria com as colunas esperadas
-        return pd.DataFrame(columns=expected_columns)
-    
-    # ADICIONAR: Validar se as colunas essenciais existem
-    essential_cols = ['email', 'nome', 'status']
-    missing_essential = [col for col in essential_cols if col not in df.columns]
-    
-    if missing_essential:
-        st.error(f"Colunas essenciais ausentes na planilha: {missing_essential}")
-        return pd.DataFrame(columns=expected_columns)
-    
-    # Adiciona colunas faltantes com valores padrão
-    for col in expected_columns:
-        if col not in df.columns:
-            if col == 'email':
-                df[col] = ''
-            elif col == 'nome':
-                df[col] = 'Nome não informado'
-            elif col == 'role':
-                df[col] = 'viewer'
-            elif col == 'plano':
-                df[col] = 'basico'
-            elif col == 'status':
-                df[col] = 'inativo'
-            elif col in ['spreadsheet_id', 'folder_id']:
-                df[col] = ''
-            elif col == 'data_cadastro':
-                df[col] = date.today().isoformat()
-            elif col == 'trial_end_date':
-                df[col] = None
-            elif col in ['telefone', 'empresa', 'cargo']:
-                df[col] = ''
-            else:
-                df[col] = ''
-    
-    # Reordena as colunas para corresponder à ordem esperada
-    df = df[expected_columns]
-    
-    return df
 
-@st.cache_data(ttl=600, show_spinner="Verificando permissões...")
+    def __init__(self, users_df, sheet_rows):
+        self._df = users_df.reset_index(drop=True)
+        self._records = {}
+        self._rows = {}
+        for record, row_number in zip(self._df.to_dict('records'), sheet_rows):
+            # Emails repetidos: vale a primeira linha, como na busca anterior por máscara
+            if record['email'] not in self._records:
+                self._records[record['email']] = record
+                self._rows[record['email']] = row_number
+
+    def get(self, email):
+        """Retorna uma cópia do registro do usuário (ou None se o email não está cadastrado)."""
+        record = self._records.get(email)
+        return dict(record) if record is not None else None
+
+    def row_number(self, email):
+        """Número da linha do usuário na aba de usuários (1 = cabeçalho), ou None."""
+        return self._rows.get(email)
+
+    def emails(self):
+        return list(self._records)
+
+    def __contains__(self, email):
+        return email in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+    def to_dataframe(self):
+        """Cópia do DataFrame de usuários (índice 0..n-1)."""
+        return self._df.copy()
+
+def invalidate_users_cache():
+    """
+    Descarta apenas os dados de usuários em cache (após gravar na aba de usuários),
+    sem afetar os demais dados em cache no servidor.
+    """
+    _users_cache.invalidate(USERS_SHEET_NAME)
+    reset_user_context()
+
+def clear_user_session_data():
+    """Remove da sessão os dados do usuário anterior quando outro usuário entra."""
+    for key in USER_SESSION_KEYS:
+        st.session_state.pop(key, None)
+    reset_user_context()
+
 def get_users_data():
+    """Retorna uma cópia do DataFrame de usuários cadastrados."""
+    return get_users_directory().to_dataframe()
+
+def get_users_directory():
     """
-    Carrega dados de usuários com tratamento robusto de erros e estrutura de colunas
+    Usuários cadastrados indexados por email (UsersDirectory), compartilhados entre as sessões.
+    Leituras simultâneas da aba viram uma só e, com o cache aquecido, os dados
+    vencidos são servidos enquanto a releitura acontece em segundo plano.
     """
-    # Estrutura esperada da planilha de usuários
-    expected_columns = [
-        'email', 'nome', 'role', 'plano', 'status', 
-    'spreadsheet_id', 'folder_id', 'data_cadastro', 'trial_end_date',
-    'telefone', 'empresa', 'cargo'
-    ]
-    
     try:
-        uploader = GoogleDriveUploader(is_matrix=True)
-        users_data = uploader.get_data_from_sheet(USERS_SHEET_NAME)
-        
-        if not users_data:
-            st.warning("Planilha de usuários não encontrada ou vazia.")
-            return pd.DataFrame(columns=expected_columns)
-        
-        if len(users_data) < 2:
-            st.warning("Planilha de usuários não contém dados (apenas cabeçalho).")
-            return pd.DataFrame(columns=expected_columns)
-        
-        # Pega o cabeçalho (primeira linha) e os dados (resto)
-        header = users_data[0]
-        data_rows = users_data[1:]
-        
-        # Remove linhas completamente vazias
-        data_rows = [row for row in data_rows if any(cell for cell in row if str(cell).strip())]
-        
-        if not data_rows:
-            st.warning("Planilha de usuários não contém dados válidos.")
-            return pd.DataFrame(columns=expected_columns)
-        
-        # Ajusta o número de colunas nos dados para corresponder ao cabeçalho
-        max_columns = len(header)
-        normalized_rows = []
-        
-        for row in data_rows:
-            # Garante que a linha tenha o mesmo número de colunas do cabeçalho
-            normalized_row = list(row)
-            
-            # Se a linha tem menos colunas, preenche com strings vazias
-            while len(normalized_row) < max_columns:
-                normalized_row.append('')
-            
-            # Se a linha tem mais colunas, trunca
-            normalized_row = normalized_row[:max_columns]
-            
-            normalized_rows.append(normalized_row)
-        
-        # Cria o DataFrame inicial
-        df = pd.DataFrame(normalized_rows, columns=header)
-        
-        # Limpa e normaliza os dados
-        for col in df.columns:
-            if col in ['email', 'role', 'plano', 'status']:
-                df[col] = df[col].astype(str).str.lower().str.strip()
-        
-        # Trata a coluna de trial_end_date se existir
-        if 'trial_end_date' in df.columns:
-            df['trial_end_date'] = pd.to_datetime(df['trial_end_date'], errors='coerce').dt.date
-        
-        # Normaliza o DataFrame para ter a estrutura esperada
-        df = normalize_dataframe_columns(df, expected_columns)
-        
-        # Remove linhas com email vazio (linhas inválidas)
-        df = df[df['email'].str.len() > 0]
-        
-        return df
-        
+        if _users_cache.contains(USERS_SHEET_NAME):
+            return _users_cache.get(USERS_SHEET_NAME, _load_users_directory)
+        with st.spinner("Verificando permissões..."):
+            return _users_cache.get(USERS_SHEET_NAME, _load_users_directory)
     except Exception as e:
         st.error(f"Erro crítico ao carregar dados de usuários: {e}")
         st.info("Criando DataFrame vazio com estrutura padrão...")
-        return pd.DataFrame(columns=expected_columns)
+        return UsersDirectory(USERS_SCHEMA.empty_frame(), [])
 
-def get_user_info() -> dict | None:
+def get_users_directory_status():
+    """
+    Métricas do diretório de usuários para monitoramento: idade dos dados em memória,
+    duração e erro da última leitura e se o job de atualização está rodando.
+    """
+    status = _users_cache.get_stats(USERS_SHEET_NAME)
+    status['atualizador_ativo'] = any(t.name == USERS_REFRESHER_THREAD_NAME and t.is_alive() for t in threading.enumerate())
+    return status
+
+def _users_refresh_loop():
     """
-    Retorna o registro do usuário. Se for o superusuário, "fabrica" o registro
+    Laço do job que mantém o diretório de usuários em memória: relê a aba quando a
+    versão da planilha matriz muda ou quando os dados atingem a idade máxima.
+    """
+    loaded_version = None
+    while True:
+        try:
+            version = GoogleDriveUploader(is_matrix=True).get_spreadsheet_version()
+            age = _users_cache.get_stats(USERS_SHEET_NAME)['idade_segundos']
+            changed = version is not None and version != loaded_version
+            if age is None or changed or age >= USERS_CACHE_TTL_SECONDS:
+                _users_cache.refresh(USERS_SHEET_NAME, _load_users_directory)
+                loaded_version = version
+        except Exception as e:
+            print(f"⚠️ Aviso: Falha ao atualizar o diretório de usuários: {e}")
+        time.sleep(USERS_REFRESH_INTERVAL_SECONDS)
+
+@st.cache_resource
+def start_users_refresher():
+    """Inicia (uma única vez por processo) a thread que mantém o diretório de usuários atualizado."""
+    thread = threading.Thread(target=_users_refresh_loop, name=USERS_REFRESHER_THREAD_NAME, daemon=True)
+    thread.start()
+    return thread
+
+def _load_users_directory():
+    """
+    Carrega dados de usuários com tratamento robusto de erros e estrutura de colunas
+    e os indexa por email (UsersDirectory)
+    """
+    uploader = GoogleDriveUploader(is_matrix=True)
+    users_data = uploader.get_data_from_sheet(USERS_SHEET_NAME)
+    
+    if not users_data:
+        st.warning("Planilha de usuários não encontrada ou vazia.")
+        return UsersDirectory(USERS_SCHEMA.empty_frame(), [])
+    
+    if len(users_data) < 2:
+        st.warning("Planilha de usuários não contém dados (apenas cabeçalho).")
+        return UsersDirectory(USERS_SCHEMA.empty_frame(), [])
+    
+    # Colunas tipadas e índice = número da linha na planilha (linhas vazias já descartadas)
+    df = USERS_SCHEMA.load(users_data)
+    
+    if df.empty:
+        st.warning("Planilha de usuários não contém dados válidos.")
+        return UsersDirectory(USERS_SCHEMA.empty_frame(), [])
+    
+    # Remove linhas com email vazio (linhas inválidas)
+    df = df[df['email'].str.len() > 0]
+    
+    return UsersDirectory(df, df.index.tolist())
+
+@dataclass(frozen=True)
+class UserContext:
+    """Dados do usuário logado já resolvidos (perfil, plano efetivo, trial e ambiente), imutáveis."""
+    email: str
+    is_superuser: bool
+    record: MappingProxyType | None  # Registro da aba de usuários (None se o usuário não está cadastrado)
+    role: str
+    sheet_plan: str
+    effective_status: str
+    on_trial: bool
+    effective_plan: str
+    trial_end_date: date | None
+    spreadsheet_id: str | None
+    folder_id: str | None
+
+def _find_user_record(user_email, directory):
+    """
+    Retorna o registro do usuário no diretório. Se for o superusuário, "fabrica" o registro
     usando os dados dos segredos, incluindo o ambiente de testes.
     """
-    if is_superuser():
+    if _is_superuser_email(user_email):
         # "Fabrica" um registro de usuário mestre, agora incluindo o ambiente de testes dos segredos.
         return {
-            'email': get_user_email(),
+            'email': user_email,
             'nome': 'Desenvolvedor (Mestre)',
             'role': 'admin',
             'plano': 'premium_ia',
@@ -179,41 +243,83 @@ def get_user_info() -> dict | None:
         }
 
     # Se não for o superusuário, executa a lógica normal.
+    return directory.get(user_email)
+
+def _build_user_context(user_email, directory):
+    record = _find_user_record(user_email, directory)
+    if not record:
+        return UserContext(
+            email=user_email, is_superuser=False, record=None, role='viewer', sheet_plan='nenhum',
+            effective_status='inativo', on_trial=False, effective_plan='nenhum',
+            trial_end_date=None, spreadsheet_id=None, folder_id=None
+        )
+
+    trial_end_date = record.get('trial_end_date')
+    has_trial_date = not pd.isna(trial_end_date)
+    on_trial = has_trial_date and date.today() <= trial_end_date
+
+    sheet_status = record.get('status', 'inativo')
+    effective_status = sheet_status
+    if sheet_status == 'ativo' and has_trial_date and isinstance(trial_end_date, date) and date.today() > trial_end_date:
+        effective_status = 'trial_expirado'
+
+    sheet_plan = record.get('plano', 'nenhum')
+    return UserContext(
+        email=user_email,
+        is_superuser=_is_superuser_email(user_email),
+        record=MappingProxyType(dict(record)),
+        role=record.get('role', 'viewer'),
+        sheet_plan=sheet_plan,
+        effective_status=effective_status,
+        on_trial=on_trial,
+        effective_plan='premium_ia' if on_trial else sheet_plan,
+        trial_end_date=trial_end_date if has_trial_date else None,
+        spreadsheet_id=record.get('spreadsheet_id'),
+        folder_id=record.get('folder_id'),
+    )
+
+def get_user_context() -> UserContext | None:
+    """
+    Retorna o contexto do usuário logado. Ele é derivado do diretório de usuários em cache
+    e fica na sessão junto com o diretório e o dia de que saiu: enquanto o diretório não
+    for recarregado (por outra réplica, pelo job ou após uma gravação) e o dia não virar,
+    é reaproveitado sem refazer a busca.
+    """
     user_email = get_user_email()
     if not user_email: return None
-    users_df = get_users_data()
-    if users_df.empty: return None
-    
-    user_entry = users_df[users_df['email'] == user_email]
-    return user_entry.iloc[0].to_dict() if not user_entry.empty else None
+    directory = None if _is_superuser_email(user_email) else get_users_directory()
+    key = (user_email, date.today())
+    cached = st.session_state.get('_user_context')
+    if cached is not None and cached[0] == key and cached[1] is directory:
+        return cached[2]
+    context = _build_user_context(user_email, directory)
+    st.session_state['_user_context'] = (key, directory, context)
+    return context
+
+def reset_user_context():
+    """Descarta o contexto do usuário em sessão para que ele seja resolvido de novo."""
+    st.session_state.pop('_user_context', None)
+
+def get_user_info() -> dict | None:
+    """Retorna uma cópia do registro do usuário logado (ou None)."""
+    context = get_user_context()
+    return dict(context.record) if context and context.record is not None else None
 
 def get_effective_user_status() -> str:
-    user_info = get_user_info()
-    if not user_info: return 'inativo'
-    sheet_status = user_info.get('status', 'inativo')
-    trial_end_date = user_info.get('trial_end_date')
-    if sheet_status != 'ativo': return sheet_status
-    if not pd.isna(trial_end_date) and isinstance(trial_end_date, date) and date.today() > trial_end_date:
-        return 'trial_expirado'
-    return sheet_status
+    context = get_user_context()
+    return context.effective_status if context else 'inativo'
 
 def is_on_trial() -> bool:
-    user_info = get_user_info()
-    if not user_info: return False
-    trial_end_date = user_info.get('trial_end_date')
-    if pd.isna(trial_end_date): return False
-    return date.today() <= trial_end_date
+    context = get_user_context()
+    return context.on_trial if context else False
 
 def get_effective_user_plan() -> str:
-    user_info = get_user_info()
-    if not user_info: return 'nenhum'
-    sheet_plan = user_info.get('plano', 'nenhum')
-    if is_on_trial(): return 'premium_ia'
-    return sheet_plan
+    context = get_user_context()
+    return context.effective_plan if context else 'nenhum'
 
 def get_user_role():
-    user_info = get_user_info()
-    return user_info.get('role', 'viewer') if user_info else 'viewer'
+    context = get_user_context()
+    return context.role if context else 'viewer'
 
 def check_user_access(required_role="viewer"):
     """
@@ -251,51 +357,45 @@ def has_pro_features(): return get_effective_user_plan() in ['pro', 'premium_ia'
 def has_ai_features(): return get_effective_user_plan() == 'premium_ia'
 
 def setup_sidebar():
-    user_info = get_user_info()
-    effective_status = get_effective_user_status()
+    context = get_user_context()
+    effective_status = context.effective_status if context else 'inativo'
     if effective_status != 'ativo':
         if is_admin(): st.sidebar.warning("Visão de Administrador."); return False
         if effective_status == 'inativo': st.sidebar.error("Sua conta não está ativa."); return False
         return False
-    spreadsheet_id = user_info.get('spreadsheet_id')
-    folder_id = user_info.get('folder_id')
+    spreadsheet_id = context.spreadsheet_id
+    folder_id = context.folder_id
     if pd.isna(spreadsheet_id) or spreadsheet_id == '' or pd.isna(folder_id) or folder_id == '':
-        if not is_superuser():
+        if not context.is_superuser:
             st.sidebar.error("Erro no ambiente de dados. Contate o suporte.")
         return False
-    if st.session_state.get('current_user_email') != user_info['email']:
-        st.cache_data.clear()
-    st.session_state['current_user_email'] = user_info['email']
+    if st.session_state.get('current_user_email') != context.email:
+        clear_user_session_data()
+    st.session_state['current_user_email'] = context.email
     st.session_state['current_spreadsheet_id'] = spreadsheet_id
     st.session_state['current_folder_id'] = folder_id
-    if is_superuser():
+    if context.is_superuser:
         st.sidebar.success("👑 **Acesso Mestre**")
-    elif is_on_trial():
-        trial_end = user_info.get('trial_end_date', date.today())
-        days_left = (trial_end - date.today()).days
+    elif context.on_trial:
+        days_left = (context.trial_end_date - date.today()).days
         st.sidebar.info(f"🚀 **Trial Premium:** {days_left} dias restantes.")
     else:
-        plano_atual = get_effective_user_plan().replace('_', ' ').title()
+        plano_atual = context.effective_plan.replace('_', ' ').title()
         st.sidebar.success(f"**Plano:** {plano_atual}")
     return True
     
 def save_access_request(user_name, user_email, justification):
     try:
-        sao_paulo_tz = pytz.timezone("America/Sao_Paulo")
-        timestamp = datetime.now(sao_paulo_tz).strftime('%Y-%m-%d %H:%M:%S')
-        request_row = [timestamp, user_name, user_email, "Solicitação de Trial", justification, "Pendente"]
+        from utils.solicitacoes_acesso import has_pending_request, add_request
         matrix_uploader = GoogleDriveUploader(is_matrix=True)
         
-        # Verifica se já existe solicitação pendente
-        requests_data = matrix_uploader.get_data_from_sheet(ACCESS_REQUESTS_SHEET_NAME)
-        if requests_data and len(requests_data) > 1:
-            df_requests = pd.DataFrame(requests_data[1:], columns=requests_data[0])
-            if not df_requests[(df_requests['email_usuario'] == user_email) & (df_requests['status'] == 'Pendente')].empty:
-                st.warning("Você já possui uma solicitação de acesso pendente.")
-                return False
+        # Verifica se já existe solicitação pendente (índice em memória, sem ler a aba inteira)
+        if has_pending_request(user_email, matrix_uploader):
+            st.warning("Você já possui uma solicitação de acesso pendente.")
+            return False
         
         # Salva a solicitação
-        matrix_uploader.append_data_to_sheet(ACCESS_REQUESTS_SHEET_NAME, [request_row])
+        add_request(user_name, user_email, justification, matrix_uploader)
         
         try:
             from utils.github_notifications import notify_new_access_request
@@ -0,0 +1,16 @@
+import os
+import json
+import hashlib
+import yaml
+
+SHEETS_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'sheets_config.yaml')
+
+def read_sheets_config():
+    """Lê a configuração de abas e cabeçalhos das planilhas de usuário (config/sheets_config.yaml)."""
+    with open(SHEETS_CONFIG_PATH, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
+
+def sheets_config_hash(sheets_config):
+    """Gera uma assinatura curta do esquema de abas, usada para detectar mudanças no YAML."""
+    serialized = json.dumps(sheets_config, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()[:12]
@@ -0,0 +1,129 @@
+"""
+Backend do cache compartilhado entre as réplicas do app.
+
+Com várias réplicas do Streamlit atrás de um balanceador, cada processo tem o
+próprio cache em memória. O backend "disk" guarda os valores (diretório de
+usuários, linhas das abas) em um diretório comum às réplicas, para que uma
+leitura feita por uma réplica sirva às demais.
+
+Cada valor é gravado com o carimbo ("stamp") do seu espaço de nomes (ex.:
+'usuarios' ou 'planilha:<id>'). Invalidar um espaço de nomes troca o carimbo,
+e todas as réplicas passam a ignorar os valores gravados com o carimbo antigo.
+
+O backend "memory" (padrão) mantém tudo no próprio processo, como antes.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import uuid
+
+from gdrive.config import get_cache_backend_settings
+
+
+class MemoryCacheBackend:
+    """Valores e carimbos em memória, visíveis só neste processo."""
+
+    # Não há ganho em copiar para cá dados que já estão no cache local do processo
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._stamps = {}
+
+    def get(self, key):
+        with self._lock:
+            return self._values.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def get_stamp(self, namespace):
+        with self._lock:
+            return self._stamps.get(namespace, '')
+
+    def bump_stamp(self, namespace):
+        with self._lock:
+            self._stamps[namespace] = uuid.uuid4().hex
+            return self._stamps[namespace]
+
+
+class DiskCacheBackend:
+    """
+    Valores (pickle) e carimbos em arquivos de um diretório comum às réplicas.
+    As gravações usam arquivo temporário + os.replace, então um leitor nunca vê
+    um arquivo pela metade.
+    """
+
+    shared = True
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, prefix, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{prefix}-{digest}")
+
+    def _write(self, path, data):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def get(self, key):
+        try:
+            with open(self._path('valor', key), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Aviso: Valor ilegível no cache compartilhado ({key}): {e}")
+            return None
+
+    def set(self, key, value):
+        try:
+            self._write(self._path('valor', key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            print(f"⚠️ Aviso: Não foi possível gravar no cache compartilhado ({key}): {e}")
+
+    def get_stamp(self, namespace):
+        try:
+            with open(self._path('carimbo', namespace), 'rb') as f:
+                return f.read().decode('ascii')
+        except FileNotFoundError:
+            return ''
+
+    def bump_stamp(self, namespace):
+        # Um valor aleatório (e não um contador) evita perder a troca quando duas réplicas invalidam juntas
+        stamp = uuid.uuid4().hex
+        self._write(self._path('carimbo', namespace), stamp.encode('ascii'))
+        return stamp
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Retorna o backend configurado (um por processo)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            settings = get_cache_backend_settings()
+            if settings['backend'] == 'disk':
+                try:
+                    _backend = DiskCacheBackend(settings['dir'])
+                except OSError as e:
+                    print(f"⚠️ Aviso: Cache em disco indisponível em '{settings['dir']}', usando memória: {e}")
+            if _backend is None:
+                _backend = MemoryCacheBackend()
+        return _backend
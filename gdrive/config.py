@@ -1,12 +1,84 @@
 import os
 import json
+import tempfile
 import streamlit as st
 
+# Backend das APIs do Google: "google" (padrão) ou "fake" (dublê em memória, ver gdrive/fake_google.py)
+GOOGLE_BACKEND_ENV_VAR = "RQ12BR_GOOGLE_BACKEND"
+# IDs usados pelo backend "fake" quando os segredos não informam a planilha matriz ou a pasta central
+FAKE_MATRIX_SHEETS_ID = "fake-planilha-matriz"
+FAKE_CENTRAL_DRIVE_FOLDER_ID = "fake-pasta-central"
+# Backend "fake" servido por outro processo (ver fake_google.serve): endereço "host:porta" e chave de acesso.
+# Usado pelo teste de carga para que sessões em processos separados compartilhem as mesmas planilhas.
+FAKE_BACKEND_ADDRESS_ENV_VAR = "RQ12BR_FAKE_BACKEND_ADDRESS"
+FAKE_BACKEND_AUTHKEY_ENV_VAR = "RQ12BR_FAKE_BACKEND_AUTHKEY"
+# Libera o login simulado do teste de carga (só vale com o backend "fake"; desligado por padrão)
+SIMULATED_LOGIN_ENV_VAR = "RQ12BR_ALLOW_SIMULATED_LOGIN"
+
+def get_google_backend():
+    """Backend das APIs do Google: variável de ambiente RQ12BR_GOOGLE_BACKEND ou `backend` em [google_drive]."""
+    backend = os.environ.get(GOOGLE_BACKEND_ENV_VAR)
+    if backend:
+        return backend.strip().lower()
+    try:
+        return str(st.secrets["google_drive"].get("backend", "google")).strip().lower()
+    except (KeyError, AttributeError, FileNotFoundError):
+        return "google"
+
+def is_simulated_login_allowed():
+    """
+    Indica se o login simulado pode ser usado: exige o backend "fake" e a variável de ambiente
+    RQ12BR_ALLOW_SIMULATED_LOGIN=1, que só o teste de carga define (não há opção nos segredos).
+    """
+    return os.environ.get(SIMULATED_LOGIN_ENV_VAR) == "1" and get_google_backend() == "fake"
+
+def get_fake_backend_settings():
+    """
+    Latência (ms), taxa de erros 503 injetados (0 a 1) e cota por minuto (0 = sem limite) do backend "fake".
+    Lidas das variáveis RQ12BR_FAKE_LATENCY_MS, RQ12BR_FAKE_ERROR_RATE e RQ12BR_FAKE_REQUESTS_PER_MINUTE
+    ou da seção [fake_google] dos segredos.
+    """
+    try:
+        section = st.secrets.get("fake_google", {})
+    except (AttributeError, FileNotFoundError):
+        section = {}
+    def read(key, env_var, cast, default):
+        value = os.environ.get(env_var, section.get(key, default))
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            return default
+    return {
+        'latency_ms': read('latency_ms', 'RQ12BR_FAKE_LATENCY_MS', float, 0.0),
+        'error_rate': read('error_rate', 'RQ12BR_FAKE_ERROR_RATE', float, 0.0),
+        'requests_per_minute': read('requests_per_minute', 'RQ12BR_FAKE_REQUESTS_PER_MINUTE', int, 0),
+    }
+
+# Cache compartilhado entre réplicas: "memory" (só este processo) ou "disk" (diretório comum às réplicas)
+CACHE_BACKEND_ENV_VAR = "RQ12BR_CACHE_BACKEND"
+CACHE_DIR_ENV_VAR = "RQ12BR_CACHE_DIR"
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "rq12br-cache")
+
+def get_cache_backend_settings():
+    """
+    Tipo ('memory' ou 'disk') e diretório do cache compartilhado, lidos das variáveis
+    RQ12BR_CACHE_BACKEND e RQ12BR_CACHE_DIR ou da seção [cache] dos segredos.
+    """
+    try:
+        section = st.secrets.get("cache", {})
+    except (AttributeError, FileNotFoundError):
+        section = {}
+    kind = os.environ.get(CACHE_BACKEND_ENV_VAR, section.get("backend", "memory"))
+    directory = os.environ.get(CACHE_DIR_ENV_VAR, section.get("dir", DEFAULT_CACHE_DIR))
+    return {'backend': str(kind).strip().lower(), 'dir': directory}
+
 def get_matrix_sheets_id():
     """Busca o ID da Planilha Matriz a partir dos segredos do Streamlit."""
     try:
         return st.secrets["google_drive"]["matrix_sheets_id"]
-    except (KeyError, AttributeError):
+    except (KeyError, AttributeError, FileNotFoundError):
+        if get_google_backend() == "fake":
+            return FAKE_MATRIX_SHEETS_ID
         st.error("Erro Crítico: O ID da Planilha Matriz (`matrix_sheets_id`) não foi encontrado em secrets.toml.")
         st.stop()
 
@@ -14,13 +86,56 @@ def get_central_drive_folder_id():
     """Busca o ID da Pasta Central do Drive a partir dos segredos do Streamlit."""
     try:
         return st.secrets["google_drive"]["central_drive_folder_id"]
-    except (KeyError, AttributeError):
+    except (KeyError, AttributeError, FileNotFoundError):
+        if get_google_backend() == "fake":
+            return FAKE_CENTRAL_DRIVE_FOLDER_ID
         st.error("Erro Crítico: O ID da Pasta Central (`central_drive_folder_id`) não foi encontrado em secrets.toml.")
         st.stop()
 
+DEFAULT_ENVIRONMENT_POOL_SIZE = 2
+# Intervalo (em segundos) entre verificações do job de reabastecimento do pool de ambientes
+ENVIRONMENT_POOL_REFILL_SECONDS = 300
+# Duração máxima (em segundos) dos leases entre réplicas (utils/leases.py) de cada operação
+POOL_CLAIM_LEASE_SECONDS = 120
+POOL_REFILL_LEASE_SECONDS = 1800
+AUDIT_MAINTENANCE_LEASE_SECONDS = 1800
+USAGE_EVENTS_COMPACTION_LEASE_SECONDS = 600
+ACCESS_REQUEST_LEASE_SECONDS = 600
+
+def get_environment_pool_size():
+    """Quantidade de ambientes pré-provisionados mantidos no pool (0 desativa o pool)."""
+    try:
+        return int(st.secrets["google_drive"].get("environment_pool_size", DEFAULT_ENVIRONMENT_POOL_SIZE))
+    except (KeyError, AttributeError, ValueError, FileNotFoundError):
+        return DEFAULT_ENVIRONMENT_POOL_SIZE
+
+DEFAULT_REQUESTS_PER_MINUTE = 240
+# Repetição de erros temporários (429/5xx) com backoff exponencial
+API_MAX_RETRIES = 5
+API_BACKOFF_BASE_SECONDS = 1
+API_BACKOFF_MAX_SECONDS = 32
+# Circuit breaker: falhas seguidas até abrir e tempo aberto antes de testar a API novamente
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5
+CIRCUIT_BREAKER_RESET_SECONDS = 30
+
+def get_requests_per_minute():
+    """Cota de requisições por minuto do projeto Google usada pelo limitador de taxa compartilhado."""
+    try:
+        return int(st.secrets["google_drive"].get("requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE))
+    except (KeyError, AttributeError, ValueError, FileNotFoundError):
+        return DEFAULT_REQUESTS_PER_MINUTE
+
 USERS_SHEET_NAME = "usuarios"
 AUDIT_LOG_SHEET_NAME = "log_auditoria"
 ACCESS_REQUESTS_SHEET_NAME = "solicitacoes_acesso"
+ENVIRONMENT_POOL_SHEET_NAME = "pool_ambientes"
+JOB_LEASES_SHEET_NAME = "leases_jobs"
+USAGE_COUNTERS_SHEET_NAME = "contadores_uso"
+USAGE_EVENTS_SHEET_NAME = "eventos_uso"
+AUDIT_ERRORS_SHEET_NAME = "log_erros_recentes"
+AUDIT_ARCHIVE_INDEX_SHEET_NAME = "log_auditoria_arquivos"
+# Prefixo das abas mensais de arquivo do log de auditoria (ex.: log_auditoria_2025_01)
+AUDIT_ARCHIVE_SHEET_PREFIX = "log_auditoria_"
 
 LOCATIONS_SHEET_NAME = "locais"
 EXTINGUISHER_SHEET_NAME = "extintores"
@@ -54,6 +169,64 @@ EXTINGUISHER_DISPOSAL_LOG_SHEET_NAME = "log_baixas_extintores"
 AVALIACOES_ESCADAS_SHEET_NAME = "avaliacoes_escadas"
 PROJETOS_ESCADAS_SHEET_NAME = "projetos_escadas"
 
+# Colunas que identificam uma linha em cada aba, usadas para atualizar a linha pela chave
+SHEET_KEY_COLUMNS = {
+    USERS_SHEET_NAME: ('email',),
+    SUPPORT_REQUESTS_SHEET_NAME: ('data_solicitacao', 'email_usuario'),
+    AVALIACOES_ESCADAS_SHEET_NAME: ('id_avaliacao',),
+    PROJETOS_ESCADAS_SHEET_NAME: ('id_projeto',),
+}
+
+# Máximo de planilhas de usuários lidas em paralelo nas estatísticas do administrador
+ADMIN_STATS_MAX_WORKERS = 8
+
+# Abas que só crescem por append: são lidas de forma incremental (apenas as linhas novas).
+# A conferência pela última linha conhecida não enxerga edições em outras linhas feitas
+# por outra réplica ou à mão; elas só aparecem na ressincronização completa periódica.
+# Por isso os chamados de suporte (resposta editada no lugar) ficam de fora. As
+# solicitações de acesso entram: o status editado no lugar é conferido na planilha
+# antes de cada aprovação ou rejeição (utils/solicitacoes_acesso.py).
+INCREMENTAL_SHEETS = {
+    AUDIT_LOG_SHEET_NAME,
+    ACCESS_REQUESTS_SHEET_NAME,
+    JOB_LEASES_SHEET_NAME,
+    USAGE_EVENTS_SHEET_NAME,
+    AVALIACOES_ESCADAS_SHEET_NAME,
+    PROJETOS_ESCADAS_SHEET_NAME,
+}
+# Abas lidas por decisões protegidas por lease (pool de ambientes, solicitações de acesso e
+# os próprios leases): o cache nunca as passa para a versão nova por dedução a partir das
+# escritas deste processo; depois de qualquer mudança de versão elas são sempre revalidadas.
+NO_REBASE_SHEETS = {
+    ENVIRONMENT_POOL_SHEET_NAME,
+    ACCESS_REQUESTS_SHEET_NAME,
+    JOB_LEASES_SHEET_NAME,
+}
+# Log de auditoria: tamanho do índice de erros recentes, linhas por página no visualizador
+# e intervalo (em segundos) do job que arquiva os meses anteriores
+AUDIT_RECENT_ERRORS_LIMIT = 50
+AUDIT_PAGE_SIZE = 100
+AUDIT_MAINTENANCE_INTERVAL_SECONDS = 6 * 3600
+
+# Intervalo máximo (em segundos) entre ressincronizações completas de uma aba incremental
+INCREMENTAL_FULL_RESYNC_SECONDS = 900
+# Janela (em segundos) em que a versão já conferida de uma planilha é reaproveitada sem nova consulta ao Drive
+SHEET_CACHE_REVALIDATE_SECONDS = 5
+# Idade (em segundos) a partir da qual o diretório de usuários é relido em segundo plano
+USERS_CACHE_TTL_SECONDS = 600
+# Intervalo (em segundos) em que o job de atualização confere se a aba de usuários mudou
+USERS_REFRESH_INTERVAL_SECONDS = 30
+# Fila local das gravações de avaliações e projetos: diretório do journal, intervalo (em segundos)
+# entre as passadas do job de envio e espera máxima entre tentativas de uma gravação que falhou
+SYNC_QUEUE_DIR = os.path.join("data", "fila_sincronizacao")
+SYNC_QUEUE_INTERVAL_SECONDS = 30
+SYNC_QUEUE_MAX_BACKOFF_SECONDS = 1800
+# Sincronização em massa do histórico local: linhas por append, uploads simultâneos
+# e diretório dos arquivos de progresso (um por planilha, para retomar uma execução interrompida)
+BULK_SYNC_APPEND_CHUNK_ROWS = 500
+BULK_SYNC_MAX_UPLOAD_WORKERS = 8
+BULK_SYNC_PROGRESS_DIR = os.path.join("data", "sincronizacao_historico")
+
 
 
 def get_credentials_dict():
@@ -0,0 +1,715 @@
+"""
+Dublê em memória das APIs do Google Sheets v4 e Drive v3 usadas pelo GoogleDriveUploader.
+
+Ativado com RQ12BR_GOOGLE_BACKEND=fake (ou `backend = "fake"` em [google_drive]
+nos segredos), permite rodar o app, testes e cargas sem rede nem credenciais.
+Implementa o mesmo encadeamento de chamadas do googleapiclient
+(`service.spreadsheets().values().get(...).execute()`) para o subconjunto usado
+no projeto:
+
+- Sheets: values.get/append/update/clear/batchGet/batchUpdate,
+  spreadsheets.create/get/batchUpdate (addSheet, updateCells, deleteSheet, deleteDimension);
+- Drive: files.create/get/list/update e permissions.create.
+
+Cada chamada pode sofrer latência, erros 503 aleatórios e 429 ao exceder uma
+cota por minuto (ver `get_fake_backend_settings()` e `configure()`), e é
+contada por método em `get_call_counts()`. As planilhas também são arquivos
+do Drive e têm o campo `version` incrementado a cada escrita.
+
+O backend é do processo. Para que vários processos usem as mesmas planilhas
+(ex.: o teste de carga com uma sessão por processo), um deles chama `serve()`
+e os demais recebem o endereço em RQ12BR_FAKE_BACKEND_ADDRESS/_AUTHKEY:
+`build_services()` passa a encaminhar cada `execute()` para esse processo.
+"""
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from multiprocessing.managers import BaseManager
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from gdrive.config import (
+    get_fake_backend_settings, get_matrix_sheets_id, get_central_drive_folder_id,
+    FAKE_BACKEND_ADDRESS_ENV_VAR, FAKE_BACKEND_AUTHKEY_ENV_VAR
+)
+
+SPREADSHEET_MIME = 'application/vnd.google-apps.spreadsheet'
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+
+# Abas e cabeçalhos da planilha matriz criada automaticamente no backend fake
+MATRIX_SHEETS_SEED = {
+    'usuarios': [
+        'email', 'nome', 'role', 'plano', 'status', 'spreadsheet_id', 'folder_id',
+        'data_cadastro', 'trial_end_date', 'telefone', 'empresa', 'cargo'
+    ],
+    'log_auditoria': ['timestamp', 'user_email', 'action', 'details'],
+    'solicitacoes_acesso': [
+        'data_solicitacao', 'nome_usuario', 'email_usuario', 'tipo_solicitacao', 'justificativa', 'status'
+    ],
+    'solicitacoes_suporte': [
+        'data_solicitacao', 'nome_usuario', 'email_usuario', 'tipo_solicitacao', 'assunto',
+        'descricao', 'prioridade', 'status', 'data_resposta', 'resposta'
+    ],
+}
+
+_A1_CELLS = re.compile(r'^([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$')
+
+
+def _http_error(status, message):
+    """Cria um HttpError igual ao levantado pelo googleapiclient."""
+    resp = httplib2.Response({'status': status})
+    resp.reason = message
+    content = json.dumps({'error': {'code': status, 'message': message}}).encode()
+    return HttpError(resp, content, uri='fake://google')
+
+
+def _column_index(letters):
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - ord('A') + 1
+    return index - 1
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def parse_range(range_name):
+    """
+    Converte um intervalo A1 em (aba, linha_ini, col_ini, linha_fim, col_fim).
+    Índices começam em 0; os finais são inclusivos ou None quando o intervalo é aberto.
+    """
+    sheet_name, _, cells = range_name.partition('!')
+    if sheet_name.startswith("'") and sheet_name.endswith("'"):
+        sheet_name = sheet_name[1:-1].replace("''", "'")
+    if not cells:
+        return sheet_name, 0, 0, None, None
+    match = _A1_CELLS.match(cells.upper())
+    if not match:
+        raise _http_error(400, f"Unable to parse range: {range_name}")
+    start_col, start_row, end_col, end_row = match.groups()
+    first_row = int(start_row) - 1 if start_row else 0
+    first_col = _column_index(start_col) if start_col else 0
+    if end_col is None and end_row is None:
+        # Célula ou coluna única (ex.: A1, A)
+        return sheet_name, first_row, first_col, first_row if start_row else None, first_col if start_col else None
+    last_row = int(end_row) - 1 if end_row else None
+    last_col = _column_index(end_col) if end_col else None
+    return sheet_name, first_row, first_col, last_row, last_col
+
+
+def _a1(sheet_name, first_row, first_col, last_row, last_col):
+    quoted = sheet_name if re.match(r'^\w+$', sheet_name) else "'" + sheet_name.replace("'", "''") + "'"
+    return f"{quoted}!{_column_letter(first_col)}{first_row + 1}:{_column_letter(last_col)}{last_row + 1}"
+
+
+def _cell_value(value):
+    """Valor como o Sheets devolve com FORMATTED_VALUE (sempre texto)."""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _trim(rows):
+    """Remove células vazias no fim de cada linha e linhas vazias no fim, como a API."""
+    trimmed = []
+    for row in rows:
+        row = list(row)
+        while row and row[-1] == '':
+            row.pop()
+        trimmed.append(row)
+    while trimmed and not trimmed[-1]:
+        trimmed.pop()
+    return trimmed
+
+
+class FakeSpreadsheet:
+    """Planilha em memória: abas (id -> título e linhas) na ordem de criação."""
+
+    def __init__(self, spreadsheet_id, title):
+        self.spreadsheet_id = spreadsheet_id
+        self.title = title
+        self.sheets = {0: {'title': 'Página1', 'rows': []}}
+
+    def sheet_by_title(self, title):
+        for sheet in self.sheets.values():
+            if sheet['title'] == title:
+                return sheet
+        raise _http_error(400, f"Unable to parse range: {title}")
+
+    def read(self, range_name, major_dimension='ROWS'):
+        sheet_name, first_row, first_col, last_row, last_col = parse_range(range_name)
+        rows = self.sheet_by_title(sheet_name)['rows']
+        end_row = len(rows) if last_row is None else last_row + 1
+        selected = [
+            list(row[first_col:None if last_col is None else last_col + 1])
+            for row in rows[first_row:end_row]
+        ]
+        if major_dimension == 'COLUMNS':
+            width = max((len(row) for row in selected), default=0)
+            selected = [[row[col] if col < len(row) else '' for row in selected] for col in range(width)]
+        return _trim(selected)
+
+    def write(self, range_name, values):
+        """Grava valores a partir do canto superior esquerdo do intervalo; retorna (intervalo, células)."""
+        sheet_name, first_row, first_col, _, _ = parse_range(range_name)
+        rows = self.sheet_by_title(sheet_name)['rows']
+        width = 0
+        for offset, values_row in enumerate(values):
+            row_index = first_row + offset
+            while len(rows) <= row_index:
+                rows.append([])
+            row = rows[row_index]
+            end_col = first_col + len(values_row)
+            if len(row) < end_col:
+                row.extend([''] * (end_col - len(row)))
+            row[first_col:end_col] = [_cell_value(value) for value in values_row]
+            width = max(width, len(values_row))
+        cells = sum(len(values_row) for values_row in values)
+        updated = _a1(sheet_name, first_row, first_col, first_row + max(len(values), 1) - 1, first_col + max(width, 1) - 1)
+        return updated, cells
+
+    def append(self, range_name, values):
+        """Acrescenta linhas após a última linha com dados (INSERT_ROWS); retorna (intervalo, células)."""
+        sheet_name, _, first_col, _, _ = parse_range(range_name)
+        rows = self.sheet_by_title(sheet_name)['rows']
+        last_filled = max((index for index, row in enumerate(rows) if any(cell != '' for cell in row)), default=-1)
+        insert_at = last_filled + 1
+        rows[insert_at:insert_at] = [[] for _ in values]
+        return self.write(_a1(sheet_name, insert_at, first_col, insert_at, first_col), values)
+
+    def clear(self, range_name):
+        sheet_name, first_row, first_col, last_row, last_col = parse_range(range_name)
+        rows = self.sheet_by_title(sheet_name)['rows']
+        end_row = len(rows) if last_row is None else min(len(rows), last_row + 1)
+        for row in rows[first_row:end_row]:
+            end_col = len(row) if last_col is None else min(len(row), last_col + 1)
+            row[first_col:end_col] = [''] * max(0, end_col - first_col)
+        return range_name
+
+
+class FakeGoogleBackend:
+    """Estado compartilhado (planilhas e arquivos do Drive) e injeção de latência, erros e cota."""
+
+    def __init__(self, latency_ms=0.0, error_rate=0.0, requests_per_minute=0, seed=None):
+        self.lock = threading.RLock()
+        self.spreadsheets = {}
+        self.files = {}
+        self.permissions = {}
+        self.call_counts = Counter()
+        self._recent_calls = deque()
+        self._ids = itertools.count(1)
+        self._random = random.Random(seed)
+        self.configure(latency_ms, error_rate, requests_per_minute)
+
+    def configure(self, latency_ms=None, error_rate=None, requests_per_minute=None):
+        """Altera a latência (ms), a taxa de erros 503 (0 a 1) e a cota por minuto (0 = sem limite)."""
+        with self.lock:
+            if latency_ms is not None:
+                self.latency_ms = float(latency_ms)
+            if error_rate is not None:
+                self.error_rate = float(error_rate)
+            if requests_per_minute is not None:
+                self.requests_per_minute = int(requests_per_minute)
+
+    def new_id(self, prefix):
+        return f"fake-{prefix}-{next(self._ids)}"
+
+    def call(self, method, handler):
+        """Executa uma requisição aplicando contagem, latência, cota e erros injetados."""
+        with self.lock:
+            self.call_counts[method] += 1
+            latency = self.latency_ms / 1000.0
+            if latency:
+                # Jitter de ±25% em torno da latência configurada
+                latency *= self._random.uniform(0.75, 1.25)
+            fail = self.error_rate and self._random.random() < self.error_rate
+            over_quota = False
+            if self.requests_per_minute:
+                now = time.monotonic()
+                while self._recent_calls and now - self._recent_calls[0] > 60:
+                    self._recent_calls.popleft()
+                over_quota = len(self._recent_calls) >= self.requests_per_minute
+                if not over_quota:
+                    self._recent_calls.append(now)
+        if latency:
+            time.sleep(latency)
+        if over_quota:
+            raise _http_error(429, "Quota exceeded for quota metric 'Requests' (fake)")
+        if fail:
+            raise _http_error(503, "The service is currently unavailable (fake)")
+        with self.lock:
+            return handler()
+
+    # --- Planilhas ---
+
+    def get_spreadsheet(self, spreadsheet_id):
+        spreadsheet = self.spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None or self.files[spreadsheet_id]['trashed']:
+            raise _http_error(404, f"Requested entity was not found: {spreadsheet_id}")
+        return spreadsheet
+
+    def touch(self, file_id):
+        """Incrementa a versão do arquivo, como o Drive faz a cada alteração."""
+        self.files[file_id]['version'] = str(int(self.files[file_id]['version']) + 1)
+
+    def create_spreadsheet(self, title, parents=None, spreadsheet_id=None):
+        spreadsheet_id = spreadsheet_id or self.new_id('planilha')
+        self.spreadsheets[spreadsheet_id] = FakeSpreadsheet(spreadsheet_id, title)
+        self.files[spreadsheet_id] = {
+            'id': spreadsheet_id, 'name': title, 'mimeType': SPREADSHEET_MIME,
+            'parents': list(parents or []), 'trashed': False, 'version': '1'
+        }
+        return spreadsheet_id
+
+    def create_file(self, name, mime_type, parents=None, size=0, file_id=None):
+        if mime_type == SPREADSHEET_MIME:
+            return self.create_spreadsheet(name, parents, file_id)
+        file_id = file_id or self.new_id('arquivo')
+        self.files[file_id] = {
+            'id': file_id, 'name': name, 'mimeType': mime_type, 'parents': list(parents or []),
+            'trashed': False, 'version': '1', 'size': str(size)
+        }
+        return file_id
+
+    def seed_spreadsheet(self, spreadsheet_id, title, sheets_config):
+        """Cria (se ainda não existir) uma planilha com as abas e cabeçalhos informados."""
+        with self.lock:
+            if spreadsheet_id in self.spreadsheets:
+                return
+            self.create_spreadsheet(title, spreadsheet_id=spreadsheet_id)
+            spreadsheet = self.spreadsheets[spreadsheet_id]
+            spreadsheet.sheets = {
+                sheet_id: {'title': name, 'rows': [[str(h) for h in headers]]}
+                for sheet_id, (name, headers) in enumerate(sheets_config.items())
+            }
+
+    def seed_folder(self, folder_id, name):
+        """Cria (se ainda não existir) uma pasta com o ID informado."""
+        with self.lock:
+            if folder_id not in self.files:
+                self.create_file(name, FOLDER_MIME, file_id=folder_id)
+
+    def get_call_counts(self):
+        with self.lock:
+            return dict(self.call_counts)
+
+    def reset_call_counts(self):
+        with self.lock:
+            self.call_counts.clear()
+            self._recent_calls.clear()
+
+
+class FakeRequest:
+    """Requisição preparada; só acessa o backend em `execute()`, como o HttpRequest do googleapiclient."""
+
+    def __init__(self, backend, method, handler):
+        self.backend = backend
+        self.method = method
+        self.handler = handler
+
+    def execute(self, http=None, num_retries=0):
+        return self.backend.call(self.method, self.handler)
+
+
+class _Values:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _request(self, method, handler):
+        return FakeRequest(self.backend, f"sheets.values.{method}", handler)
+
+    def get(self, spreadsheetId, range, majorDimension='ROWS', **kwargs):
+        def handler():
+            values = self.backend.get_spreadsheet(spreadsheetId).read(range, majorDimension)
+            result = {'range': range, 'majorDimension': majorDimension}
+            if values:
+                result['values'] = values
+            return result
+        return self._request('get', handler)
+
+    def batchGet(self, spreadsheetId, ranges, majorDimension='ROWS', **kwargs):
+        def handler():
+            spreadsheet = self.backend.get_spreadsheet(spreadsheetId)
+            value_ranges = []
+            for range_name in ranges:
+                value_range = {'range': range_name, 'majorDimension': majorDimension}
+                values = spreadsheet.read(range_name, majorDimension)
+                if values:
+                    value_range['values'] = values
+                value_ranges.append(value_range)
+            return {'spreadsheetId': spreadsheetId, 'valueRanges': value_ranges}
+        return self._request('batchGet', handler)
+
+    def append(self, spreadsheetId, range, body, **kwargs):
+        def handler():
+            updated_range, cells = self.backend.get_spreadsheet(spreadsheetId).append(range, body.get('values', []))
+            self.backend.touch(spreadsheetId)
+            return {
+                'spreadsheetId': spreadsheetId,
+                'updates': {
+                    'spreadsheetId': spreadsheetId, 'updatedRange': updated_range,
+                    'updatedRows': len(body.get('values', [])), 'updatedCells': cells
+                }
+            }
+        return self._request('append', handler)
+
+    def update(self, spreadsheetId, range, body, **kwargs):
+        def handler():
+            values = body.get('values', [])
+            updated_range, cells = self.backend.get_spreadsheet(spreadsheetId).write(range, values)
+            self.backend.touch(spreadsheetId)
+            return {
+                'spreadsheetId': spreadsheetId, 'updatedRange': updated_range,
+                'updatedRows': len(values), 'updatedCells': cells
+            }
+        return self._request('update', handler)
+
+    def batchUpdate(self, spreadsheetId, body, **kwargs):
+        def handler():
+            spreadsheet = self.backend.get_spreadsheet(spreadsheetId)
+            responses = []
+            for value_range in body.get('data', []):
+                updated_range, cells = spreadsheet.write(value_range['range'], value_range.get('values', []))
+                responses.append({'spreadsheetId': spreadsheetId, 'updatedRange': updated_range, 'updatedCells': cells})
+            self.backend.touch(spreadsheetId)
+            return {
+                'spreadsheetId': spreadsheetId, 'responses': responses,
+                'totalUpdatedCells': sum(response['updatedCells'] for response in responses)
+            }
+        return self._request('batchUpdate', handler)
+
+    def clear(self, spreadsheetId, range, body=None, **kwargs):
+        def handler():
+            cleared = self.backend.get_spreadsheet(spreadsheetId).clear(range)
+            self.backend.touch(spreadsheetId)
+            return {'spreadsheetId': spreadsheetId, 'clearedRange': cleared}
+        return self._request('clear', handler)
+
+
+class _Spreadsheets:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def values(self):
+        return _Values(self.backend)
+
+    def create(self, body, fields=None, **kwargs):
+        def handler():
+            title = body.get('properties', {}).get('title', 'Planilha sem título')
+            return {'spreadsheetId': self.backend.create_spreadsheet(title)}
+        return FakeRequest(self.backend, 'sheets.spreadsheets.create', handler)
+
+    def get(self, spreadsheetId, fields=None, **kwargs):
+        def handler():
+            spreadsheet = self.backend.get_spreadsheet(spreadsheetId)
+            return {
+                'spreadsheetId': spreadsheetId,
+                'properties': {'title': spreadsheet.title},
+                'sheets': [
+                    {'properties': {'sheetId': sheet_id, 'title': sheet['title'], 'index': index}}
+                    for index, (sheet_id, sheet) in enumerate(spreadsheet.sheets.items())
+                ]
+            }
+        return FakeRequest(self.backend, 'sheets.spreadsheets.get', handler)
+
+    def batchUpdate(self, spreadsheetId, body, **kwargs):
+        def handler():
+            spreadsheet = self.backend.get_spreadsheet(spreadsheetId)
+            replies = [self._apply(spreadsheet, request) for request in body.get('requests', [])]
+            self.backend.touch(spreadsheetId)
+            return {'spreadsheetId': spreadsheetId, 'replies': replies}
+        return FakeRequest(self.backend, 'sheets.spreadsheets.batchUpdate', handler)
+
+    def _sheet(self, spreadsheet, sheet_id):
+        if sheet_id not in spreadsheet.sheets:
+            raise _http_error(400, f"No grid with id: {sheet_id}")
+        return spreadsheet.sheets[sheet_id]
+
+    def _apply(self, spreadsheet, request):
+        if 'addSheet' in request:
+            properties = dict(request['addSheet'].get('properties', {}))
+            title = properties.get('title') or f"Página{len(spreadsheet.sheets) + 1}"
+            if any(sheet['title'] == title for sheet in spreadsheet.sheets.values()):
+                raise _http_error(400, f'A sheet with the name "{title}" already exists.')
+            sheet_id = properties.get('sheetId', max(spreadsheet.sheets, default=0) + 1)
+            if sheet_id in spreadsheet.sheets:
+                raise _http_error(400, f"Sheet with id {sheet_id} already exists.")
+            spreadsheet.sheets[sheet_id] = {'title': title, 'rows': []}
+            properties.update({'sheetId': sheet_id, 'title': title})
+            return {'addSheet': {'properties': properties}}
+        if 'updateCells' in request:
+            update = request['updateCells']
+            start = update.get('start', {})
+            sheet = self._sheet(spreadsheet, start.get('sheetId', 0))
+            values = [
+                [next(iter(cell.get('userEnteredValue', {'stringValue': ''}).values())) for cell in row.get('values', [])]
+                for row in update.get('rows', [])
+            ]
+            first_row, first_col = start.get('rowIndex', 0), start.get('columnIndex', 0)
+            spreadsheet.write(_a1(sheet['title'], first_row, first_col, first_row, first_col), values)
+            return {}
+        if 'deleteSheet' in request:
+            sheet_id = request['deleteSheet']['sheetId']
+            self._sheet(spreadsheet, sheet_id)
+            if len(spreadsheet.sheets) == 1:
+                raise _http_error(400, "You can't remove all the sheets in a document.")
+            del spreadsheet.sheets[sheet_id]
+            return {}
+        if 'deleteDimension' in request:
+            dimension_range = request['deleteDimension']['range']
+            sheet = self._sheet(spreadsheet, dimension_range['sheetId'])
+            if dimension_range.get('dimension', 'ROWS') != 'ROWS':
+                raise _http_error(400, "Fake backend only supports deleting ROWS.")
+            del sheet['rows'][dimension_range['startIndex']:dimension_range['endIndex']]
+            return {}
+        raise _http_error(400, f"Unsupported request in fake backend: {list(request)}")
+
+
+class FakeSheetsService:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def spreadsheets(self):
+        return _Spreadsheets(self.backend)
+
+
+class _Files:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _file(self, file_id):
+        file = self.backend.files.get(file_id)
+        if file is None:
+            raise _http_error(404, f"File not found: {file_id}.")
+        return file
+
+    def create(self, body, media_body=None, fields=None, **kwargs):
+        def handler():
+            size = media_body.size() if media_body is not None and hasattr(media_body, 'size') else 0
+            file_id = self.backend.create_file(
+                body.get('name', 'Sem título'), body.get('mimeType', 'application/octet-stream'),
+                body.get('parents'), size or 0
+            )
+            return {'id': file_id, 'webViewLink': f"https://drive.google.com/file/d/{file_id}/view"}
+        return FakeRequest(self.backend, 'drive.files.create', handler)
+
+    def get(self, fileId, fields=None, **kwargs):
+        def handler():
+            return dict(self._file(fileId), parents=list(self._file(fileId)['parents']))
+        return FakeRequest(self.backend, 'drive.files.get', handler)
+
+    def update(self, fileId, body=None, addParents=None, removeParents=None, fields=None, **kwargs):
+        def handler():
+            file = self._file(fileId)
+            for key, value in (body or {}).items():
+                file[key] = value
+            if 'name' in (body or {}) and fileId in self.backend.spreadsheets:
+                self.backend.spreadsheets[fileId].title = body['name']
+            if removeParents:
+                removed = set(removeParents.split(','))
+                file['parents'] = [parent for parent in file['parents'] if parent not in removed]
+            if addParents:
+                file['parents'].extend(parent for parent in addParents.split(',') if parent not in file['parents'])
+            self.backend.touch(fileId)
+            return {'id': fileId, 'parents': list(file['parents'])}
+        return FakeRequest(self.backend, 'drive.files.update', handler)
+
+    def list(self, q=None, fields=None, pageSize=100, pageToken=None, **kwargs):
+        def handler():
+            files = [file for file in self.backend.files.values() if self._matches(file, q or '')]
+            start = int(pageToken or 0)
+            page = files[start:start + pageSize]
+            result = {'files': [dict(file, parents=list(file['parents'])) for file in page]}
+            if start + pageSize < len(files):
+                result['nextPageToken'] = str(start + pageSize)
+            return result
+        return FakeRequest(self.backend, 'drive.files.list', handler)
+
+    @staticmethod
+    def _matches(file, query):
+        """Suporta os termos usados no projeto: mimeType='...', name='...', trashed=..., '<id>' in parents."""
+        for clause in re.split(r'\s+and\s+', query.strip()) if query.strip() else []:
+            match = re.match(r"^(mimeType|name)\s*=\s*'(.*)'$", clause)
+            if match:
+                if file[match.group(1)] != match.group(2):
+                    return False
+                continue
+            match = re.match(r"^trashed\s*=\s*(true|false)$", clause)
+            if match:
+                if file['trashed'] != (match.group(1) == 'true'):
+                    return False
+                continue
+            match = re.match(r"^'(.*)'\s+in\s+parents$", clause)
+            if match:
+                if match.group(1) not in file['parents']:
+                    return False
+                continue
+            raise _http_error(400, f"Unsupported query clause in fake backend: {clause}")
+        return True
+
+
+class _Permissions:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def create(self, fileId, body, fields=None, **kwargs):
+        def handler():
+            if fileId not in self.backend.files:
+                raise _http_error(404, f"File not found: {fileId}.")
+            permission_id = self.backend.new_id('permissao')
+            self.backend.permissions.setdefault(fileId, []).append(dict(body, id=permission_id))
+            return {'id': permission_id}
+        return FakeRequest(self.backend, 'drive.permissions.create', handler)
+
+
+class FakeDriveService:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def files(self):
+        return _Files(self.backend)
+
+    def permissions(self):
+        return _Permissions(self.backend)
+
+
+_backend_lock = threading.Lock()
+_backend = None
+
+
+def get_backend():
+    """Retorna o backend fake do processo, criando-o com a planilha matriz e a pasta central na primeira chamada."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = FakeGoogleBackend(**get_fake_backend_settings())
+            _backend.seed_spreadsheet(get_matrix_sheets_id(), 'Planilha Matriz', MATRIX_SHEETS_SEED)
+            _backend.seed_folder(get_central_drive_folder_id(), 'Pasta Central')
+        return _backend
+
+
+def configure(latency_ms=None, error_rate=None, requests_per_minute=None):
+    """Altera a injeção de latência, erros e cota do backend fake em tempo de execução."""
+    get_backend().configure(latency_ms, error_rate, requests_per_minute)
+
+
+def get_call_counts():
+    """Número de chamadas recebidas pelo backend fake, por método da API."""
+    return get_backend().get_call_counts()
+
+
+def build_services():
+    """
+    Retorna (drive_service, sheets_service) ligados ao backend fake do processo ou, com
+    RQ12BR_FAKE_BACKEND_ADDRESS definido, ao backend servido por outro processo.
+    """
+    address = os.environ.get(FAKE_BACKEND_ADDRESS_ENV_VAR)
+    if address:
+        client = _remote_client(address, os.environ.get(FAKE_BACKEND_AUTHKEY_ENV_VAR, ''))
+        return _RemoteRequest(client, 'drive'), _RemoteRequest(client, 'sheets')
+    backend = get_backend()
+    return FakeDriveService(backend), FakeSheetsService(backend)
+
+
+# --- Backend compartilhado entre processos ---
+
+class _BackendServer:
+    """Lado servidor: monta a requisição encadeada no backend do processo e a executa."""
+
+    def execute(self, service, chain):
+        backend = get_backend()
+        target = FakeDriveService(backend) if service == 'drive' else FakeSheetsService(backend)
+        for name, args, kwargs in chain:
+            target = getattr(target, name)(*args, **kwargs)
+        try:
+            return 'ok', target.execute()
+        except HttpError as e:
+            # O HttpError não sobrevive ao pickle; o cliente o recria com o mesmo status e mensagem
+            return 'erro', e.resp.status, e.resp.reason
+
+
+class _BackendManager(BaseManager):
+    pass
+
+
+_server_instance = _BackendServer()
+_BackendManager.register('backend', callable=lambda: _server_instance)
+
+
+def serve(host='127.0.0.1', port=0, authkey=None):
+    """
+    Serve o backend fake deste processo para outros processos, em uma thread em segundo plano.
+    Retorna (endereço "host:porta", chave) para RQ12BR_FAKE_BACKEND_ADDRESS/_AUTHKEY.
+    """
+    authkey = authkey or os.urandom(16).hex()
+    server = _BackendManager(address=(host, port), authkey=authkey.encode()).get_server()
+    threading.Thread(target=server.serve_forever, name="fake-google-servidor", daemon=True).start()
+    return f"{server.address[0]}:{server.address[1]}", authkey
+
+
+_clients = {}
+
+
+def _remote_client(address, authkey):
+    """Conexão (uma por processo e endereço) com o backend servido por `serve()`."""
+    with _backend_lock:
+        if address not in _clients:
+            host, port = address.rsplit(':', 1)
+            manager = _BackendManager(address=(host, int(port)), authkey=authkey.encode())
+            manager.connect()
+            _clients[address] = manager.backend()
+        return _clients[address]
+
+
+class _UploadSize:
+    """Substitui o media_body (arquivo local) no envio ao servidor: o backend só usa o tamanho."""
+
+    def __init__(self, media_body):
+        self._size = media_body.size() if hasattr(media_body, 'size') else 0
+
+    def size(self):
+        return self._size
+
+
+class _RemoteRequest:
+    """
+    Lado cliente: grava o encadeamento (`spreadsheets().values().get(...)`) e o envia
+    ao servidor em `execute()`, como um serviço do googleapiclient.
+    """
+
+    def __init__(self, client, service, chain=()):
+        self._client = client
+        self._service = service
+        self._chain = chain
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            if kwargs.get('media_body') is not None:
+                kwargs['media_body'] = _UploadSize(kwargs['media_body'])
+            return _RemoteRequest(self._client, self._service, self._chain + ((name, args, kwargs),))
+        return call
+
+    def execute(self, http=None, num_retries=0):
+        status, *result = self._client.execute(self._service, self._chain)
+        if status == 'erro':
+            raise _http_error(*result)
+        return result[0]
@@ -1,10 +1,28 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httplib2
+import google_auth_httplib2
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 import streamlit as st
 import tempfile
-from gdrive.config import get_credentials_dict, get_matrix_sheets_id
+from gdrive.config import get_credentials_dict, get_matrix_sheets_id, get_google_backend, INCREMENTAL_SHEETS, SHEET_KEY_COLUMNS
+from gdrive import sheet_cache, quota, row_index
+from gdrive.single_flight import SingleFlight
+
+# Leituras simultâneas da mesma aba (ou da mesma versão de planilha) viram uma só chamada à API
+_reads_in_flight = SingleFlight()
+
+def column_letter(index):
+    """Converte um índice de coluna (0 = A) para a letra usada na notação A1 (ex.: 26 -> AA)."""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
 
 class GoogleDriveUploader:
     """
@@ -12,8 +30,10 @@ class GoogleDriveUploader:
     Opera em dois modos:
     - 'matrix' (is_matrix=True): Para ações na planilha central de gerenciamento.
     - 'user' (is_matrix=False): Para ações na planilha do usuário logado.
+    `spreadsheet_id`/`folder_id` explícitos têm precedência sobre o modo: jobs em
+    segundo plano não têm sessão de onde ler o ambiente do usuário.
     """
-    def __init__(self, is_matrix=False):
+    def __init__(self, is_matrix=False, spreadsheet_id=None, folder_id=None):
         self.SCOPES = [
             'https://www.googleapis.com/auth/drive',
             'https://www.googleapis.com/auth/spreadsheets'
@@ -32,9 +52,18 @@ class GoogleDriveUploader:
             # Modo Usuário: Pega os IDs do ambiente do usuário, carregados na sessão durante o login.
             self.spreadsheet_id = st.session_state.get('current_spreadsheet_id')
             self.folder_id = st.session_state.get('current_folder_id')
+        if spreadsheet_id:
+            self.spreadsheet_id = spreadsheet_id
+        if folder_id:
+            self.folder_id = folder_id
 
     def initialize_services(self):
         """Inicializa os serviços da API do Google usando as credenciais."""
+        if get_google_backend() == "fake":
+            # Dublê em memória das APIs (testes offline e testes de carga)
+            from gdrive import fake_google
+            self.drive_service, self.sheets_service = fake_google.build_services()
+            return
         try:
             credentials_dict = get_credentials_dict()
             self.credentials = service_account.Credentials.from_service_account_info(
@@ -48,19 +77,179 @@ class GoogleDriveUploader:
             raise
 
     def get_data_from_sheet(self, sheet_name):
-        """Busca todos os dados de uma aba específica da planilha selecionada."""
+        """
+        Busca todos os dados de uma aba específica da planilha selecionada.
+        Usa a cópia em cache enquanto a versão da planilha no Drive não mudar.
+        """
         if not self.spreadsheet_id:
             st.error("ID da planilha não definido. Acesso aos dados impossível."); return []
         try:
-            range_name = f"{sheet_name}!A:Z"
-            result = self.sheets_service.spreadsheets().values().get(
-                spreadsheetId=self.spreadsheet_id,
-                range=range_name
-            ).execute()
-            return result.get('values', [])
+            version = self._get_spreadsheet_version()
+            entry = sheet_cache.get_entry(self.spreadsheet_id, sheet_name)
+            if entry is not None and entry.is_valid_for(version):
+                return list(entry.rows)
+            entry = sheet_cache.load_shared(self.spreadsheet_id, sheet_name, version)
+            if entry is not None:
+                return list(entry.rows)
+
+            rows = _reads_in_flight.do(
+                ('aba', self.spreadsheet_id, sheet_name), lambda: self._read_sheet(sheet_name, version)
+            )
+            return list(rows)
         except Exception as e:
             st.error(f"Erro ao ler dados da planilha '{sheet_name}': {e}"); raise
 
+    def get_data_from_sheets(self, sheet_names):
+        """
+        Busca várias abas da planilha selecionada de uma só vez.
+        As abas que não podem ser servidas do cache são lidas juntas em um único
+        `values.batchGet` (nas abas incrementais, apenas o final delas).
+        Retorna {nome_da_aba: linhas}.
+        """
+        if not self.spreadsheet_id:
+            st.error("ID da planilha não definido. Acesso aos dados impossível."); return {name: [] for name in sheet_names}
+        try:
+            version = self._get_spreadsheet_version()
+            data = {}
+            pending = {}  # nome_da_aba -> (entrada estendida ou None para leitura completa, intervalo)
+            for sheet_name in sheet_names:
+                entry = sheet_cache.get_entry(self.spreadsheet_id, sheet_name)
+                if entry is None or not entry.is_valid_for(version):
+                    entry = sheet_cache.load_shared(self.spreadsheet_id, sheet_name, version) or entry
+                if entry is not None and entry.is_valid_for(version):
+                    data[sheet_name] = list(entry.rows)
+                elif sheet_name in INCREMENTAL_SHEETS and entry is not None and not entry.needs_full_resync():
+                    pending[sheet_name] = (entry, f"{sheet_name}!A{len(entry.rows)}:Z")
+                else:
+                    pending[sheet_name] = (None, f"{sheet_name}!A:Z")
+            if not pending:
+                return data
+
+            values = self.batch_get([range_name for _, range_name in pending.values()])
+            for (sheet_name, (entry, _)), rows in zip(pending.items(), values):
+                if entry is None:
+                    data[sheet_name] = sheet_cache.replace_rows(self.spreadsheet_id, sheet_name, rows, version)
+                else:
+                    data[sheet_name] = self._extend_or_reload(sheet_name, entry, rows, version)
+            return data
+        except Exception as e:
+            st.error(f"Erro ao ler dados das abas {', '.join(sheet_names)}: {e}"); raise
+
+    def batch_get(self, ranges, spreadsheet_id=None, major_dimension='ROWS', http=None):
+        """Lê vários intervalos (de uma ou mais abas) da mesma planilha em uma única chamada `values.batchGet`."""
+        result = quota.execute(self.sheets_service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id or self.spreadsheet_id,
+            ranges=list(ranges),
+            majorDimension=major_dimension
+        ), http=http)
+        return [value_range.get('values', []) for value_range in result.get('valueRanges', [])]
+
+    def batch_get_concurrent(self, ranges_by_spreadsheet, major_dimension='ROWS', max_workers=8):
+        """
+        Executa um `values.batchGet` por planilha, em paralelo (limitado a `max_workers`).
+        Retorna {spreadsheet_id: lista de valores por intervalo}; planilhas com erro ficam de fora.
+        """
+        def fetch(spreadsheet_id, ranges):
+            return self.batch_get(ranges, spreadsheet_id, major_dimension, http=self._new_http())
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(fetch, spreadsheet_id, ranges): spreadsheet_id
+                for spreadsheet_id, ranges in ranges_by_spreadsheet.items()
+            }
+            for future, spreadsheet_id in futures.items():
+                try:
+                    results[spreadsheet_id] = future.result()
+                except Exception as e:
+                    print(f"⚠️ Aviso: Falha ao ler a planilha {spreadsheet_id}: {e}")
+        return results
+
+    def get_spreadsheet_versions(self):
+        """
+        Lista a versão de todas as planilhas acessíveis pela conta de serviço
+        com `files.list` paginado (poucas chamadas, independente do número de usuários).
+        """
+        versions = {}
+        page_token = None
+        while True:
+            response = quota.execute(self.drive_service.files().list(
+                q="mimeType='application/vnd.google-apps.spreadsheet' and trashed=false",
+                fields='nextPageToken, files(id, version)',
+                pageSize=1000,
+                pageToken=page_token
+            ))
+            versions.update({f['id']: f.get('version') for f in response.get('files', [])})
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return versions
+
+    def _read_sheet(self, sheet_name, version):
+        """Lê a aba na planilha (só o final, nas abas incrementais) e atualiza o cache."""
+        if sheet_name in INCREMENTAL_SHEETS:
+            return self._read_sheet_incremental(sheet_name, version)
+        rows = self._fetch_values(f"{sheet_name}!A:Z")
+        return sheet_cache.replace_rows(self.spreadsheet_id, sheet_name, rows, version)
+
+    def get_spreadsheet_version(self):
+        """Versão atual da planilha selecionada no Drive (None se a consulta falhar)."""
+        return self._get_spreadsheet_version()
+
+    def _get_spreadsheet_version(self):
+        """
+        Consulta a versão atual da planilha no Drive (chamada de metadados, sem dados).
+        Retorna None se a consulta falhar, o que desativa o cache para esta leitura.
+        """
+        version = sheet_cache.get_known_version(self.spreadsheet_id)
+        if version is not None:
+            return version
+        return _reads_in_flight.do(('versao', self.spreadsheet_id), self._fetch_spreadsheet_version)
+
+    def _fetch_spreadsheet_version(self):
+        try:
+            metadata = quota.execute(self.drive_service.files().get(fileId=self.spreadsheet_id, fields='version'))
+            version = metadata.get('version')
+        except Exception as e:
+            print(f"⚠️ Aviso: Não foi possível consultar a versão da planilha {self.spreadsheet_id}: {e}")
+            version = None
+        sheet_cache.observe_version(self.spreadsheet_id, version)
+        return version
+
+    def _fetch_values(self, range_name):
+        """Lê um intervalo da planilha selecionada e retorna a lista de linhas."""
+        result = quota.execute(self.sheets_service.spreadsheets().values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range=range_name
+        ))
+        return result.get('values', [])
+
+    def _read_sheet_incremental(self, sheet_name, version=None):
+        """
+        Lê uma aba que só cresce por append buscando apenas o final dela.
+        A última linha já conhecida é relida junto com as novas: se ela mudou,
+        houve edição ou remoção de linhas e a aba é ressincronizada por completo.
+        """
+        entry = sheet_cache.get_entry(self.spreadsheet_id, sheet_name)
+        if entry is None or entry.needs_full_resync():
+            rows = self._fetch_values(f"{sheet_name}!A:Z")
+            return sheet_cache.replace_rows(self.spreadsheet_id, sheet_name, rows, version)
+
+        tail = self._fetch_values(f"{sheet_name}!A{len(entry.rows)}:Z")
+        return self._extend_or_reload(sheet_name, entry, tail, version)
+
+    def _extend_or_reload(self, sheet_name, entry, tail, version):
+        """
+        Estende o cache com o final lido da aba (que começa pela última linha já conhecida).
+        Relê a aba inteira se essa linha mudou (edição ou remoção de linhas) ou se a
+        entrada foi descartada do cache durante a leitura.
+        """
+        if tail and tail[0] == entry.rows[-1]:
+            rows = sheet_cache.extend_rows(self.spreadsheet_id, sheet_name, entry.generation, tail[1:], version)
+            if rows is not None:
+                return rows
+        rows = self._fetch_values(f"{sheet_name}!A:Z")
+        return sheet_cache.replace_rows(self.spreadsheet_id, sheet_name, rows, version)
+
     def append_data_to_sheet(self, sheet_name, data_rows):
         """Adiciona uma ou mais linhas ao final de uma aba específica."""
         if not self.spreadsheet_id:
@@ -73,13 +262,16 @@ class GoogleDriveUploader:
             if not data_rows: return None # Não faz nada se não houver dados
 
             body = {'values': data_rows}
-            return self.sheets_service.spreadsheets().values().append(
+            result = quota.execute(self.sheets_service.spreadsheets().values().append(
                 spreadsheetId=self.spreadsheet_id,
                 range=f"{sheet_name}!A:A", # A:A para encontrar a primeira linha vazia
                 valueInputOption='USER_ENTERED',
                 insertDataOption='INSERT_ROWS',
                 body=body
-            ).execute()
+            ), idempotent=False)
+            sheet_cache.note_append(self.spreadsheet_id, sheet_name)
+            row_index.note_append(self.spreadsheet_id, sheet_name, result.get('updates', {}).get('updatedRange'), data_rows)
+            return result
         except Exception as e:
             st.error(f"Erro ao adicionar dados à planilha '{sheet_name}': {e}"); raise
 
@@ -89,69 +281,294 @@ class GoogleDriveUploader:
             st.error("ID da planilha não definido. A atualização de dados falhou."); return None
         try:
             body = {'values': values}
-            return self.sheets_service.spreadsheets().values().update(
+            result = quota.execute(self.sheets_service.spreadsheets().values().update(
                 spreadsheetId=self.spreadsheet_id,
                 range=f"{sheet_name}!{range_name}",
                 valueInputOption='USER_ENTERED',
                 body=body
-            ).execute()
+            ))
+            sheet_cache.note_update(self.spreadsheet_id, sheet_name)
+            return result
         except Exception as e:
             st.error(f"Erro ao atualizar células: {e}"); raise
 
+    def get_rows(self, sheet_name, first_row, last_row):
+        """Lê apenas as linhas [first_row, last_row] (numeração da planilha) de uma aba, sem passar pelo cache."""
+        if not self.spreadsheet_id:
+            st.error("ID da planilha não definido. Acesso aos dados impossível."); return []
+        try:
+            return self._fetch_values(f"{sheet_name}!A{first_row}:Z{last_row}")
+        except Exception as e:
+            st.error(f"Erro ao ler linhas da planilha '{sheet_name}': {e}"); raise
+
+    def delete_rows(self, sheet_name, first_row, end_row):
+        """Remove as linhas [first_row, end_row) (numeração da planilha, 1 = cabeçalho) de uma aba."""
+        if not self.spreadsheet_id:
+            st.error("ID da planilha não definido. A remoção de linhas falhou."); return
+        try:
+            metadata = quota.execute(self.sheets_service.spreadsheets().get(
+                spreadsheetId=self.spreadsheet_id, fields='sheets.properties(sheetId,title)'
+            ))
+            sheet_id = next(
+                sheet['properties']['sheetId'] for sheet in metadata.get('sheets', [])
+                if sheet['properties']['title'] == sheet_name
+            )
+            # Repetir um deleteDimension removeria outras linhas: não é idempotente
+            quota.execute(self.sheets_service.spreadsheets().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={'requests': [{'deleteDimension': {'range': {
+                    'sheetId': sheet_id, 'dimension': 'ROWS',
+                    'startIndex': first_row - 1, 'endIndex': end_row - 1
+                }}}]}
+            ), idempotent=False)
+            sheet_cache.note_update(self.spreadsheet_id, sheet_name)
+            row_index.invalidate(self.spreadsheet_id, sheet_name)
+        except Exception as e:
+            st.error(f"Erro ao remover linhas da planilha '{sheet_name}': {e}"); raise
+
+    def delete_rows_if_unchanged(self, sheet_name, first_row, expected_rows):
+        """
+        Remove as linhas a partir de `first_row` se elas ainda são `expected_rows` (relidas direto
+        da planilha). Retorna se removeu: outra réplica pode ter removido ou alterado essas linhas.
+        """
+        current = self.get_rows(sheet_name, first_row, first_row + len(expected_rows) - 1)
+        if [list(row) for row in current] != [list(row) for row in expected_rows]:
+            print(f"⚠️ Aviso: As linhas da aba '{sheet_name}' mudaram desde a leitura; remoção cancelada.")
+            return False
+        self.delete_rows(sheet_name, first_row, first_row + len(expected_rows))
+        return True
+
+    def find_row(self, sheet_name, key):
+        """
+        Retorna o número da linha (1 = cabeçalho) com a chave em uma aba de SHEET_KEY_COLUMNS,
+        ou None. A chave é o valor da coluna (ex.: email) ou uma tupla, se a chave tem várias colunas.
+        """
+        if not self.spreadsheet_id:
+            st.error("ID da planilha não definido. Acesso aos dados impossível."); return None
+        try:
+            return self._locate_row(sheet_name, key)
+        except Exception as e:
+            st.error(f"Erro ao localizar linha na planilha '{sheet_name}': {e}"); raise
+
+    def update_row_by_key(self, sheet_name, key, values, batch=None):
+        """
+        Atualiza as colunas indicadas ({coluna: valor}) da linha com a chave, sem ler a aba inteira.
+        Com `batch`, a escrita só é agendada no lote. Colunas que a aba não tem (ex.: abas criadas
+        antes de uma coluna nova) são ignoradas com um aviso.
+        Retorna o número da linha, ou None se a chave não existe.
+        """
+        if not self.spreadsheet_id:
+            st.error("ID da planilha não definido. A atualização de dados falhou."); return None
+        try:
+            row_number = self._locate_row(sheet_name, key)
+            if row_number is None:
+                return None
+            header = row_index.get(self.spreadsheet_id, sheet_name).header
+            missing = [column for column in values if column not in header]
+            if missing:
+                print(f"⚠️ Aviso: A aba '{sheet_name}' não tem as colunas {missing}; esses valores não foram gravados.")
+            own_batch = batch is None
+            batch = batch or self.write_batch()
+            for column, value in values.items():
+                if column in missing:
+                    continue
+                batch.update(sheet_name, f"{column_letter(header.index(column))}{row_number}", [[value]])
+            if own_batch:
+                batch.commit()
+            return row_number
+        except Exception as e:
+            st.error(f"Erro ao atualizar linha da planilha '{sheet_name}': {e}"); raise
+
+    def _locate_row(self, sheet_name, key):
+        """
+        Busca a linha da chave no índice e confere, lendo só as células da chave nessa
+        linha, que ela não mudou de lugar. Se mudou (ou a chave não está no índice),
+        remonta o índice a partir das colunas da chave na planilha e busca de novo.
+        """
+        index = row_index.get(self.spreadsheet_id, sheet_name) or self._build_row_index(sheet_name)
+        row_number = index.find(key)
+        if row_number is not None:
+            cells = self.batch_get([
+                f"{sheet_name}!{column_letter(position)}{row_number}" for position in index.positions
+            ])
+            row = [''] * len(index.header)
+            for position, values in zip(index.positions, cells):
+                row[position] = values[0][0] if values and values[0] else ''
+            if index.key_of(row) == index.normalize_key(key):
+                return row_number
+        return self._build_row_index(sheet_name, use_cache=False).find(key)
+
+    def _build_row_index(self, sheet_name, use_cache=True):
+        """
+        Monta o índice chave -> linha de uma aba: a partir do cache da aba, se houver uma
+        cópia limpa, ou lendo só o cabeçalho e as colunas da chave.
+        """
+        key_columns = SHEET_KEY_COLUMNS[sheet_name]
+        entry = sheet_cache.get_entry(self.spreadsheet_id, sheet_name) if use_cache else None
+        if entry is not None and not entry.dirty and entry.rows:
+            rows = list(entry.rows)
+            return row_index.build(self.spreadsheet_id, sheet_name, rows[0], key_columns, rows[1:])
+
+        header = self._fetch_values(f"{sheet_name}!1:1")
+        header = header[0] if header else []
+        missing = [column for column in key_columns if column not in header]
+        if missing:
+            raise ValueError(f"Colunas da chave ausentes na aba '{sheet_name}': {missing}")
+        positions = [header.index(column) for column in key_columns]
+        # Com majorDimension=COLUMNS cada intervalo volta como [[valor_linha2, valor_linha3, ...]]
+        columns = self.batch_get(
+            [f"{sheet_name}!{column_letter(position)}2:{column_letter(position)}" for position in positions],
+            major_dimension='COLUMNS'
+        )
+        column_values = [values[0] if values else [] for values in columns]
+        rows = []
+        for offset in range(max((len(values) for values in column_values), default=0)):
+            row = [''] * len(header)
+            for position, values in zip(positions, column_values):
+                row[position] = values[offset] if offset < len(values) else ''
+            rows.append(row)
+        return row_index.build(self.spreadsheet_id, sheet_name, header, key_columns, rows)
+
+    def write_batch(self):
+        """Abre uma unidade de trabalho para agrupar várias escritas em poucas chamadas à API."""
+        return SheetWriteBatch(self)
+
     def overwrite_sheet(self, sheet_name, dataframe):
         """Apaga todo o conteúdo de uma aba e o substitui pelos dados de um DataFrame."""
         if not self.spreadsheet_id:
             st.error("ID da planilha não definido. A sobrescrita de dados falhou."); return
         try:
             # 1. Limpa a planilha
-            self.sheets_service.spreadsheets().values().clear(
+            quota.execute(self.sheets_service.spreadsheets().values().clear(
                 spreadsheetId=self.spreadsheet_id, range=sheet_name
-            ).execute()
+            ))
             
             # 2. Prepara os novos dados (cabeçalho + linhas)
             values = [dataframe.columns.values.tolist()] + dataframe.values.tolist()
             body = {'values': values}
 
             # 3. Atualiza a planilha a partir da célula A1
-            self.sheets_service.spreadsheets().values().update(
+            quota.execute(self.sheets_service.spreadsheets().values().update(
                 spreadsheetId=self.spreadsheet_id, range=f"{sheet_name}!A1",
                 valueInputOption='RAW', body=body
-            ).execute()
+            ))
+            # Duas escritas: o clear e o update
+            sheet_cache.note_update(self.spreadsheet_id, sheet_name, writes=2)
         except Exception as e:
             st.error(f"Erro ao sobrescrever a planilha '{sheet_name}': {e}"); raise
 
     def create_new_spreadsheet(self, name):
         """Cria uma nova Planilha Google e retorna seu ID. (Função de Admin)"""
         spreadsheet_body = {'properties': {'title': name}}
-        spreadsheet = self.sheets_service.spreadsheets().create(body=spreadsheet_body, fields='spreadsheetId').execute()
+        spreadsheet = quota.execute(self.sheets_service.spreadsheets().create(body=spreadsheet_body, fields='spreadsheetId'), idempotent=False)
         st.info(f"Planilha '{name}' criada com sucesso."); return spreadsheet.get('spreadsheetId')
 
     def setup_sheets_in_new_spreadsheet(self, spreadsheet_id, sheets_config):
         """Cria abas e cabeçalhos em uma nova planilha. (Função de Admin)"""
-        requests = [{'addSheet': {'properties': {'title': name}}} for name in sheets_config.keys()]
-        requests.append({'deleteSheet': {'sheetId': 0}}) # Remove a 'Página1' padrão
-        self.sheets_service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body={'requests': requests}).execute()
-        for name, headers in sheets_config.items():
-            self.sheets_service.spreadsheets().values().append(
-                spreadsheetId=spreadsheet_id, range=f"{name}!A1",
-                valueInputOption='USER_ENTERED', body={'values': [headers]}
-            ).execute()
+        self._setup_tabs_and_headers(spreadsheet_id, sheets_config)
         st.info("Abas e cabeçalhos configurados na nova planilha.")
 
+    def _setup_tabs_and_headers(self, spreadsheet_id, sheets_config, http=None):
+        """Cria todas as abas, grava os cabeçalhos e remove a aba padrão em um único batchUpdate."""
+        requests = []
+        for sheet_id, (name, headers) in enumerate(sheets_config.items(), start=1):
+            requests.append({'addSheet': {'properties': {'sheetId': sheet_id, 'title': name}}})
+            requests.append({'updateCells': {
+                'start': {'sheetId': sheet_id, 'rowIndex': 0, 'columnIndex': 0},
+                'rows': [{'values': [{'userEnteredValue': {'stringValue': str(h)}} for h in headers]}],
+                'fields': 'userEnteredValue'
+            }})
+        requests.append({'deleteSheet': {'sheetId': 0}}) # Remove a 'Página1' padrão
+        quota.execute(self.sheets_service.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id, body={'requests': requests}
+        ), http=http)
+
+    def ensure_sheet(self, sheet_name, headers):
+        """Cria a aba (com cabeçalho) na planilha selecionada caso ela ainda não exista."""
+        metadata = quota.execute(self.sheets_service.spreadsheets().get(
+            spreadsheetId=self.spreadsheet_id, fields='sheets.properties.title'
+        ))
+        titles = [sheet['properties']['title'] for sheet in metadata.get('sheets', [])]
+        if sheet_name in titles:
+            return False
+        quota.execute(self.sheets_service.spreadsheets().batchUpdate(
+            spreadsheetId=self.spreadsheet_id, body={'requests': [{'addSheet': {'properties': {'title': sheet_name}}}]}
+        ))
+        self.update_cells(sheet_name, "A1", [headers])
+        return True
+
+    def rename_files(self, names_by_id):
+        """Renomeia vários arquivos/pastas do Drive em paralelo. (Função de Admin)"""
+        def rename(file_id, name):
+            quota.execute(self.drive_service.files().update(fileId=file_id, body={'name': name}, fields='id'), http=self._new_http())
+        with ThreadPoolExecutor(max_workers=max(1, len(names_by_id))) as executor:
+            for future in [executor.submit(rename, file_id, name) for file_id, name in names_by_id.items()]:
+                future.result()
+
+    def trash_files(self, file_ids):
+        """Move arquivos/pastas do Drive para a lixeira. (Função de Admin)"""
+        for file_id in file_ids:
+            quota.execute(self.drive_service.files().update(fileId=file_id, body={'trashed': True}, fields='id'))
+
+    def _new_http(self):
+        """Cria um cliente HTTP autorizado exclusivo para uma thread (o httplib2 não é thread-safe)."""
+        if self.credentials is None:
+            return None  # backend fake: não há HTTP
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http())
+
+    def provision_environment(self, spreadsheet_name, folder_name, sheets_config, parent_folder_id):
+        """
+        Cria pasta e planilha (com abas e cabeçalhos) de um novo ambiente em duas etapas concorrentes:
+        1. cria a pasta do usuário e a planilha (já dentro da pasta central) ao mesmo tempo;
+        2. move a planilha para a pasta do usuário enquanto abas e cabeçalhos são gravados em um único lote.
+        Retorna (spreadsheet_id, folder_id, tempos_por_etapa_em_segundos). (Função de Admin)
+        """
+        timings = {}
+
+        def timed(stage, func, *args):
+            start = time.perf_counter()
+            try:
+                return func(*args, http=self._new_http())
+            finally:
+                timings[stage] = time.perf_counter() - start
+
+        pipeline_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            folder_future = executor.submit(timed, 'criar_pasta', self._create_file, folder_name, 'application/vnd.google-apps.folder', parent_folder_id)
+            sheet_future = executor.submit(timed, 'criar_planilha', self._create_file, spreadsheet_name, 'application/vnd.google-apps.spreadsheet', parent_folder_id)
+            folder_id, spreadsheet_id = folder_future.result(), sheet_future.result()
+
+            move_future = executor.submit(timed, 'mover_planilha', self._reparent_file, spreadsheet_id, parent_folder_id, folder_id)
+            setup_future = executor.submit(timed, 'configurar_abas', self._setup_tabs_and_headers, spreadsheet_id, sheets_config)
+            move_future.result(); setup_future.result()
+        timings['total'] = time.perf_counter() - pipeline_start
+        return spreadsheet_id, folder_id, timings
+
+    def _create_file(self, name, mime_type, parent_folder_id, http=None):
+        """Cria um arquivo vazio do Google (pasta, planilha...) diretamente dentro de uma pasta."""
+        file_metadata = {'name': name, 'mimeType': mime_type, 'parents': [parent_folder_id]}
+        return quota.execute(self.drive_service.files().create(body=file_metadata, fields='id'), http=http, idempotent=False).get('id')
+
+    def _reparent_file(self, file_id, current_parent_id, new_parent_id, http=None):
+        """Move um arquivo cujo pai atual já é conhecido, sem consultar os pais com files.get."""
+        quota.execute(self.drive_service.files().update(
+            fileId=file_id, addParents=new_parent_id, removeParents=current_parent_id, fields='id'
+        ), http=http)
+
     def create_drive_folder(self, name, parent_folder_id=None):
         """Cria uma nova pasta no Google Drive. (Função de Admin)"""
         file_metadata = {'name': name, 'mimeType': 'application/vnd.google-apps.folder'}
         if parent_folder_id: file_metadata['parents'] = [parent_folder_id]
-        folder = self.drive_service.files().create(body=file_metadata, fields='id').execute()
+        folder = quota.execute(self.drive_service.files().create(body=file_metadata, fields='id'), idempotent=False)
         st.info(f"Pasta '{name}' criada com sucesso no Google Drive."); return folder.get('id')
 
     def move_file_to_folder(self, file_id, folder_id):
         """Move um arquivo para uma pasta específica no Drive. (Função de Admin)"""
-        file = self.drive_service.files().get(fileId=file_id, fields='parents').execute()
+        file = quota.execute(self.drive_service.files().get(fileId=file_id, fields='parents'))
         previous_parents = ",".join(file.get('parents'))
-        self.drive_service.files().update(
+        quota.execute(self.drive_service.files().update(
             fileId=file_id, addParents=folder_id, removeParents=previous_parents, fields='id, parents'
-        ).execute()
+        ))
         st.info("Arquivo movido para a pasta de destino.")
 
     def upload_file(self, arquivo, novo_nome=None):
@@ -166,12 +583,69 @@ class GoogleDriveUploader:
         try:
             file_metadata = {'name': novo_nome or arquivo.name, 'parents': [self.folder_id]}
             media = MediaFileUpload(tmp_path, mimetype=arquivo.type)
-            file = self.drive_service.files().create(body=file_metadata, media_body=media, fields='id,webViewLink').execute()
+            file = quota.execute(self.drive_service.files().create(body=file_metadata, media_body=media, fields='id,webViewLink'), idempotent=False)
             return file.get('webViewLink')
         finally:
             if os.path.exists(tmp_path):
                 os.remove(tmp_path) # Garante que o arquivo temporário seja removido
 
+    def upload_local_file(self, path, name, mimetype='image/png', check_existing=True, http=None):
+        """
+        Envia um arquivo do disco para a pasta do usuário e retorna o link de visualização.
+        Idempotente pelo nome: se a pasta já tem um arquivo com esse nome (envio anterior
+        interrompido antes de ser confirmado), o link dele é retornado sem novo upload.
+        Com check_existing=False a busca é pulada (quem chama já listou a pasta).
+        """
+        if not self.folder_id: st.error("ID da pasta do usuário não definido. Upload falhou."); return None
+        try:
+            if check_existing:
+                escaped_name = name.replace("\\", "\\\\").replace("'", "\\'")
+                existing = quota.execute(self.drive_service.files().list(
+                    q=f"name='{escaped_name}' and '{self.folder_id}' in parents and trashed=false",
+                    fields='files(id, webViewLink)', pageSize=1
+                ), http=http).get('files', [])
+                if existing:
+                    return existing[0].get('webViewLink')
+            file_metadata = {'name': name, 'parents': [self.folder_id]}
+            media = MediaFileUpload(path, mimetype=mimetype)
+            file = quota.execute(self.drive_service.files().create(body=file_metadata, media_body=media, fields='id,webViewLink'), http=http, idempotent=False)
+            return file.get('webViewLink')
+        except Exception as e:
+            st.error(f"Erro ao enviar o arquivo '{name}': {e}"); raise
+
+    def list_folder_files(self):
+        """Retorna {nome: link de visualização} dos arquivos (fora da lixeira) da pasta do usuário."""
+        if not self.folder_id: st.error("ID da pasta do usuário não definido. Acesso aos arquivos impossível."); return {}
+        files, page_token = {}, None
+        while True:
+            result = quota.execute(self.drive_service.files().list(
+                q=f"'{self.folder_id}' in parents and trashed=false",
+                fields='nextPageToken, files(name, webViewLink)', pageSize=1000, pageToken=page_token
+            ))
+            for file in result.get('files', []):
+                files.setdefault(file['name'], file.get('webViewLink'))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return files
+
+    def upload_local_files(self, files, max_workers=8):
+        """
+        Envia vários arquivos do disco ([(caminho, nome)]) para a pasta do usuário, em
+        paralelo (limitado a `max_workers`). Retorna {nome: link}; arquivos com erro ficam de fora.
+        """
+        def upload(path, name):
+            return self.upload_local_file(path, name, check_existing=False, http=self._new_http())
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(upload, path, name): name for path, name in files}
+            for future, name in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"⚠️ Aviso: Falha ao enviar o arquivo {name}: {e}")
+        return results
+
     def upload_image_and_get_direct_link(self, image_file, novo_nome=None):
         """Faz upload de uma imagem, torna-a pública e retorna um link de visualização direta."""
         if not self.folder_id: st.error("ID da pasta do usuário não definido. Upload de imagem falhou."); return None
@@ -184,12 +658,85 @@ class GoogleDriveUploader:
         try:
             file_metadata = {'name': novo_nome, 'parents': [self.folder_id]}
             media = MediaFileUpload(tmp_path, mimetype='image/jpeg')
-            file = self.drive_service.files().create(body=file_metadata, media_body=media, fields='id').execute()
+            file = quota.execute(self.drive_service.files().create(body=file_metadata, media_body=media, fields='id'), idempotent=False)
             
             file_id = file.get('id')
-            self.drive_service.permissions().create(fileId=file_id, body={'type': 'anyone', 'role': 'reader'}).execute()
+            quota.execute(self.drive_service.permissions().create(fileId=file_id, body={'type': 'anyone', 'role': 'reader'}))
             
             return f"https://drive.google.com/uc?export=view&id={file_id}"
         finally:
             if os.path.exists(tmp_path):
-                os.remove(tmp_path)
\ No newline at end of file
+                os.remove(tmp_path)
+
+
+class SheetWriteBatch:
+    """
+    Acumula atualizações de intervalos e appends (em uma ou mais abas) e os envia no commit:
+    - todas as atualizações de uma planilha vão em um único `values.batchUpdate`;
+    - os appends são agrupados por aba em um único `values.append` cada, pois só o
+      append do Sheets encontra a primeira linha livre de forma atômica no servidor.
+    """
+    def __init__(self, uploader):
+        self.uploader = uploader
+        self._updates = {}  # spreadsheet_id -> [(sheet_name, range_name, values)]
+        self._appends = {}  # (spreadsheet_id, sheet_name) -> [linhas]
+
+    def update(self, sheet_name, range_name, values, spreadsheet_id=None):
+        """Agenda a atualização de um intervalo (ex.: 'H5' ou 'C5:E5')."""
+        spreadsheet_id = spreadsheet_id or self.uploader.spreadsheet_id
+        self._updates.setdefault(spreadsheet_id, []).append((sheet_name, range_name, values))
+        return self
+
+    def append(self, sheet_name, data_rows, spreadsheet_id=None):
+        """Agenda uma ou mais linhas para serem adicionadas ao final da aba."""
+        if data_rows and not isinstance(data_rows[0], list): data_rows = [data_rows]
+        spreadsheet_id = spreadsheet_id or self.uploader.spreadsheet_id
+        self._appends.setdefault((spreadsheet_id, sheet_name), []).extend(data_rows)
+        return self
+
+    def is_empty(self):
+        return not self._updates and not self._appends
+
+    def commit(self):
+        """
+        Envia as escritas agendadas e retorna um resumo do que foi gravado:
+        {'updated_ranges': [...], 'updated_cells': int, 'appended_ranges': [...], 'api_calls': int}
+        """
+        result = {'updated_ranges': [], 'updated_cells': 0, 'appended_ranges': [], 'api_calls': 0}
+        if None in self._updates or any(sheet_id is None for sheet_id, _ in self._appends):
+            st.error("ID da planilha não definido. A gravação em lote falhou."); return result
+        sheets_values = self.uploader.sheets_service.spreadsheets().values()
+        try:
+            for spreadsheet_id, updates in self._updates.items():
+                body = {
+                    'valueInputOption': 'USER_ENTERED',
+                    'data': [
+                        {'range': f"{sheet_name}!{range_name}", 'values': values}
+                        for sheet_name, range_name, values in updates
+                    ]
+                }
+                response = quota.execute(sheets_values.batchUpdate(spreadsheetId=spreadsheet_id, body=body))
+                result['api_calls'] += 1
+                result['updated_cells'] += response.get('totalUpdatedCells', 0)
+                result['updated_ranges'].extend(r.get('updatedRange') for r in response.get('responses', []))
+                # Um único batchUpdate, por mais abas que ele toque
+                for position, sheet_name in enumerate({sheet_name for sheet_name, _, _ in updates}):
+                    sheet_cache.note_update(spreadsheet_id, sheet_name, writes=1 if position == 0 else 0)
+
+            for (spreadsheet_id, sheet_name), rows in self._appends.items():
+                response = quota.execute(sheets_values.append(
+                    spreadsheetId=spreadsheet_id,
+                    range=f"{sheet_name}!A:A",
+                    valueInputOption='USER_ENTERED',
+                    insertDataOption='INSERT_ROWS',
+                    body={'values': rows}
+                ), idempotent=False)
+                result['api_calls'] += 1
+                result['appended_ranges'].append(response.get('updates', {}).get('updatedRange'))
+                sheet_cache.note_append(spreadsheet_id, sheet_name)
+                row_index.note_append(spreadsheet_id, sheet_name, response.get('updates', {}).get('updatedRange'), rows)
+        except Exception as e:
+            st.error(f"Erro ao gravar alterações em lote: {e}"); raise
+        finally:
+            self._updates, self._appends = {}, {}
+        return result
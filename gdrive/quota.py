@@ -0,0 +1,174 @@
+"""
+Execução das chamadas às APIs do Google respeitando a cota do projeto.
+
+Todas as requisições do GoogleDriveUploader passam por `execute()`, que:
+- aguarda um token de um limitador compartilhado (token bucket) dimensionado
+  para a cota de requisições por minuto do projeto;
+- repete erros temporários (429 e 5xx) com backoff exponencial com jitter;
+- usa um circuit breaker que falha imediatamente enquanto a API está fora do ar.
+As métricas de espera por cota e o estado do breaker ficam em `get_metrics()`.
+"""
+import random
+import socket
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+
+from gdrive.config import (
+    get_requests_per_minute, API_MAX_RETRIES, API_BACKOFF_BASE_SECONDS, API_BACKOFF_MAX_SECONDS,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_RESET_SECONDS
+)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """A API do Google está indisponível e o circuit breaker está aberto."""
+
+
+class TokenBucket:
+    """Limitador de taxa: libera no máximo `rate_per_minute` requisições por minuto, com rajadas até `capacity`."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity or max(1, rate_per_minute // 6)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Bloqueia até haver um token disponível e retorna quanto tempo esperou (em segundos)."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate_per_second
+            time.sleep(wait)
+            waited += wait
+
+
+class CircuitBreaker:
+    """Abre após falhas consecutivas, rejeita chamadas por um tempo e depois deixa uma passar como teste."""
+
+    CLOSED, OPEN, HALF_OPEN = 'fechado', 'aberto', 'meio_aberto'
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return
+            # Aberto dentro do tempo de espera, ou meio aberto com a chamada de teste ainda em andamento
+            if self.state == self.HALF_OPEN or time.monotonic() - self.opened_at < self.reset_seconds:
+                raise CircuitOpenError("API do Google temporariamente indisponível. Tente novamente em instantes.")
+            self.state = self.HALF_OPEN
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+_lock = threading.Lock()
+_bucket = None
+_breaker = CircuitBreaker(CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_RESET_SECONDS)
+_metrics = {
+    'requisicoes': 0,
+    'esperas_por_cota': 0,
+    'segundos_esperando_cota': 0.0,
+    'tentativas_repetidas': 0,
+    'falhas': 0,
+    'rejeitadas_pelo_breaker': 0,
+}
+
+
+def _get_bucket():
+    global _bucket
+    with _lock:
+        if _bucket is None:
+            _bucket = TokenBucket(get_requests_per_minute())
+        return _bucket
+
+
+def _count(metric, amount=1):
+    with _lock:
+        _metrics[metric] += amount
+
+
+def _is_transient(error):
+    """Erros que indicam cota esgotada ou indisponibilidade temporária da API."""
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUS
+    return isinstance(error, (socket.timeout, ConnectionError, TimeoutError))
+
+
+def _can_retry(error, idempotent):
+    # Sem idempotência só o 429 é seguro: a requisição foi recusada antes de ser processada
+    return idempotent or (isinstance(error, HttpError) and error.resp.status == 429)
+
+
+def execute(request, http=None, idempotent=True):
+    """
+    Executa uma requisição da API do Google com limite de taxa, repetição e circuit breaker.
+    Use idempotent=False para appends e criações, que não podem ser repetidos após um 5xx.
+    """
+    try:
+        _breaker.before_call()
+    except CircuitOpenError:
+        _count('rejeitadas_pelo_breaker')
+        raise
+
+    for attempt in range(API_MAX_RETRIES + 1):
+        waited = _get_bucket().acquire()
+        if waited:
+            _count('esperas_por_cota')
+            _count('segundos_esperando_cota', waited)
+        _count('requisicoes')
+        try:
+            result = request.execute(http=http)
+        except Exception as e:
+            if not _is_transient(e):
+                # Erro definitivo (ex.: 404): a API respondeu, então não conta como indisponibilidade
+                _breaker.record_success()
+                raise
+            _count('falhas')
+            _breaker.record_failure()
+            if not _can_retry(e, idempotent) or attempt == API_MAX_RETRIES or _breaker.state == CircuitBreaker.OPEN:
+                raise
+            _count('tentativas_repetidas')
+            backoff = min(API_BACKOFF_MAX_SECONDS, API_BACKOFF_BASE_SECONDS * (2 ** attempt))
+            time.sleep(random.uniform(0, backoff))
+            continue
+        _breaker.record_success()
+        return result
+
+
+def get_metrics():
+    """Retorna uma cópia das métricas de uso da cota e o estado atual do circuit breaker."""
+    with _lock:
+        metrics = dict(_metrics)
+    metrics['estado_breaker'] = _breaker.state
+    metrics['aberturas_breaker'] = _breaker.times_opened
+    return metrics
@@ -0,0 +1,89 @@
+"""
+Índice chave -> número da linha das abas, por planilha (local ao processo).
+
+As abas configuradas em SHEET_KEY_COLUMNS (usuários por email, avaliações e
+projetos pelo id, chamados de suporte por data + email) ganham um índice que
+permite atualizar uma linha pela chave sem reler a aba inteira. O índice é
+montado uma vez (a partir do cache de abas ou lendo só as colunas da chave) e
+acompanha os appends pelo intervalo devolvido pela API (`updatedRange`).
+Remoções de linhas descartam o índice da aba.
+"""
+import re
+import threading
+
+_lock = threading.Lock()
+_indexes = {}  # (spreadsheet_id, nome_da_aba) -> SheetRowIndex
+
+_RANGE_FIRST_ROW = re.compile(r'![A-Z]+(\d+)')
+
+
+class SheetRowIndex:
+    """Posição das colunas da chave no cabeçalho e o número da linha de cada chave."""
+
+    def __init__(self, header, key_columns):
+        self.header = list(header)
+        self.key_columns = tuple(key_columns)
+        self.positions = [self.header.index(column) for column in self.key_columns]
+        self.rows_by_key = {}
+
+    def key_of(self, row):
+        """Chave de uma linha: o valor da coluna, ou uma tupla quando a chave tem várias colunas."""
+        return self.normalize_key(tuple(row[position] if position < len(row) else '' for position in self.positions))
+
+    def normalize_key(self, key):
+        """Normaliza uma chave (valor ou tupla) para a busca: sem espaços nas pontas e sem diferenciar maiúsculas."""
+        values = key if isinstance(key, tuple) else (key,)
+        values = tuple(str(value).strip().lower() for value in values)
+        return values[0] if len(values) == 1 else values
+
+    def find(self, key):
+        return self.rows_by_key.get(self.normalize_key(key))
+
+    def add_rows(self, rows, first_row_number):
+        for row_number, row in enumerate(rows, start=first_row_number):
+            key = self.key_of(row)
+            if all(key) if isinstance(key, tuple) else key:
+                # Chaves repetidas: vale a primeira linha, como nas buscas por máscara do DataFrame
+                self.rows_by_key.setdefault(key, row_number)
+
+
+def parse_first_row(updated_range):
+    """Número da primeira linha de um intervalo A1 devolvido pela API (ex.: 'usuarios!A15:L16' -> 15)."""
+    match = _RANGE_FIRST_ROW.search(updated_range or '')
+    return int(match.group(1)) if match else None
+
+
+def get(spreadsheet_id, sheet_name):
+    with _lock:
+        return _indexes.get((spreadsheet_id, sheet_name))
+
+
+def build(spreadsheet_id, sheet_name, header, key_columns, data_rows):
+    """Monta o índice a partir do cabeçalho e das linhas de dados (a partir da linha 2)."""
+    index = SheetRowIndex(header, key_columns)
+    index.add_rows(data_rows, 2)
+    with _lock:
+        _indexes[(spreadsheet_id, sheet_name)] = index
+    return index
+
+
+def note_append(spreadsheet_id, sheet_name, updated_range, rows):
+    """Registra no índice (se ele existir) as linhas gravadas por um append."""
+    first_row = parse_first_row(updated_range)
+    with _lock:
+        index = _indexes.get((spreadsheet_id, sheet_name))
+        if index is None:
+            return
+        if first_row is None:
+            # Sem a posição das linhas novas o índice não pode ser estendido com segurança
+            _indexes.pop((spreadsheet_id, sheet_name), None)
+            return
+        index.add_rows(rows, first_row)
+
+
+def invalidate(spreadsheet_id, sheet_name=None):
+    """Descarta o índice de uma aba (ou de todas as abas da planilha)."""
+    with _lock:
+        for key in [key for key in _indexes if key[0] == spreadsheet_id]:
+            if sheet_name is None or key[1] == sheet_name:
+                del _indexes[key]
@@ -0,0 +1,213 @@
+"""
+Cache local (por processo) das linhas lidas das abas do Google Sheets.
+
+Cada aba é identificada por (spreadsheet_id, nome_da_aba). A entrada guarda as
+linhas já vistas, a versão da planilha (campo `version` do Drive) em que foram
+lidas, uma "geração" que muda a cada ressincronização completa e o momento da
+última sincronização. O GoogleDriveUploader serve a cópia local enquanto a
+versão da planilha não muda e, nas abas incrementais, busca apenas as linhas
+novas do final da aba.
+
+Com o backend de cache compartilhado em disco (gdrive/cache_backend.py), as
+linhas lidas também são publicadas com a versão da planilha, e outra réplica
+que precise da mesma aba na mesma versão as aproveita sem chamar a API.
+"""
+import threading
+import time
+
+from gdrive import cache_backend
+from gdrive.config import INCREMENTAL_FULL_RESYNC_SECONDS, NO_REBASE_SHEETS, SHEET_CACHE_REVALIDATE_SECONDS
+
+_lock = threading.Lock()
+_entries = {}
+# spreadsheet_id -> {'version', 'checked_at', 'rebase_from', 'own_writes'}
+_revisions = {}
+
+
+class SheetCacheEntry:
+    """Cópia local de uma aba: linhas, versão, geração e estado de sincronização."""
+
+    def __init__(self, rows, generation, version):
+        self.rows = rows
+        self.generation = generation
+        self.version = version
+        self.synced_at = time.monotonic()
+        self.dirty = False
+
+    def is_valid_for(self, version):
+        """Indica se a cópia pode ser servida sem nenhuma leitura na planilha."""
+        return version is not None and not self.dirty and self.version == version
+
+    def needs_full_resync(self):
+        """Indica se a cópia local não pode mais ser estendida apenas com o final da aba."""
+        if self.dirty or not self.rows:
+            return True
+        return time.monotonic() - self.synced_at > INCREMENTAL_FULL_RESYNC_SECONDS
+
+
+def get_entry(spreadsheet_id, sheet_name):
+    """Retorna a entrada em cache de uma aba (ou None se ainda não foi lida)."""
+    with _lock:
+        return _entries.get((spreadsheet_id, sheet_name))
+
+
+def replace_rows(spreadsheet_id, sheet_name, rows, version=None, publish=True):
+    """Substitui a cópia local de uma aba após uma leitura completa e retorna as linhas."""
+    key = (spreadsheet_id, sheet_name)
+    with _lock:
+        previous = _entries.get(key)
+        generation = previous.generation + 1 if previous else 1
+        _entries[key] = SheetCacheEntry(list(rows), generation, version)
+    if publish:
+        _publish(spreadsheet_id, sheet_name, rows, version)
+    return list(rows)
+
+
+def extend_rows(spreadsheet_id, sheet_name, generation, new_rows, version=None):
+    """
+    Acrescenta ao cache as linhas novas lidas do final da aba e retorna a aba inteira.
+    Se outra thread ressincronizou a aba nesse meio tempo, mantém a versão dela.
+    Retorna None se a entrada foi descartada (ex.: `invalidate`) durante a leitura:
+    as linhas novas sozinhas não formam a aba, e quem chama deve relê-la inteira.
+    """
+    key = (spreadsheet_id, sheet_name)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        extended = entry.generation == generation
+        if extended:
+            entry.rows.extend(new_rows)
+            entry.version = version
+        rows = list(entry.rows)
+    if extended:
+        _publish(spreadsheet_id, sheet_name, rows, version)
+    return rows
+
+
+def _shared_key(spreadsheet_id, sheet_name):
+    return ('aba', spreadsheet_id, sheet_name)
+
+
+def _namespace(spreadsheet_id):
+    return f"planilha:{spreadsheet_id}"
+
+
+def _publish(spreadsheet_id, sheet_name, rows, version):
+    """Grava as linhas no backend compartilhado (só com versão conhecida e backend entre réplicas)."""
+    backend = cache_backend.get_backend()
+    if version is None or not backend.shared:
+        return
+    backend.set(_shared_key(spreadsheet_id, sheet_name), {
+        'version': version, 'stamp': backend.get_stamp(_namespace(spreadsheet_id)), 'rows': list(rows)
+    })
+
+
+def load_shared(spreadsheet_id, sheet_name, version):
+    """
+    Instala como cópia local as linhas publicadas por outra réplica para esta versão
+    da planilha e retorna a entrada, ou None se não há cópia compartilhada válida.
+    """
+    backend = cache_backend.get_backend()
+    if version is None or not backend.shared:
+        return None
+    stored = backend.get(_shared_key(spreadsheet_id, sheet_name))
+    if not stored or stored['version'] != version or stored['stamp'] != backend.get_stamp(_namespace(spreadsheet_id)):
+        return None
+    replace_rows(spreadsheet_id, sheet_name, stored['rows'], version, publish=False)
+    return get_entry(spreadsheet_id, sheet_name)
+
+
+def get_known_version(spreadsheet_id):
+    """Retorna a versão da planilha se ela foi conferida há poucos segundos, senão None."""
+    with _lock:
+        revision = _revisions.get(spreadsheet_id)
+        if revision is None or revision['version'] is None:
+            return None
+        if time.monotonic() - revision['checked_at'] > SHEET_CACHE_REVALIDATE_SECONDS:
+            return None
+        return revision['version']
+
+
+def observe_version(spreadsheet_id, version):
+    """
+    Registra a versão atual da planilha consultada no Drive.
+    Se a mudança de versão foi causada só por escritas deste processo (a versão
+    subiu exatamente o número de escritas feitas), as abas que não foram tocadas
+    por elas continuam válidas e passam para a nova versão. Qualquer diferença
+    indica escritas de outra réplica (ou manuais): nada é reaproveitado e as
+    abas são revalidadas. As abas de NO_REBASE_SHEETS são sempre revalidadas.
+    """
+    with _lock:
+        revision = _revisions.get(spreadsheet_id, {})
+        rebase_from = revision.get('rebase_from')
+        if rebase_from is not None and _version_delta(rebase_from, version) == revision.get('own_writes', 0):
+            for (entry_sheet_id, entry_sheet), entry in _entries.items():
+                if entry_sheet in NO_REBASE_SHEETS:
+                    continue
+                if entry_sheet_id == spreadsheet_id and entry.version == rebase_from and not entry.dirty:
+                    entry.version = version
+        _revisions[spreadsheet_id] = {
+            'version': version, 'checked_at': time.monotonic(), 'rebase_from': None, 'own_writes': 0
+        }
+
+
+def _version_delta(old_version, new_version):
+    """Diferença entre duas versões do Drive (números em texto), ou None se não forem comparáveis."""
+    try:
+        return int(new_version) - int(old_version)
+    except (TypeError, ValueError):
+        return None
+
+
+def _expect_own_revision(spreadsheet_id, writes):
+    """Marca que a próxima mudança de versão da planilha inclui `writes` escritas deste processo."""
+    revision = _revisions.get(spreadsheet_id)
+    if revision is None:
+        return
+    if revision.get('rebase_from') is None:
+        revision['rebase_from'] = revision['version']
+        revision['own_writes'] = 0
+    revision['own_writes'] += writes
+    revision['checked_at'] = float('-inf')
+
+
+def note_append(spreadsheet_id, sheet_name, writes=1):
+    """
+    Invalida apenas a aba que recebeu linhas novas; ela poderá ser estendida pelo final.
+    `writes` é o número de chamadas de escrita à API que a alteração custou.
+    """
+    with _lock:
+        entry = _entries.get((spreadsheet_id, sheet_name))
+        if entry is not None:
+            entry.version = None
+        _expect_own_revision(spreadsheet_id, writes)
+
+
+def note_update(spreadsheet_id, sheet_name, writes=1):
+    """
+    Invalida apenas a aba que teve células editadas, forçando uma releitura completa.
+    Use writes=0 para as demais abas de uma mesma chamada de escrita (ex.: batchUpdate).
+    """
+    with _lock:
+        entry = _entries.get((spreadsheet_id, sheet_name))
+        if entry is not None:
+            entry.dirty = True
+        _expect_own_revision(spreadsheet_id, writes)
+
+
+def invalidate(spreadsheet_id, sheet_names=None):
+    """
+    Descarta a cópia local de uma planilha (todas as abas) ou só das abas indicadas.
+    Afeta apenas essa planilha: as abas dos outros usuários continuam em cache.
+    As cópias dessa planilha no backend compartilhado também deixam de valer.
+    """
+    with _lock:
+        for key in [key for key in _entries if key[0] == spreadsheet_id]:
+            if sheet_names is None or key[1] in sheet_names:
+                del _entries[key]
+        if sheet_names is None:
+            _revisions.pop(spreadsheet_id, None)
+    backend = cache_backend.get_backend()
+    if backend.shared:
+        backend.bump_stamp(_namespace(spreadsheet_id))
@@ -0,0 +1,161 @@
+"""
+Esquemas declarativos das abas e conversão das linhas lidas em DataFrames tipados.
+
+O Sheets devolve tudo como texto. Cada `SheetSchema` descreve as colunas de uma
+aba (tipo, valor padrão e formato de data) e `load()` converte as linhas de uma
+vez, coluna a coluna: textos curtos repetidos viram categorias, medidas viram
+float, datas viram datas. O índice do DataFrame é o número da linha na planilha
+(a linha 1 é o cabeçalho), o que permite atualizar uma linha sem recalcular a posição.
+"""
+from dataclasses import dataclass
+from datetime import date
+
+import pandas as pd
+
+from gdrive.config import USERS_SHEET_NAME, AVALIACOES_ESCADAS_SHEET_NAME, PROJETOS_ESCADAS_SHEET_NAME
+
+TRUE_VALUES = {'true', 'verdadeiro', 'sim', '1'}
+
+
+@dataclass(frozen=True)
+class Column:
+    """
+    Coluna de uma aba. `dtype` é um de: 'str', 'category', 'float', 'int', 'bool',
+    'date' (datetime.date, comparável com date.today()) ou 'datetime' (datetime64).
+    `default` (ou uma função que o gera) preenche a coluna quando ela não existe na aba.
+    """
+    name: str
+    dtype: str = 'str'
+    default: object = ''
+    lower: bool = False
+    dayfirst: bool = False
+
+
+class SheetSchema:
+    """Colunas esperadas de uma aba, na ordem em que aparecem no DataFrame."""
+
+    def __init__(self, columns, required=()):
+        self.columns = list(columns)
+        self.required = tuple(required)
+
+    @property
+    def names(self):
+        return [column.name for column in self.columns]
+
+    def empty_frame(self):
+        return self._convert(pd.DataFrame({name: pd.Series(dtype=object) for name in self.names}))
+
+    def load(self, data):
+        """
+        Converte os valores da aba (cabeçalho + linhas) em um DataFrame tipado.
+        Linhas totalmente vazias são descartadas. Levanta ValueError se faltar
+        uma coluna obrigatória no cabeçalho.
+        """
+        if not data or len(data) < 2:
+            return self.empty_frame()
+        header = [str(name).strip() for name in data[0]]
+        missing = [name for name in self.required if name not in header]
+        if missing:
+            raise ValueError(f"Colunas essenciais ausentes na planilha: {missing}")
+
+        # Linhas com menos células que o cabeçalho são completadas com None pelo construtor
+        raw = pd.DataFrame(data[1:], index=range(2, len(data) + 1))
+        raw = raw.reindex(columns=range(len(header)))
+        raw.columns = header
+        raw = raw.loc[:, ~raw.columns.duplicated()]
+        raw.index.name = 'linha'
+
+        text = raw.fillna('').astype(str).apply(lambda col: col.str.strip())
+        text = text[(text != '').any(axis=1)]
+
+        frame = pd.DataFrame(index=text.index)
+        for column in self.columns:
+            if column.name in text.columns:
+                frame[column.name] = text[column.name]
+            else:
+                default = column.default() if callable(column.default) else column.default
+                frame[column.name] = pd.Series([default] * len(text), index=text.index, dtype=object)
+        return self._convert(frame)
+
+    def _convert(self, frame):
+        for column in self.columns:
+            values = frame[column.name]
+            if column.lower:
+                values = values.astype(str).str.lower()
+            if column.dtype == 'category':
+                values = values.astype('category')
+            elif column.dtype == 'float':
+                values = pd.to_numeric(values.astype(str).str.replace(',', '.', regex=False), errors='coerce')
+            elif column.dtype == 'int':
+                numbers = pd.to_numeric(values.astype(str).str.replace(',', '.', regex=False), errors='coerce')
+                values = numbers.round().astype('Int64')
+            elif column.dtype == 'bool':
+                values = values.astype(str).str.lower().isin(TRUE_VALUES)
+            elif column.dtype in ('date', 'datetime'):
+                values = pd.to_datetime(values, errors='coerce', format='mixed', dayfirst=column.dayfirst)
+                if column.dtype == 'date':
+                    values = values.dt.date
+            frame[column.name] = values
+        return frame
+
+
+USERS_SCHEMA = SheetSchema([
+    Column('email', lower=True),
+    Column('nome', default='Nome não informado'),
+    Column('role', 'category', default='viewer', lower=True),
+    Column('plano', 'category', default='basico', lower=True),
+    Column('status', 'category', default='inativo', lower=True),
+    Column('spreadsheet_id'),
+    Column('folder_id'),
+    Column('data_cadastro', 'date', default=lambda: date.today().isoformat()),
+    Column('trial_end_date', 'date', default=None),
+    Column('telefone'),
+    Column('empresa'),
+    Column('cargo'),
+], required=('email', 'nome', 'status'))
+
+AVALIACOES_ESCADAS_SCHEMA = SheetSchema([
+    Column('id_avaliacao'),
+    Column('data_avaliacao', 'datetime', default=None, dayfirst=True),
+    Column('local_instalacao'),
+    Column('tipo_escada', 'category'),
+    Column('altura_total', 'float', default=None),
+    Column('num_degraus', 'int', default=None),
+    Column('altura_degrau', 'float', default=None),
+    Column('profundidade_degrau', 'float', default=None),
+    Column('largura', 'float', default=None),
+    Column('inclinacao', 'float', default=None),
+    Column('formula_blondel', 'float', default=None),
+    Column('status_conformidade', 'category'),
+    Column('conformidade_percentual', 'float', default=None),
+    Column('tem_plataforma', 'bool', default=False),
+    Column('tem_guarda_corpo', 'bool', default=False),
+    Column('observacoes'),
+    Column('grafico_drive_id'),
+    Column('foto_drive_id'),
+    Column('data_criacao', 'datetime', default=None),
+])
+
+PROJETOS_ESCADAS_SCHEMA = SheetSchema([
+    Column('id_projeto'),
+    Column('data_criacao', 'datetime', default=None),
+    Column('nome_projeto'),
+    Column('local_instalacao'),
+    Column('altura_total', 'float', default=None),
+    Column('num_degraus', 'int', default=None),
+    Column('altura_degrau', 'float', default=None),
+    Column('profundidade_degrau', 'float', default=None),
+    Column('largura', 'float', default=None),
+    Column('inclinacao', 'float', default=None),
+    Column('formula_blondel', 'float', default=None),
+    Column('num_plataformas', 'int', default=None),
+    Column('status_projeto', 'category'),
+    Column('grafico_drive_id'),
+    Column('observacoes'),
+])
+
+SHEET_SCHEMAS = {
+    USERS_SHEET_NAME: USERS_SCHEMA,
+    AVALIACOES_ESCADAS_SHEET_NAME: AVALIACOES_ESCADAS_SCHEMA,
+    PROJETOS_ESCADAS_SHEET_NAME: PROJETOS_ESCADAS_SCHEMA,
+}
@@ -0,0 +1,193 @@
+"""
+Deduplicação de leituras simultâneas (single-flight) dos dados compartilhados.
+
+Quando várias sessões precisam ao mesmo tempo do mesmo dado que não está em
+cache (ex.: a aba de usuários da planilha matriz logo após expirar), só a
+primeira faz a leitura; as demais aguardam e recebem o mesmo resultado.
+
+`SharedCache` soma a isso o "stale-while-revalidate": depois de carregado, um
+valor vencido continua sendo servido enquanto uma única thread em segundo plano
+busca a versão nova, de modo que nenhuma sessão espera pela releitura. Um job
+periódico também pode recarregar o valor com `refresh()`; `get_stats()` informa
+a idade do valor e a duração da última leitura para monitoramento.
+
+Com um backend compartilhado (gdrive/cache_backend.py), o valor lido por uma
+réplica serve às outras, e `invalidate()` troca o carimbo do cache no backend:
+as outras réplicas descartam a cópia local na próxima leitura.
+"""
+import threading
+import time
+
+
+class _Flight:
+    """Uma leitura em andamento e o resultado entregue a quem a aguarda."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Executa no máximo uma chamada por chave ao mesmo tempo; as chamadas concorrentes reaproveitam o resultado."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, func):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = func()
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+
+class _CachedValue:
+    def __init__(self, value, stamp, age=0.0):
+        self.value = value
+        self.stamp = stamp
+        self.loaded_at = time.monotonic() - age
+
+
+class SharedCache:
+    """
+    Cache por chave, compartilhado entre as sessões do processo, com leituras
+    deduplicadas e revalidação em segundo plano dos valores vencidos (`ttl` segundos).
+    """
+
+    def __init__(self, ttl, name="cache", backend=None):
+        self.ttl = ttl
+        self.name = name
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._values = {}
+        self._generations = {}
+        self._refreshing = set()
+        self._flights = SingleFlight()
+        # chave -> {'duration', 'error'} da última leitura
+        self._last_loads = {}
+
+    def contains(self, key):
+        """Indica se há um valor (mesmo vencido) para a chave, ou seja, se `get` não vai esperar pela leitura."""
+        with self._lock:
+            return key in self._values
+
+    def get(self, key, loader):
+        """
+        Retorna o valor da chave. Sem valor em cache, carrega com `loader()` (uma
+        leitura por chave, mesmo com várias sessões pedindo juntas). Com valor
+        vencido, devolve-o na hora e agenda a revalidação em segundo plano.
+        """
+        stamp = self._stamp()
+        with self._lock:
+            cached = self._values.get(key)
+            # Um carimbo diferente indica que outra réplica invalidou o cache
+            if cached is not None and cached.stamp == stamp:
+                if time.monotonic() - cached.loaded_at > self.ttl and key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(
+                        target=self._refresh, args=(key, loader),
+                        name=f"revalidacao-{self.name}", daemon=True
+                    ).start()
+                return cached.value
+        return self._flights.do(key, lambda: self._load(key, loader, use_shared=True))
+
+    def refresh(self, key, loader):
+        """Recarrega o valor agora (sem descartar o atual antes da leitura terminar) e o retorna."""
+        return self._flights.do(key, lambda: self._load(key, loader))
+
+    def get_stats(self, key):
+        """
+        Retorna as métricas da chave: idade do valor servido em segundos (None se
+        ainda não há valor), duração em segundos e erro (ou None) da última leitura.
+        """
+        with self._lock:
+            cached = self._values.get(key)
+            last_load = self._last_loads.get(key, {})
+            return {
+                'idade_segundos': time.monotonic() - cached.loaded_at if cached is not None else None,
+                'duracao_ultima_leitura': last_load.get('duration'),
+                'erro_ultima_leitura': last_load.get('error'),
+            }
+
+    def invalidate(self, key=None):
+        """
+        Descarta o valor da chave (ou de todas): a próxima leitura busca o dado atualizado.
+        No backend compartilhado, o carimbo do cache inteiro é trocado (vale para todas as réplicas).
+        """
+        with self._lock:
+            keys = list(self._values) if key is None else [key]
+            for k in keys:
+                self._values.pop(k, None)
+                self._generations[k] = self._generations.get(k, 0) + 1
+        if self.backend is not None:
+            self.backend.bump_stamp(self.name)
+
+    def _stamp(self):
+        return self.backend.get_stamp(self.name) if self.backend is not None else None
+
+    def _load_shared(self, key, stamp):
+        """Valor gravado por outra réplica com o carimbo atual e ainda dentro do ttl, ou None."""
+        if self.backend is None or not self.backend.shared:
+            return None
+        stored = self.backend.get((self.name, key))
+        if not stored or stored['stamp'] != stamp:
+            return None
+        age = max(0.0, time.time() - stored['saved_at'])
+        return _CachedValue(stored['value'], stamp, age) if age <= self.ttl else None
+
+    def _load(self, key, loader, use_shared=False):
+        stamp = self._stamp()
+        with self._lock:
+            generation = self._generations.get(key, 0)
+        shared = self._load_shared(key, stamp) if use_shared else None
+        if shared is not None:
+            with self._lock:
+                if self._generations.get(key, 0) == generation:
+                    self._values[key] = shared
+            return shared.value
+        started = time.monotonic()
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                self._last_loads[key] = {'duration': time.monotonic() - started, 'error': str(e)}
+            raise
+        with self._lock:
+            self._last_loads[key] = {'duration': time.monotonic() - started, 'error': None}
+            # Uma invalidação durante a leitura indica que o valor lido pode já estar desatualizado
+            if self._generations.get(key, 0) != generation:
+                return value
+            self._values[key] = _CachedValue(value, stamp)
+        if self.backend is not None and self.backend.shared:
+            self.backend.set((self.name, key), {'stamp': stamp, 'saved_at': time.time(), 'value': value})
+        return value
+
+    def _refresh(self, key, loader):
+        try:
+            # Outra réplica pode já ter relido o valor: o backend compartilhado é consultado antes
+            self._flights.do(key, lambda: self._load(key, loader, use_shared=True))
+        except Exception as e:
+            # Mantém o valor antigo; a próxima leitura vencida tenta de novo
+            print(f"⚠️ Aviso: Falha ao revalidar '{self.name}' ({key}), mantendo os dados anteriores: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
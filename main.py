@@ -1,9 +1,15 @@
 import streamlit as st
 from operations.front import front
 from auth.login_page import show_login_page, show_user_header, show_logout_button
-from auth.auth_utils import is_user_logged_in, setup_sidebar
+from auth.auth_utils import is_user_logged_in, setup_sidebar, start_users_refresher
+from operations.fila_sincronizacao import start_sync_worker
 
 def main():
+    # Diretório de usuários mantido em memória por um job do servidor
+    start_users_refresher()
+    # Job que envia ao Drive/Sheets as gravações da fila local
+    start_sync_worker()
+    
     # Verificar se o usuário está logado
     if not is_user_logged_in():
         show_login_page()
@@ -24,4 +30,4 @@ def main():
     front()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
\ No newline at end of file
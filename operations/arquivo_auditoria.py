@@ -0,0 +1,234 @@
+"""
+Arquivamento mensal e leitura paginada do log de auditoria.
+
+A aba `log_auditoria` guarda apenas o mês corrente. Um job em segundo plano
+move as linhas dos meses anteriores para abas de arquivo mensais
+(`log_auditoria_AAAA_MM`) e registra cada uma, com o número de linhas, na aba
+`log_auditoria_arquivos`. O visualizador lê somente a página pedida do mês
+escolhido, e o painel de erros recentes usa o índice `log_erros_recentes`,
+alimentado pelo `log_action` e mantido com no máximo algumas dezenas de linhas.
+
+As remoções de linhas rodam com um lease entre réplicas (utils/leases.py) e só
+acontecem se as linhas no início da aba ainda são as que foram lidas: uma
+remoção repetida por outra réplica apagaria linhas do mês corrente.
+"""
+import re
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+import pytz
+import streamlit as st
+
+from gdrive.gdrive_upload import GoogleDriveUploader
+from gdrive.config import (
+    AUDIT_LOG_SHEET_NAME, AUDIT_ERRORS_SHEET_NAME, AUDIT_ARCHIVE_INDEX_SHEET_NAME, AUDIT_ARCHIVE_SHEET_PREFIX,
+    AUDIT_RECENT_ERRORS_LIMIT, AUDIT_PAGE_SIZE, AUDIT_MAINTENANCE_INTERVAL_SECONDS, AUDIT_MAINTENANCE_LEASE_SECONDS
+)
+from utils import leases
+from utils.auditoria import AUDIT_LOG_HEADERS, ERROR_ACTION_PATTERN
+
+ARCHIVE_INDEX_HEADERS = ['mes', 'aba', 'linhas', 'arquivado_em']
+LEASE_MANUTENCAO = 'log_auditoria:manutencao'
+
+# Serializa as execuções do arquivamento dentro do processo
+_maintenance_lock = threading.Lock()
+
+
+def archive_sheet_name(month):
+    """Nome da aba de arquivo de um mês no formato 'AAAA-MM' (ex.: log_auditoria_2025_01)."""
+    return AUDIT_ARCHIVE_SHEET_PREFIX + month.replace('-', '_')
+
+
+def _current_month():
+    # Mesmo fuso usado pelo log_action nos timestamps
+    return datetime.now(pytz.timezone("America/Sao_Paulo")).strftime('%Y-%m')
+
+
+def _read_archive_index(uploader):
+    """Lê o índice de arquivos e retorna uma lista de (linha_na_planilha, registro)."""
+    data = uploader.get_data_from_sheet(AUDIT_ARCHIVE_INDEX_SHEET_NAME)
+    if not data or len(data) < 2:
+        return []
+    header = data[0]
+    entries = []
+    for row_number, row in enumerate(data[1:], start=2):
+        padded = list(row) + [''] * (len(header) - len(row))
+        entries.append((row_number, dict(zip(header, padded))))
+    return entries
+
+
+def ensure_audit_sheets(uploader=None):
+    """
+    Cria as abas de índice (arquivos e erros recentes) se ainda não existirem.
+    Um índice de erros vazio é preenchido com os últimos erros do log atual.
+    """
+    uploader = uploader or GoogleDriveUploader(is_matrix=True)
+    uploader.ensure_sheet(AUDIT_ARCHIVE_INDEX_SHEET_NAME, ARCHIVE_INDEX_HEADERS)
+    uploader.ensure_sheet(AUDIT_ERRORS_SHEET_NAME, AUDIT_LOG_HEADERS)
+
+    if len(uploader.get_data_from_sheet(AUDIT_ERRORS_SHEET_NAME)) < 2:
+        log_data = uploader.get_data_from_sheet(AUDIT_LOG_SHEET_NAME)
+        error_rows = [
+            row for row in log_data[1:]
+            if len(row) > 2 and re.search(ERROR_ACTION_PATTERN, row[2], re.IGNORECASE)
+        ]
+        if error_rows:
+            uploader.append_data_to_sheet(AUDIT_ERRORS_SHEET_NAME, error_rows[-AUDIT_RECENT_ERRORS_LIMIT:])
+
+
+def _previous_months_prefix(rows, current_month):
+    """
+    Linhas de meses anteriores no início do log, agrupadas por mês: ({mes: linhas}, total).
+    O log é gravado em ordem cronológica, então essas linhas formam um prefixo.
+    Linhas sem timestamp válido acompanham o mês da linha anterior.
+    """
+    rows_by_month = {}
+    month = None
+    count = 0
+    for row in rows:
+        timestamp = row[0] if row else ''
+        if re.match(r'\d{4}-\d{2}', timestamp):
+            month = timestamp[:7]
+        if month is None or month >= current_month:
+            break
+        rows_by_month.setdefault(month, []).append(row)
+        count += 1
+    return rows_by_month, count
+
+
+def rotate_audit_log():
+    """
+    Move as linhas de meses anteriores do log de auditoria para as abas de arquivo mensais.
+    Pode ser repetido após uma falha: linhas já arquivadas não são copiadas de novo.
+    Retorna o número de linhas removidas do log principal (0 se outra réplica está arquivando).
+    """
+    uploader = GoogleDriveUploader(is_matrix=True)
+    current_month = _current_month()
+
+    with _maintenance_lock:
+        # Conferência sem lease: o lease só é pedido quando há algo a arquivar
+        _, archived_count = _previous_months_prefix(uploader.get_data_from_sheet(AUDIT_LOG_SHEET_NAME)[1:], current_month)
+        if not archived_count:
+            return 0
+        with leases.held(uploader, LEASE_MANUTENCAO, AUDIT_MAINTENANCE_LEASE_SECONDS) as obtido:
+            if not obtido:
+                return 0
+            return _rotate(uploader, current_month)
+
+
+def _rotate(uploader, current_month):
+    """Arquivamento em si; roda com o lease, sobre uma leitura atual do log."""
+    rows = uploader.get_data_from_sheet(AUDIT_LOG_SHEET_NAME)[1:]
+    rows_by_month, archived_count = _previous_months_prefix(rows, current_month)
+    if not archived_count:
+        return 0
+
+    index = {entry['mes']: row_number for row_number, entry in _read_archive_index(uploader)}
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    batch = uploader.write_batch()
+    for month, month_rows in rows_by_month.items():
+        sheet_name = archive_sheet_name(month)
+        uploader.ensure_sheet(sheet_name, AUDIT_LOG_HEADERS)
+        existing = uploader.get_data_from_sheet(sheet_name)[1:]
+        already_archived = set(map(tuple, existing))
+        new_rows = [row for row in month_rows if tuple(row) not in already_archived]
+        if new_rows:
+            uploader.append_data_to_sheet(sheet_name, new_rows)
+
+        total = len(existing) + len(new_rows)
+        if month in index:
+            batch.update(AUDIT_ARCHIVE_INDEX_SHEET_NAME, f"C{index[month]}:D{index[month]}", [[total, now]])
+        else:
+            batch.append(AUDIT_ARCHIVE_INDEX_SHEET_NAME, [[month, sheet_name, total, now]])
+    batch.commit()
+
+    # Remove só o prefixo arquivado: linhas gravadas durante o arquivamento continuam no log
+    if not uploader.delete_rows_if_unchanged(AUDIT_LOG_SHEET_NAME, 2, rows[:archived_count]):
+        return 0
+    return archived_count
+
+
+def trim_recent_errors():
+    """Mantém o índice de erros recentes com no máximo AUDIT_RECENT_ERRORS_LIMIT linhas."""
+    uploader = GoogleDriveUploader(is_matrix=True)
+    with _maintenance_lock:
+        if len(uploader.get_data_from_sheet(AUDIT_ERRORS_SHEET_NAME)) - 1 <= AUDIT_RECENT_ERRORS_LIMIT:
+            return
+        with leases.held(uploader, LEASE_MANUTENCAO, AUDIT_MAINTENANCE_LEASE_SECONDS) as obtido:
+            if not obtido:
+                return
+            rows = uploader.get_data_from_sheet(AUDIT_ERRORS_SHEET_NAME)[1:]
+            excess = len(rows) - AUDIT_RECENT_ERRORS_LIMIT
+            if excess > 0:
+                uploader.delete_rows_if_unchanged(AUDIT_ERRORS_SHEET_NAME, 2, rows[:excess])
+
+
+def get_recent_errors(uploader=None):
+    """Retorna os erros recentes do índice como DataFrame, do mais novo para o mais antigo."""
+    uploader = uploader or GoogleDriveUploader(is_matrix=True)
+    data = uploader.get_data_from_sheet(AUDIT_ERRORS_SHEET_NAME)
+    if not data or len(data) < 2:
+        return pd.DataFrame(columns=AUDIT_LOG_HEADERS)
+    return pd.DataFrame(data[1:], columns=data[0]).iloc[::-1].reset_index(drop=True)
+
+
+def list_archived_months(uploader=None):
+    """Retorna [(mes, aba, linhas)] dos meses arquivados, do mais recente para o mais antigo."""
+    uploader = uploader or GoogleDriveUploader(is_matrix=True)
+    months = [
+        (entry['mes'], entry['aba'], int(entry['linhas'] or 0))
+        for _, entry in _read_archive_index(uploader)
+    ]
+    return sorted(months, reverse=True)
+
+
+def get_audit_page(month=None, page=0, page_size=AUDIT_PAGE_SIZE, uploader=None):
+    """
+    Retorna (DataFrame, total_de_linhas) com uma página do log de um mês, do mais novo para o mais antigo.
+    month=None é o mês corrente (aba principal, lida de forma incremental pelo cache);
+    nos meses arquivados só o intervalo de linhas da página é lido.
+    """
+    uploader = uploader or GoogleDriveUploader(is_matrix=True)
+    if month is None:
+        rows = uploader.get_data_from_sheet(AUDIT_LOG_SHEET_NAME)[1:]
+        total = len(rows)
+        end = max(0, total - page * page_size)
+        page_rows = rows[max(0, end - page_size):end]
+    else:
+        archived = {archived_month: (sheet_name, rows) for archived_month, sheet_name, rows in list_archived_months(uploader)}
+        sheet_name, total = archived[month]
+        # Linhas de dados ocupam as linhas 2..total+1 da aba
+        last_row = total + 1 - page * page_size
+        first_row = max(2, last_row - page_size + 1)
+        page_rows = uploader.get_rows(sheet_name, first_row, last_row) if last_row >= 2 else []
+
+    padded = [list(row) + [''] * (len(AUDIT_LOG_HEADERS) - len(row)) for row in page_rows]
+    page_df = pd.DataFrame([row[:len(AUDIT_LOG_HEADERS)] for row in padded], columns=AUDIT_LOG_HEADERS)
+    return page_df.iloc[::-1].reset_index(drop=True), total
+
+
+def _maintenance_loop():
+    """Laço do job de manutenção do log: arquiva meses anteriores e apara o índice de erros."""
+    while True:
+        try:
+            archived = rotate_audit_log()
+            if archived:
+                print(f"Log de auditoria: {archived} linha(s) movidas para as abas de arquivo.")
+            trim_recent_errors()
+        except Exception as e:
+            print(f"⚠️ Aviso: Falha na manutenção do log de auditoria: {e}")
+        time.sleep(AUDIT_MAINTENANCE_INTERVAL_SECONDS)
+
+
+@st.cache_resource
+def start_audit_maintenance():
+    """Garante as abas de índice e inicia (uma única vez por processo) o job de manutenção do log."""
+    try:
+        ensure_audit_sheets()
+    except Exception as e:
+        print(f"⚠️ Aviso: Não foi possível preparar as abas do log de auditoria: {e}")
+    thread = threading.Thread(target=_maintenance_loop, name="manutencao-auditoria", daemon=True)
+    thread.start()
+    return thread
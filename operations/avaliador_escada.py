@@ -5,7 +5,8 @@ import numpy as np
 import uuid
 from datetime import datetime
 from operations.gdrive_manager import EscadasGDriveManager
-from auth.auth_utils import get_effective_user_plan
+from auth.auth_utils import get_effective_user_plan, get_user_email
+from utils.contadores_uso import contar_avaliacoes_mes
 
 def avaliar_escada_existente(calculadora, gerenciador_historico):
     """Interface para avaliar uma escada existente"""
@@ -373,13 +374,16 @@ def avaliar_escada_existente(calculadora, gerenciador_historico):
                 
                 # Verificar limite do plano básico
                 if plano_atual == 'basico':
-                    mes_atual = datetime.now().strftime("%m/%Y")
-                    avaliacoes_mes = [
-                        a for a in st.session_state.get('historico_avaliacoes', []) 
-                        if mes_atual in a.get('data', '')
-                    ]
+                    # Contadores materializados na planilha matriz; histórico local como fallback
+                    total_mes = contar_avaliacoes_mes(get_user_email())
+                    if total_mes is None:
+                        mes_atual = datetime.now().strftime("%m/%Y")
+                        total_mes = len([
+                            a for a in st.session_state.get('historico_avaliacoes', []) 
+                            if mes_atual in a.get('data', '')
+                        ])
                     
-                    if len(avaliacoes_mes) >= 5:
+                    if total_mes >= 5:
                         st.error("🚫 Limite de 5 avaliações mensais atingido (Plano Básico)")
                         st.info("💎 Faça upgrade para o Plano Pro!")
                         st.stop()
@@ -401,7 +405,11 @@ def avaliar_escada_existente(calculadora, gerenciador_historico):
                 itens_ok = sum(1 for s in st.session_state.dados_avaliacao['status_itens'] if s == '✅')
                 total_itens = len(st.session_state.dados_avaliacao['status_itens'])
                 conformidade = (itens_ok / total_itens) * 100 if total_itens > 0 else 0
-                
+
+                # Este rerun não passou pelo botão de avaliação: recalcula a partir das medidas do formulário
+                formula_nr12 = profundidade_degrau + (2 * altura_degrau)
+                inclinacao = np.degrees(np.arctan(altura_degrau/profundidade_degrau))
+
                 # Preparar dados para Google Drive
                 avaliacao_drive_data = {
                     'id': avaliacao_id,
@@ -430,7 +438,7 @@ def avaliar_escada_existente(calculadora, gerenciador_historico):
                     )
                     
                     if success:
-                        st.success("✅ Avaliação salva no Google Drive!")
+                        st.success("✅ Avaliação registrada! A sincronização com o Google Drive é feita em segundo plano.")
                     else:
                         st.warning("⚠️ Salvo localmente, mas não sincronizado com Drive")
                 except Exception as e:
@@ -0,0 +1,101 @@
+"""
+Levantamento de avaliações e projetos por usuário direto nas planilhas dos usuários.
+
+É a fonte usada pela reconciliação dos contadores de uso (`utils/contadores_uso.py`).
+Os resultados ficam em cache por processo junto com a versão da planilha do
+usuário no Drive. A cada consulta, uma listagem única de versões identifica as
+planilhas que mudaram, e só elas são relidas (em paralelo, um `values.batchGet`
+por planilha trazendo apenas as colunas de id e `data_criacao` das duas abas).
+
+Os totais contam os ids: a API corta as células vazias do fim de uma coluna, então
+a coluna de datas perde as últimas linhas se elas não tiverem `data_criacao`. As
+datas só entram na contagem do mês e na última atividade.
+"""
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from config.sheets_config import read_sheets_config
+from gdrive.gdrive_upload import GoogleDriveUploader, column_letter
+from gdrive.config import AVALIACOES_ESCADAS_SHEET_NAME, PROJETOS_ESCADAS_SHEET_NAME, ADMIN_STATS_MAX_WORKERS
+
+_lock = threading.Lock()
+_stats_cache = {}  # spreadsheet_id -> (versão, {'avaliacoes': ([ids], [datas]), 'projetos': ([ids], [datas])})
+
+# Coluna de id de cada aba (conta os registros)
+_ID_COLUMNS = {
+    AVALIACOES_ESCADAS_SHEET_NAME: 'id_avaliacao',
+    PROJETOS_ESCADAS_SHEET_NAME: 'id_projeto',
+}
+
+
+def _column_range(sheets_config, sheet_name, column):
+    """Intervalo A1 de uma coluna da aba, conforme o sheets_config.yaml."""
+    letter = column_letter(sheets_config[sheet_name].index(column))
+    return f"{sheet_name}!{letter}:{letter}"
+
+
+def _contar_ids(ids):
+    return sum(1 for value in ids if str(value).strip())
+
+
+def _resumir(avaliacoes, projetos, mes_referencia):
+    """Monta o resumo de uso a partir dos ids (totais) e das datas de criação (mês e última atividade)."""
+    ids_avaliacoes, datas_avaliacoes = avaliacoes
+    ids_projetos, datas_projetos = projetos
+    avaliacoes = pd.to_datetime(pd.Series(datas_avaliacoes, dtype=object), errors='coerce', format='mixed')
+    projetos = pd.to_datetime(pd.Series(datas_projetos, dtype=object), errors='coerce', format='mixed')
+    ultima = pd.concat([avaliacoes, projetos]).max()
+    return {
+        'avaliacoes': _contar_ids(ids_avaliacoes),
+        'projetos': _contar_ids(ids_projetos),
+        'avaliacoes_mes': int((avaliacoes.dt.strftime('%Y-%m') == mes_referencia).sum()),
+        'projetos_mes': int((projetos.dt.strftime('%Y-%m') == mes_referencia).sum()),
+        'ultima_atividade': '' if pd.isna(ultima) else ultima.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def contar_registros_por_usuario(spreadsheet_ids):
+    """
+    Retorna {spreadsheet_id: {'avaliacoes', 'projetos', 'avaliacoes_mes', 'projetos_mes', 'ultima_atividade'}}
+    para as planilhas informadas (o mês de referência é o mês corrente).
+    """
+    spreadsheet_ids = [sid for sid in spreadsheet_ids if sid]
+    uploader = GoogleDriveUploader(is_matrix=True)
+    try:
+        versions = uploader.get_spreadsheet_versions()
+    except Exception as e:
+        print(f"⚠️ Aviso: Não foi possível listar as versões das planilhas: {e}")
+        versions = {}
+
+    with _lock:
+        stale = [
+            sid for sid in spreadsheet_ids
+            if versions.get(sid) is None or _stats_cache.get(sid, (None,))[0] != versions[sid]
+        ]
+
+    sheets_config = read_sheets_config()
+    ranges = [
+        _column_range(sheets_config, sheet_name, column)
+        for sheet_name in (AVALIACOES_ESCADAS_SHEET_NAME, PROJETOS_ESCADAS_SHEET_NAME)
+        for column in (_ID_COLUMNS[sheet_name], 'data_criacao')
+    ]
+    fetched = uploader.batch_get_concurrent(
+        {sid: ranges for sid in stale}, major_dimension='COLUMNS', max_workers=ADMIN_STATS_MAX_WORKERS
+    )
+
+    mes_referencia = datetime.now().strftime('%Y-%m')
+    with _lock:
+        for sid, columns in fetched.items():
+            # Colunas lidas com majorDimension=COLUMNS: [[cabeçalho, valor, valor, ...]]
+            values = [column[0][1:] if column else [] for column in columns]
+            registros = {
+                'avaliacoes': (values[0], values[1]),
+                'projetos': (values[2], values[3]),
+            }
+            _stats_cache[sid] = (versions.get(sid), registros)
+        return {
+            sid: _resumir(_stats_cache[sid][1]['avaliacoes'], _stats_cache[sid][1]['projetos'], mes_referencia)
+            for sid in spreadsheet_ids if sid in _stats_cache
+        }
@@ -0,0 +1,257 @@
+"""
+Fila local (outbox) das gravações de avaliações e projetos no Google Drive/Sheets.
+
+Salvar uma avaliação ou projeto só grava uma entrada no journal em disco
+(`SYNC_QUEUE_DIR`, um arquivo JSON por gravação) e retorna: a sessão não espera
+pela rede. Um job em segundo plano reenvia as entradas para a pasta e a planilha
+do usuário e apaga cada uma quando termina. Uma falha (sem conexão, cota) só
+adia a entrada, com espera crescente entre as tentativas.
+
+O id da avaliação/projeto é a chave de idempotência: as imagens são procuradas
+pelo nome (que contém o id) antes do upload e a linha é procurada pelo id antes
+do append. Reenviar uma entrada interrompida no meio não duplica nada.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import streamlit as st
+
+from gdrive.gdrive_upload import GoogleDriveUploader
+from gdrive.config import (
+    AVALIACOES_ESCADAS_SHEET_NAME, PROJETOS_ESCADAS_SHEET_NAME,
+    SYNC_QUEUE_DIR, SYNC_QUEUE_INTERVAL_SECONDS, SYNC_QUEUE_MAX_BACKOFF_SECONDS
+)
+from utils.contadores_uso import registrar_uso
+
+TIPO_AVALIACAO = 'avaliacao'
+TIPO_PROJETO = 'projeto'
+
+SYNC_WORKER_THREAD_NAME = "fila-sincronizacao"
+
+# Aba de destino e arquivos (chave no journal -> prefixo do nome no Drive) de cada tipo
+_DESTINOS = {
+    TIPO_AVALIACAO: (AVALIACOES_ESCADAS_SHEET_NAME, {'grafico': 'grafico', 'foto': 'foto'}),
+    TIPO_PROJETO: (PROJETOS_ESCADAS_SHEET_NAME, {'grafico': 'projeto'}),
+}
+
+# Uma passada de envio por vez no processo
+_flush_lock = threading.Lock()
+_sync_requested = threading.Event()
+# Pedido de envio imediato: a próxima passada ignora a espera entre tentativas
+_retry_now = threading.Event()
+
+
+def _entry_path(tipo, item_id):
+    return os.path.join(SYNC_QUEUE_DIR, f"{tipo}_{item_id}.json")
+
+
+def _write_entry(entry):
+    """Grava a entrada de forma atômica e durável (arquivo temporário + fsync + os.replace)."""
+    os.makedirs(SYNC_QUEUE_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=SYNC_QUEUE_DIR, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            # Escalares do numpy (medidas calculadas) viram os tipos nativos equivalentes
+            json.dump(entry, f, ensure_ascii=False, default=lambda value: value.item() if hasattr(value, 'item') else str(value))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, _entry_path(entry['tipo'], entry['id']))
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _read_entries():
+    """Lê as entradas pendentes do journal, das mais antigas para as mais novas."""
+    if not os.path.isdir(SYNC_QUEUE_DIR):
+        return []
+    entries = []
+    for name in os.listdir(SYNC_QUEUE_DIR):
+        if not name.endswith('.json') or name.startswith('.tmp-'):
+            continue
+        try:
+            with open(os.path.join(SYNC_QUEUE_DIR, name), encoding='utf-8') as f:
+                entries.append(json.load(f))
+        except Exception as e:
+            print(f"⚠️ Aviso: Entrada ilegível na fila de sincronização ({name}): {e}")
+    return sorted(entries, key=lambda entry: entry['criado_em'])
+
+
+def enqueue(tipo, dados, user_email, spreadsheet_id, folder_id, arquivos=None):
+    """
+    Registra uma gravação no journal e acorda o job de envio.
+    `dados` deve ter o 'id' da avaliação/projeto; `arquivos` é {'grafico': caminho, 'foto': caminho}.
+    """
+    entry = {
+        'tipo': tipo,
+        'id': dados['id'],
+        'user_email': user_email,
+        'spreadsheet_id': spreadsheet_id,
+        'folder_id': folder_id,
+        'dados': dados,
+        'arquivos': {kind: path for kind, path in (arquivos or {}).items() if path},
+        'drive_links': {},
+        'linha_gravada': False,
+        'criado_em': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'tentativas': 0,
+        'proxima_tentativa': 0,
+        'ultimo_erro': None,
+    }
+    _write_entry(entry)
+    _sync_requested.set()
+    return entry
+
+
+def build_row(tipo, dados, links, criado_em):
+    """Monta a linha da planilha de uma avaliação ou projeto com os links das imagens já enviadas."""
+    if tipo == TIPO_AVALIACAO:
+        return [
+            dados['id'],
+            dados.get('data', criado_em),
+            dados.get('local', 'Não informado'),
+            dados.get('tipo_escada', 'Escada com degraus'),
+            dados.get('altura_total', 0),
+            dados.get('num_degraus', 0),
+            dados.get('altura_degrau', 0),
+            dados.get('profundidade_degrau', 0),
+            dados.get('largura', 0),
+            dados.get('inclinacao', 0),
+            dados.get('formula_blondel', 0),
+            dados.get('status_conformidade', 'Pendente'),
+            dados.get('conformidade_percentual', 0),
+            dados.get('tem_plataforma', False),
+            dados.get('tem_guarda_corpo', True),
+            dados.get('observacoes', ''),
+            links.get('grafico', ''),
+            links.get('foto', ''),
+            criado_em,
+        ]
+    return [
+        dados['id'],
+        criado_em,
+        dados.get('nome_projeto', 'Projeto sem nome'),
+        dados.get('local', 'Não informado'),
+        dados.get('altura_total', 0),
+        dados.get('num_degraus', 0),
+        dados.get('altura_degrau', 0),
+        dados.get('profundidade_degrau', 0),
+        dados.get('largura', 0),
+        dados.get('inclinacao', 0),
+        dados.get('formula_blondel', 0),
+        dados.get('num_plataformas', 0),
+        dados.get('status_projeto', 'Em análise'),
+        links.get('grafico', ''),
+        dados.get('observacoes', ''),
+    ]
+
+
+def _send(entry):
+    """
+    Envia uma entrada em etapas, gravando o progresso no journal após cada uma:
+    imagens, linha da planilha e contador de uso.
+    """
+    sheet_name, file_prefixes = _DESTINOS[entry['tipo']]
+    uploader = GoogleDriveUploader(spreadsheet_id=entry['spreadsheet_id'], folder_id=entry['folder_id'])
+
+    for kind, path in entry['arquivos'].items():
+        if kind in entry['drive_links'] or not os.path.exists(path):
+            continue
+        entry['drive_links'][kind] = uploader.upload_local_file(path, f"{file_prefixes[kind]}_{entry['id']}.png") or ''
+        _write_entry(entry)
+
+    if not entry['linha_gravada']:
+        if uploader.find_row(sheet_name, entry['id']) is None:
+            uploader.append_data_to_sheet(sheet_name, [build_row(entry['tipo'], entry['dados'], entry['drive_links'], entry['criado_em'])])
+        # Registrado mesmo se a linha já estava na planilha (envio anterior interrompido antes
+        # de marcar `linha_gravada`): a chave (id) impede que o uso conte duas vezes
+        registrar_uso(entry['user_email'], entry['tipo'], [entry['criado_em']], [entry['id']])
+        entry['linha_gravada'] = True
+        _write_entry(entry)
+
+    os.remove(_entry_path(entry['tipo'], entry['id']))
+
+
+def flush_queue():
+    """Tenta enviar as entradas cuja próxima tentativa já chegou. Retorna (enviadas, adiadas)."""
+    sent = postponed = 0
+    with _flush_lock:
+        retry_now = _retry_now.is_set()
+        _retry_now.clear()
+        for entry in _read_entries():
+            if not retry_now and entry['proxima_tentativa'] > time.time():
+                continue
+            try:
+                _send(entry)
+                sent += 1
+            except Exception as e:
+                entry['tentativas'] += 1
+                entry['ultimo_erro'] = str(e)
+                delay = min(SYNC_QUEUE_MAX_BACKOFF_SECONDS, SYNC_QUEUE_INTERVAL_SECONDS * 2 ** (entry['tentativas'] - 1))
+                entry['proxima_tentativa'] = time.time() + delay
+                _write_entry(entry)
+                postponed += 1
+    return sent, postponed
+
+
+def get_pending_entries(user_email=None):
+    """Resumo das gravações ainda não sincronizadas (de um usuário ou de todos)."""
+    return [
+        {
+            'tipo': entry['tipo'],
+            'id': entry['id'],
+            'user_email': entry['user_email'],
+            'criado_em': entry['criado_em'],
+            'tentativas': entry['tentativas'],
+            'ultimo_erro': entry['ultimo_erro'],
+        }
+        for entry in _read_entries()
+        if user_email is None or entry['user_email'] == user_email
+    ]
+
+
+def request_sync():
+    """Acorda o job de envio (ex.: botão 'Sincronizar agora'), ignorando a espera entre tentativas."""
+    _retry_now.set()
+    _sync_requested.set()
+
+
+def _sync_loop():
+    """Laço do job de envio: roda periodicamente ou logo após uma nova gravação."""
+    while True:
+        try:
+            sent, postponed = flush_queue()
+            if sent or postponed:
+                print(f"Fila de sincronização: {sent} gravação(ões) enviada(s), {postponed} adiada(s).")
+        except Exception as e:
+            print(f"⚠️ Aviso: Falha ao processar a fila de sincronização: {e}")
+        _sync_requested.wait(timeout=SYNC_QUEUE_INTERVAL_SECONDS)
+        _sync_requested.clear()
+
+
+@st.cache_resource
+def start_sync_worker():
+    """Inicia (uma única vez por processo) a thread que envia a fila de sincronização."""
+    thread = threading.Thread(target=_sync_loop, name=SYNC_WORKER_THREAD_NAME, daemon=True)
+    thread.start()
+    return thread
+
+
+def show_sync_status(user_email):
+    """Mostra na barra lateral quantas gravações do usuário aguardam sincronização com o Drive."""
+    pending = get_pending_entries(user_email)
+    if not pending:
+        return
+    st.sidebar.warning(f"🔄 {len(pending)} gravação(ões) aguardando sincronização com o Google Drive")
+    with st.sidebar.expander("Detalhes da sincronização"):
+        for item in pending:
+            st.caption(f"{item['tipo']} {item['id'][:8]} · salvo em {item['criado_em']} · tentativas: {item['tentativas']}")
+            if item['ultimo_erro']:
+                st.caption(f"Último erro: {item['ultimo_erro']}")
+        if st.button("Sincronizar agora", key="btn_sincronizar_fila"):
+            request_sync()
+            st.rerun()
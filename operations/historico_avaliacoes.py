@@ -2,12 +2,58 @@ import streamlit as st
 import pandas as pd
 import os
 from operations.calculadora_escada import GerenciadorHistorico
+from operations.historico_unificado import get_history, ORIGEM_PLANILHA
+from operations.sincronizacao_historico import find_missing, sync_local_history
+from gdrive.gdrive_upload import GoogleDriveUploader
+from auth.auth_utils import get_user_email
 
 # Inicializar o gerenciador de histórico
 gerenciador_historico = GerenciadorHistorico()
 
+def _conformidade(avaliacao):
+    """Conformidade a partir dos itens avaliados (registro local) ou do percentual gravado na planilha"""
+    itens_ok = sum(1 for status in avaliacao.get('status_itens', []) if status == '✅')
+    total_itens = len(avaliacao.get('status_itens', []))
+    if total_itens > 0:
+        return f"{(itens_ok/total_itens)*100:.1f}%"
+    try:
+        return f"{float(str(avaliacao.get('conformidade_percentual')).replace(',', '.')):.1f}%"
+    except ValueError:
+        return "N/A"
+
+def _origem(avaliacao):
+    if avaliacao['origem'] == ORIGEM_PLANILHA:
+        return "☁️ Google Drive"
+    return "💾 Local · ☁️ sincronizada" if avaliacao['sincronizado'] else "💾 Apenas local"
+
+def _mostrar_sincronizacao_em_massa(uploader):
+    """Oferece o envio para a planilha das avaliações locais que ainda não estão nela"""
+    if not uploader.spreadsheet_id:
+        return
+    try:
+        faltantes = find_missing(st.session_state.historico_avaliacoes, uploader)
+    except Exception as e:
+        print(f"⚠️ Aviso: Não foi possível comparar o histórico local com a planilha: {e}")
+        return
+    if not faltantes:
+        return
+    
+    st.warning(f"💾 {len(faltantes)} avaliação(ões) do histórico local ainda não estão no Google Drive.")
+    if st.button("Sincronizar histórico com o Google Drive", key="btn_sincronizar_historico"):
+        barra = st.progress(0.0, text="Sincronizando histórico...")
+        resumo = sync_local_history(
+            st.session_state.historico_avaliacoes, uploader, get_user_email(),
+            lambda enviadas, total: barra.progress(enviadas / total, text=f"{enviadas}/{total} avaliações enviadas")
+        )
+        if resumo is None:
+            st.info("Já existe uma sincronização em andamento para a sua planilha.")
+            return
+        st.success(f"✅ {resumo['enviadas']} avaliação(ões) e {resumo['imagens_enviadas']} imagem(ns) enviadas ao Google Drive.")
+        if resumo['imagens_com_erro']:
+            st.warning(f"⚠️ {resumo['imagens_com_erro']} imagem(ns) não puderam ser enviadas; as avaliações foram gravadas sem o link.")
+
 def mostrar_historico_avaliacoes():
-    """Exibe o histórico de avaliações salvas"""
+    """Exibe o histórico de avaliações: registros locais e da planilha do usuário, combinados pelo id"""
     st.header("Histórico de Avaliações")
     
     # Criar diretórios se não existirem
@@ -18,15 +64,19 @@ def mostrar_historico_avaliacoes():
         historico_json = gerenciador_historico.carregar_historico_json()
         st.session_state.historico_avaliacoes = historico_json
     
+    uploader = GoogleDriveUploader(is_matrix=False)
+    _mostrar_sincronizacao_em_massa(uploader)
+    historico = get_history(st.session_state.historico_avaliacoes, uploader)
+    
     # Exibir histórico existente
-    if not st.session_state.historico_avaliacoes:
+    if not historico:
         st.info("Nenhuma avaliação salva no histórico. Realize avaliações na calculadora e salve-as para visualizar aqui.")
     else:
         # Mostrar lista de avaliações salvas em formato de tabela com imagens
         st.subheader("Avaliações Salvas")
         
         # Criar colunas para cada avaliação
-        num_avaliacoes = len(st.session_state.historico_avaliacoes)
+        num_avaliacoes = len(historico)
         colunas_por_linha = 3
         
         # Dividir em linhas
@@ -37,55 +87,56 @@ def mostrar_historico_avaliacoes():
             for j in range(colunas_por_linha):
                 idx = i + j
                 if idx < num_avaliacoes:
-                    avaliacao = st.session_state.historico_avaliacoes[idx]
+                    avaliacao = historico[idx]
                     
                     with cols[j]:
                         st.markdown(f"**ID:** {avaliacao['id']}")
                         st.markdown(f"**Local:** {avaliacao.get('local', 'Não informado')}")
                         st.markdown(f"**Data:** {avaliacao.get('data', 'Não informada')}")
+                        st.caption(_origem(avaliacao))
                         
-                        # Exibir foto se existir
+                        # Exibir foto se existir (local) ou o link da foto no Drive
                         foto_path = avaliacao.get('foto_path')
                         if foto_path and os.path.exists(foto_path):
                             st.image(foto_path, caption="Foto da escada", width=200)
+                        elif avaliacao.get('foto_link'):
+                            st.markdown(f"[📷 Foto no Google Drive]({avaliacao['foto_link']})")
                         else:
                             st.info("Sem foto")
                         
-                        # Calcular conformidade
-                        itens_ok = sum(1 for status in avaliacao.get('status_itens', []) if status == '✅')
-                        total_itens = len(avaliacao.get('status_itens', []))
-                        if total_itens > 0:
-                            conformidade = f"{(itens_ok/total_itens)*100:.1f}%"
-                        else:
-                            conformidade = "N/A"
-                        
-                        st.markdown(f"**Conformidade:** {conformidade}")
+                        st.markdown(f"**Conformidade:** {_conformidade(avaliacao)}")
                         
                         # Botão para visualizar detalhes
-                        if st.button(f"Ver Detalhes #{idx+1}", key=f"btn_detalhes_{idx}"):
-                            st.session_state.avaliacao_selecionada = idx
+                        if st.button(f"Ver Detalhes #{idx+1}", key=f"btn_detalhes_{avaliacao['id']}"):
+                            st.session_state.avaliacao_selecionada = avaliacao['id']
                         
-                        # Botão para excluir avaliação
-                        if st.button(f"Excluir Avaliação #{idx+1}", key=f"btn_excluir_{idx}"):
+                        # Botão para excluir avaliação (só a cópia local; a linha da planilha é mantida)
+                        if avaliacao['origem'] != ORIGEM_PLANILHA and st.button(f"Excluir Avaliação #{idx+1}", key=f"btn_excluir_{avaliacao['id']}"):
+                            idx_local = next(
+                                i for i, registro in enumerate(st.session_state.historico_avaliacoes)
+                                if registro.get('id') == avaliacao['id']
+                            )
                             st.session_state.historico_avaliacoes = gerenciador_historico.excluir_avaliacao(
-                                st.session_state.historico_avaliacoes, idx)
+                                st.session_state.historico_avaliacoes, idx_local)
                             st.success(f"Avaliação ID {avaliacao['id']} excluída com sucesso!")
                             # Remover a seleção se a avaliação excluída era a selecionada
-                            if 'avaliacao_selecionada' in st.session_state and st.session_state.avaliacao_selecionada == idx:
+                            if st.session_state.get('avaliacao_selecionada') == avaliacao['id']:
                                 del st.session_state.avaliacao_selecionada
                             st.rerun()
 
     # Exibir detalhes da avaliação selecionada
     if 'avaliacao_selecionada' in st.session_state and st.session_state.avaliacao_selecionada is not None:
-        idx = st.session_state.avaliacao_selecionada
-        if isinstance(idx, int) and 0 <= idx < len(st.session_state.historico_avaliacoes):
-            avaliacao = st.session_state.historico_avaliacoes[idx]
+        avaliacao = next(
+            (registro for registro in historico if registro['id'] == st.session_state.avaliacao_selecionada), None
+        )
+        if avaliacao is not None:
             st.subheader(f"Detalhes da Avaliação ID: {avaliacao['id']}")
             
             # Informações básicas
             st.markdown(f"**Local:** {avaliacao.get('local', 'Não informado')}")
             st.markdown(f"**Data:** {avaliacao.get('data', 'Não informada')}")
             st.markdown(f"**Altura Total:** {avaliacao.get('altura_total', 'Não informado')} mm")
+            st.markdown(f"**Conformidade:** {_conformidade(avaliacao)}")
             
             # Criar colunas para gráfico e foto lado a lado
             col_grafico, col_foto = st.columns(2)
@@ -95,6 +146,8 @@ def mostrar_historico_avaliacoes():
                 grafico_path = avaliacao.get('grafico_path')
                 if grafico_path and os.path.exists(grafico_path):
                     st.image(grafico_path, caption="Gráfico da Escada", use_container_width=True)
+                elif avaliacao.get('grafico_link'):
+                    st.markdown(f"[📈 Gráfico no Google Drive]({avaliacao['grafico_link']})")
                 else:
                     st.info("Sem gráfico disponível")
             
@@ -103,11 +156,16 @@ def mostrar_historico_avaliacoes():
                 foto_path = avaliacao.get('foto_path')
                 if foto_path and os.path.exists(foto_path):
                     st.image(foto_path, caption="Foto da escada", use_container_width=True)
+                elif avaliacao.get('foto_link'):
+                    st.markdown(f"[📷 Foto no Google Drive]({avaliacao['foto_link']})")
                 else:
                     st.info("Sem foto disponível")
             
             # Tabela de medidas abaixo das imagens
             st.subheader("Tabela de Medidas e Conformidade")
+            if avaliacao['origem'] == ORIGEM_PLANILHA:
+                st.info("As medidas item a item ficam no histórico local do dispositivo em que a avaliação foi feita.")
+                return
             medidas = avaliacao.get('medidas', [])
             valores = avaliacao.get('valores', [])
             status_itens = avaliacao.get('status_itens', [])
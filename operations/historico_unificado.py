@@ -0,0 +1,97 @@
+"""
+Histórico de avaliações unificado: registros locais (`data/historico.json`) e a
+aba `avaliacoes_escadas` da planilha do usuário, combinados pelo id da avaliação.
+
+O disco local some a cada novo deploy ou réplica, mas a planilha não: as
+avaliações que só existem nela também aparecem no histórico. A parte da
+planilha fica em memória por planilha e acompanha a leitura incremental do
+cache de abas: um cursor guarda quantas linhas já foram convertidas, e a cada
+consulta só as linhas depois dele são examinadas. Quando o cache relê a aba
+inteira (nova "geração"), a visão da planilha é reconstruída.
+"""
+import threading
+from datetime import datetime
+
+from gdrive import sheet_cache
+from gdrive.config import AVALIACOES_ESCADAS_SHEET_NAME
+from gdrive.gdrive_upload import GoogleDriveUploader
+
+ORIGEM_LOCAL = 'local'
+ORIGEM_PLANILHA = 'planilha'
+
+_lock = threading.Lock()
+# spreadsheet_id -> {'generation', 'cursor' (linhas da aba já examinadas, com o cabeçalho), 'records': {id: registro}}
+_views = {}
+
+
+def _sheet_record(record):
+    """Converte uma linha da aba no formato dos registros do histórico local."""
+    return {
+        'id': record.get('id_avaliacao', ''),
+        'local': record.get('local_instalacao') or 'Não informado',
+        'data': record.get('data_avaliacao') or 'Não informada',
+        'altura_total': record.get('altura_total', ''),
+        'status_conformidade': record.get('status_conformidade', ''),
+        'conformidade_percentual': record.get('conformidade_percentual', ''),
+        'grafico_link': record.get('grafico_drive_id', ''),
+        'foto_link': record.get('foto_drive_id', ''),
+    }
+
+
+def _sync_sheet(uploader):
+    """Atualiza a visão da planilha com as linhas depois do cursor e retorna uma cópia dos registros."""
+    rows = uploader.get_data_from_sheet(AVALIACOES_ESCADAS_SHEET_NAME)
+    entry = sheet_cache.get_entry(uploader.spreadsheet_id, AVALIACOES_ESCADAS_SHEET_NAME)
+    generation = entry.generation if entry is not None else None
+
+    with _lock:
+        view = _views.get(uploader.spreadsheet_id)
+        if view is None or view['generation'] != generation or len(rows) < view['cursor']:
+            view = _views[uploader.spreadsheet_id] = {'generation': generation, 'cursor': 0, 'records': {}}
+        if rows:
+            header = rows[0]
+            for row in rows[max(1, view['cursor']):]:
+                padded = list(row) + [''] * (len(header) - len(row))
+                record = _sheet_record(dict(zip(header, padded)))
+                if record['id']:
+                    # Ids repetidos: vale a primeira linha, como no índice de linhas por chave
+                    view['records'].setdefault(record['id'], record)
+            view['cursor'] = len(rows)
+        return dict(view['records'])
+
+
+def _sort_key(record):
+    try:
+        return datetime.strptime(record.get('data', ''), "%d/%m/%Y %H:%M")
+    except ValueError:
+        return datetime.min
+
+
+def get_history(local_records, uploader=None):
+    """
+    Retorna o histórico combinado, do mais antigo para o mais recente. Cada registro
+    ganha 'origem' ('local' ou 'planilha') e 'sincronizado' (se a avaliação está na
+    planilha). Os registros locais têm precedência, pois guardam as medidas item a
+    item; a planilha completa o que faltar (conformidade e links das imagens no Drive).
+    Sem acesso à planilha, retorna só os registros locais.
+    """
+    uploader = uploader or GoogleDriveUploader(is_matrix=False)
+    sheet_records = {}
+    if uploader.spreadsheet_id:
+        try:
+            sheet_records = _sync_sheet(uploader)
+        except Exception as e:
+            print(f"⚠️ Aviso: Histórico exibido sem os registros da planilha: {e}")
+
+    history = []
+    for record in local_records:
+        merged = dict(record, origem=ORIGEM_LOCAL, sincronizado=record.get('id') in sheet_records)
+        for key, value in sheet_records.get(record.get('id'), {}).items():
+            merged.setdefault(key, value)
+        history.append(merged)
+    local_ids = {record.get('id') for record in local_records}
+    history.extend(
+        dict(record, origem=ORIGEM_PLANILHA, sincronizado=True)
+        for record_id, record in sheet_records.items() if record_id not in local_ids
+    )
+    return sorted(history, key=_sort_key)
@@ -0,0 +1,158 @@
+"""
+Pool de ambientes pré-provisionados (planilha + pasta) para novos usuários.
+
+Um job em segundo plano mantém na planilha matriz (aba `pool_ambientes`) uma
+quantidade configurável de ambientes já criados com as abas do
+`sheets_config.yaml`. Na aprovação de um trial basta reservar um deles e
+renomeá-lo, em vez de provisionar tudo na hora do clique do administrador.
+
+Reservas e reabastecimentos de réplicas diferentes são serializados por leases
+na planilha matriz (utils/leases.py): duas réplicas nunca entregam o mesmo
+ambiente a dois usuários nem completam o pool ao mesmo tempo.
+"""
+import threading
+from datetime import datetime
+
+import streamlit as st
+
+from config.sheets_config import read_sheets_config, sheets_config_hash
+from gdrive.gdrive_upload import GoogleDriveUploader
+from gdrive.config import (
+    ENVIRONMENT_POOL_SHEET_NAME, ENVIRONMENT_POOL_REFILL_SECONDS, POOL_CLAIM_LEASE_SECONDS,
+    POOL_REFILL_LEASE_SECONDS, get_central_drive_folder_id, get_environment_pool_size
+)
+from utils import leases
+
+POOL_HEADERS = ['spreadsheet_id', 'folder_id', 'schema_hash', 'criado_em', 'status', 'atribuido_a', 'atribuido_em']
+LEASE_RESERVA = 'pool_ambientes:reserva'
+LEASE_REABASTECIMENTO = 'pool_ambientes:reabastecimento'
+STATUS_DISPONIVEL = 'disponivel'
+STATUS_ATRIBUIDO = 'atribuido'
+STATUS_DESCARTADO = 'descartado'
+
+# Serializa reservas e reabastecimentos dentro do processo
+_pool_lock = threading.Lock()
+_refill_requested = threading.Event()
+
+
+def _read_pool(uploader):
+    """Lê a aba do pool e retorna uma lista de (linha_na_planilha, registro)."""
+    data = uploader.get_data_from_sheet(ENVIRONMENT_POOL_SHEET_NAME)
+    if not data or len(data) < 2:
+        return []
+    header = data[0]
+    entries = []
+    for row_number, row in enumerate(data[1:], start=2):
+        padded = list(row) + [''] * (len(header) - len(row))
+        entries.append((row_number, dict(zip(header, padded))))
+    return entries
+
+
+def claim_environment(user_email, user_name):
+    """
+    Reserva um ambiente disponível do pool para o usuário e o renomeia.
+    Retorna (spreadsheet_id, folder_id) ou (None, None) se o pool estiver vazio
+    ou se outra réplica está reservando um ambiente nesse momento.
+    """
+    if get_environment_pool_size() <= 0:
+        return None, None
+    schema_hash = sheets_config_hash(read_sheets_config())
+    uploader = GoogleDriveUploader(is_matrix=True)
+
+    with _pool_lock, leases.held(uploader, LEASE_RESERVA, POOL_CLAIM_LEASE_SECONDS) as obtido:
+        if not obtido:
+            # Quem chama provisiona um ambiente na hora, como com o pool vazio
+            return None, None
+        # Com o lease, a leitura já reflete as reservas das outras réplicas (a versão da planilha mudou)
+        for row_number, entry in _read_pool(uploader):
+            if entry['status'] != STATUS_DISPONIVEL or entry['schema_hash'] != schema_hash:
+                continue
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            uploader.update_cells(
+                ENVIRONMENT_POOL_SHEET_NAME, f"E{row_number}:G{row_number}",
+                [[STATUS_ATRIBUIDO, user_email, now]]
+            )
+            uploader.rename_files({
+                entry['spreadsheet_id']: f"ISF IA - Dados de {user_name}",
+                entry['folder_id']: f"SFIA - Arquivos de {user_name}",
+            })
+            _refill_requested.set()
+            return entry['spreadsheet_id'], entry['folder_id']
+    _refill_requested.set()
+    return None, None
+
+
+def refill_pool():
+    """
+    Descarta ambientes disponíveis criados com um esquema de abas antigo e cria
+    novos até o pool atingir o tamanho configurado. Retorna quantos foram criados.
+    Só uma réplica reabastece por vez; as outras desistem da passada.
+    """
+    target_size = get_environment_pool_size()
+    if target_size <= 0:
+        return 0
+    sheets_config = read_sheets_config()
+    schema_hash = sheets_config_hash(sheets_config)
+    uploader = GoogleDriveUploader(is_matrix=True)
+    central_folder_id = get_central_drive_folder_id()
+
+    with _pool_lock:
+        uploader.ensure_sheet(ENVIRONMENT_POOL_SHEET_NAME, POOL_HEADERS)
+        # Conferência sem lease: o lease só é pedido quando há algo a fazer
+        available = [entry for _, entry in _read_pool(uploader) if entry['status'] == STATUS_DISPONIVEL]
+        if len(available) >= target_size and all(entry['schema_hash'] == schema_hash for entry in available):
+            return 0
+        with leases.held(uploader, LEASE_REABASTECIMENTO, POOL_REFILL_LEASE_SECONDS) as obtido:
+            if not obtido:
+                return 0
+            return _refill_pool(uploader, target_size, sheets_config, schema_hash, central_folder_id)
+
+
+def _refill_pool(uploader, target_size, sheets_config, schema_hash, central_folder_id):
+    """Reabastecimento em si; roda com o lease, sobre uma leitura atual do pool."""
+    available = 0
+    batch = uploader.write_batch()
+    stale_files = []
+    for row_number, entry in _read_pool(uploader):
+        if entry['status'] != STATUS_DISPONIVEL:
+            continue
+        if entry['schema_hash'] == schema_hash:
+            available += 1
+        else:
+            batch.update(ENVIRONMENT_POOL_SHEET_NAME, f"E{row_number}", [[STATUS_DESCARTADO]])
+            stale_files.extend([entry['spreadsheet_id'], entry['folder_id']])
+    if not batch.is_empty():
+        batch.commit()
+        uploader.trash_files(stale_files)
+
+    new_rows = []
+    for _ in range(target_size - available):
+        spreadsheet_id, folder_id, _ = uploader.provision_environment(
+            "ISF IA - Ambiente reservado", "SFIA - Ambiente reservado", sheets_config, central_folder_id
+        )
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        new_rows.append([spreadsheet_id, folder_id, schema_hash, now, STATUS_DISPONIVEL, '', ''])
+    if new_rows:
+        uploader.append_data_to_sheet(ENVIRONMENT_POOL_SHEET_NAME, new_rows)
+    return len(new_rows)
+
+
+def _refill_loop():
+    """Laço do job de reabastecimento: roda periodicamente ou logo após uma reserva."""
+    while True:
+        try:
+            created = refill_pool()
+            if created:
+                print(f"Pool de ambientes reabastecido com {created} ambiente(s).")
+        except Exception as e:
+            print(f"⚠️ Aviso: Falha ao reabastecer o pool de ambientes: {e}")
+        _refill_requested.wait(timeout=ENVIRONMENT_POOL_REFILL_SECONDS)
+        _refill_requested.clear()
+
+
+@st.cache_resource
+def start_pool_refiller():
+    """Inicia (uma única vez por processo) a thread que mantém o pool abastecido."""
+    thread = threading.Thread(target=_refill_loop, name="pool-ambientes", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,230 @@
+"""
+Sincronização em massa do histórico local (`data/historico.json`) com a aba
+`avaliacoes_escadas` da planilha do usuário.
+
+As avaliações locais que não estão na planilha (comparadas pelo id) são
+enviadas em lotes de `BULK_SYNC_APPEND_CHUNK_ROWS`: os gráficos e fotos de um
+lote sobem em paralelo (no máximo `BULK_SYNC_MAX_UPLOAD_WORKERS` uploads ao
+mesmo tempo) e as linhas do lote vão em um único `values.append`.
+
+O progresso (links das imagens já enviadas e ids já gravados) é salvo em disco
+após cada etapa, um arquivo por planilha. Uma execução interrompida retoma de
+onde parou sem reenviar imagens nem duplicar linhas; o arquivo é apagado quando
+a sincronização termina.
+
+As linhas enviadas usam a data da própria avaliação (também em `data_criacao`,
+que a reconciliação dos contadores de uso conta por mês) e entram nos contadores
+de uso do usuário. Campos que o histórico local não guarda ficam vazios.
+"""
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+from gdrive.config import (
+    AVALIACOES_ESCADAS_SHEET_NAME, BULK_SYNC_APPEND_CHUNK_ROWS,
+    BULK_SYNC_MAX_UPLOAD_WORKERS, BULK_SYNC_PROGRESS_DIR
+)
+from operations import fila_sincronizacao
+from utils.contadores_uso import registrar_uso
+
+# Campos da linha de avaliação lidos da tabela de medidas do registro local (rótulo -> campo)
+_CAMPOS_MEDIDAS = {
+    'Altura do Degrau': 'altura_degrau',
+    'Profundidade do Degrau': 'profundidade_degrau',
+    'Largura da Escada': 'largura',
+    'Fórmula NR-12 (g + 2h)': 'formula_blondel',
+    'Inclinação da Escada': 'inclinacao',
+    'Número de Degraus': 'num_degraus',
+}
+
+# Planilhas com uma sincronização em andamento neste processo
+_running_lock = threading.Lock()
+_running = set()
+
+
+def _progress_path(spreadsheet_id):
+    return os.path.join(BULK_SYNC_PROGRESS_DIR, f"{spreadsheet_id}.json")
+
+
+def _load_progress(spreadsheet_id):
+    try:
+        with open(_progress_path(spreadsheet_id), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️ Aviso: Progresso da sincronização ilegível, recomeçando: {e}")
+    return {'drive_links': {}, 'ids_gravados': []}
+
+
+def _clear_progress(spreadsheet_id):
+    if os.path.exists(_progress_path(spreadsheet_id)):
+        os.remove(_progress_path(spreadsheet_id))
+
+
+def _save_progress(spreadsheet_id, progress):
+    """Grava o progresso de forma atômica (arquivo temporário + os.replace)."""
+    os.makedirs(BULK_SYNC_PROGRESS_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=BULK_SYNC_PROGRESS_DIR, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(progress, f, ensure_ascii=False)
+        os.replace(temp_path, _progress_path(spreadsheet_id))
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _sheet_ids(uploader):
+    """Ids das avaliações já gravadas na aba do usuário."""
+    rows = uploader.get_data_from_sheet(AVALIACOES_ESCADAS_SHEET_NAME)
+    if not rows:
+        return set()
+    if 'id_avaliacao' not in rows[0]:
+        raise ValueError(f"Coluna 'id_avaliacao' ausente na aba '{AVALIACOES_ESCADAS_SHEET_NAME}'")
+    position = rows[0].index('id_avaliacao')
+    return {row[position] for row in rows[1:] if position < len(row) and row[position]}
+
+
+def find_missing(local_records, uploader):
+    """
+    Registros locais que ainda não estão na planilha. Os que aguardam na fila de
+    sincronização ficam de fora: o job da fila os envia com todos os dados.
+    """
+    skip = _sheet_ids(uploader)
+    skip.update(item['id'] for item in fila_sincronizacao.get_pending_entries())
+    skip.update(_load_progress(uploader.spreadsheet_id)['ids_gravados'])
+    missing = []
+    for record in local_records:
+        if record.get('id') and record['id'] not in skip:
+            missing.append(record)
+            skip.add(record['id'])
+    return missing
+
+
+def _numero(valor):
+    """Número de um valor da tabela de medidas (ex.: '180.0 mm', '35.2°'), ou '' se não houver."""
+    try:
+        return float(str(valor).replace('mm', '').replace('°', '').strip())
+    except ValueError:
+        return ''
+
+
+def _criado_em(record):
+    """Data da avaliação no formato de `data_criacao`, ou '' se o registro não tem uma data válida."""
+    try:
+        return datetime.strptime(record.get('data', ''), "%d/%m/%Y %H:%M").strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return ''
+
+
+def _dados(record):
+    """
+    Converte um registro do histórico local nos campos da linha de avaliação.
+    Todos os campos são informados: o que o registro não guarda fica vazio, e não
+    com os valores padrão de `build_row`.
+    """
+    medidas = dict(zip(record.get('medidas', []), record.get('valores', [])))
+    status_itens = record.get('status_itens', [])
+    itens_ok = sum(1 for status in status_itens if status == '✅')
+    conformidade = (itens_ok / len(status_itens)) * 100 if status_itens else None
+    guarda_corpo = _numero(medidas['Altura do Guarda-corpo']) if 'Altura do Guarda-corpo' in medidas else ''
+
+    dados = {
+        'id': record['id'],
+        'data': record.get('data', ''),
+        'local': record.get('local', ''),
+        'tipo_escada': '',
+        'altura_total': record.get('altura_total', ''),
+        'status_conformidade': '' if conformidade is None else ('Conforme' if conformidade == 100 else 'Não conforme'),
+        'conformidade_percentual': '' if conformidade is None else conformidade,
+        'tem_plataforma': 'Altura da Plataforma' in medidas if medidas else '',
+        'tem_guarda_corpo': '' if guarda_corpo == '' else guarda_corpo > 0,
+        'observacoes': '',
+    }
+    for rotulo, campo in _CAMPOS_MEDIDAS.items():
+        dados[campo] = _numero(medidas[rotulo]) if rotulo in medidas else ''
+    if dados['num_degraus'] != '':
+        dados['num_degraus'] = int(dados['num_degraus'])
+    return dados
+
+
+def _files(record):
+    """[(caminho, nome no Drive)] das imagens locais do registro, com os nomes usados pela fila."""
+    files = []
+    for kind in ('grafico', 'foto'):
+        path = record.get(f"{kind}_path")
+        if path and os.path.exists(path):
+            files.append((path, f"{kind}_{record['id']}.png"))
+    return files
+
+
+def sync_local_history(local_records, uploader, user_email, progress_callback=None):
+    """
+    Envia para a planilha do usuário as avaliações locais que faltam nela e as
+    registra nos contadores de uso de `user_email`.
+    `progress_callback(enviadas, total)` é chamado após cada lote.
+    Retorna {'total', 'enviadas', 'imagens_enviadas', 'imagens_com_erro'},
+    ou None se já há uma sincronização dessa planilha em andamento.
+    """
+    spreadsheet_id = uploader.spreadsheet_id
+    with _running_lock:
+        if spreadsheet_id in _running:
+            return None
+        _running.add(spreadsheet_id)
+    try:
+        missing = find_missing(local_records, uploader)
+        progress = _load_progress(spreadsheet_id)
+        summary = {'total': len(missing), 'enviadas': 0, 'imagens_enviadas': 0, 'imagens_com_erro': 0}
+        if not missing:
+            _clear_progress(spreadsheet_id)
+            return summary
+
+        # Uma listagem da pasta substitui a busca por nome arquivo a arquivo
+        existing_files = uploader.list_folder_files() if any(_files(record) for record in missing) else {}
+        progress['drive_links'].update({
+            name: link for name, link in existing_files.items() if name not in progress['drive_links']
+        })
+
+        for start in range(0, len(missing), BULK_SYNC_APPEND_CHUNK_ROWS):
+            chunk = missing[start:start + BULK_SYNC_APPEND_CHUNK_ROWS]
+
+            pending_files = [
+                (path, name) for record in chunk for path, name in _files(record)
+                if name not in progress['drive_links']
+            ]
+            if pending_files:
+                links = uploader.upload_local_files(pending_files, max_workers=BULK_SYNC_MAX_UPLOAD_WORKERS)
+                progress['drive_links'].update(links)
+                summary['imagens_enviadas'] += len(links)
+                summary['imagens_com_erro'] += len(pending_files) - len(links)
+                _save_progress(spreadsheet_id, progress)
+
+            rows, momentos = [], []
+            for record in chunk:
+                # Imagem que falhou fica sem link; a linha é gravada mesmo assim
+                links = {
+                    kind: progress['drive_links'].get(f"{kind}_{record['id']}.png", '')
+                    for kind in ('grafico', 'foto')
+                }
+                momentos.append(_criado_em(record))
+                rows.append(fila_sincronizacao.build_row(
+                    fila_sincronizacao.TIPO_AVALIACAO, _dados(record), links, momentos[-1]
+                ))
+            uploader.append_data_to_sheet(AVALIACOES_ESCADAS_SHEET_NAME, rows)
+            progress['ids_gravados'].extend(record['id'] for record in chunk)
+            _save_progress(spreadsheet_id, progress)
+            registrar_uso(user_email, fila_sincronizacao.TIPO_AVALIACAO, momentos, [record['id'] for record in chunk])
+
+            summary['enviadas'] += len(chunk)
+            if progress_callback:
+                progress_callback(summary['enviadas'], summary['total'])
+
+        _clear_progress(spreadsheet_id)
+        return summary
+    finally:
+        with _running_lock:
+            _running.discard(spreadsheet_id)
@@ -8,7 +8,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from auth.auth_utils import is_superuser, get_users_data
 from gdrive.gdrive_upload import GoogleDriveUploader
-from gdrive.config import AVALIACOES_ESCADAS_SHEET_NAME, PROJETOS_ESCADAS_SHEET_NAME
+from utils.contadores_uso import get_contadores, reconciliar_contadores
 
 if not is_superuser():
     st.error("🚫 Acesso negado. Esta página é restrita a administradores.")
@@ -26,30 +26,27 @@ users_df = get_users_data()
 with tab_stats:
     st.header("Estatísticas Gerais do Sistema")
     
-    # Carregar dados de todos os usuários
-    total_avaliacoes = 0
-    total_projetos = 0
-    
+    # Contadores materializados na planilha matriz (uma aba pequena em vez de N planilhas)
     active_users = users_df[users_df['status'] == 'ativo']
     
-    for _, user in active_users.iterrows():
-        try:
-            user_uploader = GoogleDriveUploader(is_matrix=False)
-            user_uploader.spreadsheet_id = user['spreadsheet_id']
-            
-            avaliacoes = user_uploader.get_data_from_sheet(AVALIACOES_ESCADAS_SHEET_NAME)
-            projetos = user_uploader.get_data_from_sheet(PROJETOS_ESCADAS_SHEET_NAME)
-            
-            total_avaliacoes += len(avaliacoes) - 1 if avaliacoes and len(avaliacoes) > 1 else 0
-            total_projetos += len(projetos) - 1 if projetos and len(projetos) > 1 else 0
-        except:
-            continue
+    if st.button("Reconciliar Contadores", help="Recalcula os contadores lendo as planilhas de todos os usuários"):
+        with st.spinner("Recontando avaliações e projetos de todos os usuários..."):
+            reconciliados = reconciliar_contadores(users_df)
+        st.success(f"Contadores de {reconciliados} usuário(s) reconciliados.")
+    
+    contadores_df = get_contadores()
+    contadores_ativos = contadores_df[contadores_df['email'].isin(active_users['email'])]
+    total_avaliacoes = int(contadores_ativos['total_avaliacoes'].sum())
+    total_projetos = int(contadores_ativos['total_projetos'].sum())
     
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Usuários Ativos", len(active_users))
     col2.metric("Total de Avaliações", total_avaliacoes)
     col3.metric("Total de Projetos", total_projetos)
     col4.metric("Média Avaliações/Usuário", f"{total_avaliacoes/len(active_users):.1f}" if len(active_users) > 0 else "0")
+    
+    st.subheader("Uso por Usuário")
+    st.dataframe(contadores_ativos.sort_values('ultima_atividade', ascending=False), use_container_width=True, hide_index=True)
 
 with tab_avaliacoes:
     st.header("Todas as Avaliações Realizadas")
@@ -0,0 +1,42 @@
+"""
+Configuração comum dos testes: todos rodam contra o backend fake das APIs do Google
+(gdrive/fake_google.py), recriado a cada teste junto com os caches do processo.
+"""
+import os
+import sys
+
+import pytest
+
+os.environ["RQ12BR_GOOGLE_BACKEND"] = "fake"
+os.environ.setdefault("MPLBACKEND", "Agg")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from gdrive import cache_backend, fake_google, row_index, sheet_cache  # noqa: E402
+from gdrive.config import FAKE_MATRIX_SHEETS_ID  # noqa: E402
+from utils import contadores_uso, leases  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def backend(monkeypatch, tmp_path):
+    """Backend fake novo, caches vazios e diretório de trabalho temporário (histórico local e fila)."""
+    monkeypatch.delenv("RQ12BR_CACHE_BACKEND", raising=False)
+    monkeypatch.delenv("RQ12BR_FAKE_BACKEND_ADDRESS", raising=False)
+    monkeypatch.setattr(fake_google, '_backend', None)
+    monkeypatch.setattr(cache_backend, '_backend', None)
+    monkeypatch.setattr(sheet_cache, '_entries', {})
+    monkeypatch.setattr(sheet_cache, '_revisions', {})
+    monkeypatch.setattr(row_index, '_indexes', {})
+    monkeypatch.setattr(leases, '_aba_verificada', False)
+    monkeypatch.setattr(contadores_uso, '_abas_verificadas', set())
+    monkeypatch.chdir(tmp_path)
+    return fake_google.get_backend()
+
+
+def sheet_rows(backend, spreadsheet_id, title):
+    """Linhas de uma aba do backend fake (cabeçalho incluído)."""
+    spreadsheet = backend.spreadsheets[spreadsheet_id]
+    return next(sheet['rows'] for sheet in spreadsheet.sheets.values() if sheet['title'] == title)
+
+
+def matrix_rows(backend, title):
+    return sheet_rows(backend, FAKE_MATRIX_SHEETS_ID, title)
@@ -0,0 +1,87 @@
+from utils import contadores_uso
+from utils.contadores_uso import CONTADORES_HEADERS, EVENTOS_HEADERS
+
+MES = '2026-10'
+RECONCILIADO_EM = '2026-10-10 12:00:00'
+
+
+def _contador(email='u@x', total=5, mes=3, reconciliado_em=RECONCILIADO_EM):
+    return dict(zip(CONTADORES_HEADERS, [email, total, 0, MES, mes, 0, '2026-10-09 08:00:00', reconciliado_em]))
+
+
+def _evento(em, registrado_em, chave='', email='u@x', tipo='avaliacao'):
+    return dict(zip(EVENTOS_HEADERS, [email, tipo, em, registrado_em, chave]))
+
+
+def _linha(df, email='u@x'):
+    return df[df['email'] == email].iloc[0]
+
+
+def test_evento_registrado_ate_a_reconciliacao_ja_esta_no_contador():
+    df = contadores_uso._agregar([_contador()], [_evento('2026-10-10 11:00:00', RECONCILIADO_EM)], MES)
+    assert _linha(df)['total_avaliacoes'] == 5
+    assert _linha(df)['avaliacoes_mes'] == 3
+
+
+def test_uso_antigo_sincronizado_depois_da_reconciliacao_conta():
+    # O uso é de antes da reconciliação, mas só chegou à aba de eventos depois dela
+    df = contadores_uso._agregar([_contador()], [_evento('2026-10-01 09:00:00', '2026-10-10 12:00:01')], MES)
+    assert _linha(df)['total_avaliacoes'] == 6
+    assert _linha(df)['avaliacoes_mes'] == 4
+
+
+def test_uso_de_outro_mes_so_entra_no_total():
+    df = contadores_uso._agregar([_contador()], [_evento('2026-09-30 23:00:00', '2026-10-11 08:00:00')], MES)
+    assert _linha(df)['total_avaliacoes'] == 6
+    assert _linha(df)['avaliacoes_mes'] == 3
+
+
+def test_evento_sem_registrado_em_usa_o_momento_do_uso():
+    eventos = [_evento('2026-10-09 10:00:00', ''), _evento('2026-10-11 10:00:00', '')]
+    df = contadores_uso._agregar([_contador()], eventos, MES)
+    assert _linha(df)['total_avaliacoes'] == 6
+
+
+def test_chave_repetida_conta_uma_vez():
+    eventos = [
+        _evento('2026-10-11 10:00:00', '2026-10-11 10:00:05', chave='av-1'),
+        _evento('2026-10-11 10:00:00', '2026-10-11 10:05:00', chave='av-1'),
+    ]
+    df = contadores_uso._agregar([_contador()], eventos, MES)
+    assert _linha(df)['total_avaliacoes'] == 6
+
+
+def test_chave_incorporada_na_reconciliacao_nao_conta_ao_ser_reenviada():
+    eventos = [
+        _evento('2026-10-10 11:00:00', '2026-10-10 11:00:05', chave='av-1'),
+        _evento('2026-10-10 11:00:00', '2026-10-10 12:30:00', chave='av-1'),
+    ]
+    df = contadores_uso._agregar([_contador()], eventos, MES)
+    assert _linha(df)['total_avaliacoes'] == 5
+
+
+def test_mes_virado_zera_as_contagens_do_mes():
+    contador = dict(_contador(), mes_referencia='2026-09')
+    df = contadores_uso._agregar([contador], [], MES)
+    assert _linha(df)['total_avaliacoes'] == 5
+    assert _linha(df)['avaliacoes_mes'] == 0
+
+
+def test_usuario_sem_linha_de_contador_vem_so_dos_eventos():
+    df = contadores_uso._agregar([], [_evento('2026-10-11 10:00:00', '2026-10-11 10:00:01', tipo='projeto')], MES)
+    assert _linha(df)['total_projetos'] == 1
+    assert _linha(df)['projetos_mes'] == 1
+    assert _linha(df)['total_avaliacoes'] == 0
+
+
+def test_compactacao_remove_so_o_prefixo_incorporado():
+    linhas = [
+        EVENTOS_HEADERS,
+        ['u@x', 'avaliacao', '2026-10-09 10:00:00', '2026-10-09 10:00:01', 'av-1'],
+        ['v@x', 'avaliacao', '2026-10-09 11:00:00', '2026-10-09 11:00:01', 'av-2'],
+        ['u@x', 'avaliacao', '2026-10-10 13:00:00', '2026-10-10 13:00:01', 'av-3'],
+        ['u@x', 'avaliacao', '2026-10-09 12:00:00', '2026-10-09 12:00:01', 'av-4'],
+    ]
+    # v@x não tem marca: a remoção para na linha dele, mesmo com eventos de u@x incorporados depois
+    assert contadores_uso._eventos_incorporados(linhas, {'u@x': RECONCILIADO_EM}) == 1
+    assert contadores_uso._eventos_incorporados(linhas, {'u@x': RECONCILIADO_EM, 'v@x': RECONCILIADO_EM}) == 2
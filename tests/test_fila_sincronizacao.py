@@ -0,0 +1,53 @@
+from config.sheets_config import read_sheets_config
+from gdrive.config import AVALIACOES_ESCADAS_SHEET_NAME, USAGE_EVENTS_SHEET_NAME
+from gdrive.gdrive_upload import GoogleDriveUploader
+from operations import fila_sincronizacao
+from operations.fila_sincronizacao import TIPO_AVALIACAO
+from utils.contadores_uso import get_contadores, registrar_uso
+
+from conftest import matrix_rows, sheet_rows
+
+SPREADSHEET_ID = 'fake-planilha-usuario'
+FOLDER_ID = 'fake-pasta-usuario'
+EMAIL = 'inspetor@teste.local'
+
+
+def _enfileirar(backend):
+    backend.seed_spreadsheet(SPREADSHEET_ID, 'Dados do inspetor', read_sheets_config())
+    backend.seed_folder(FOLDER_ID, 'Arquivos do inspetor')
+    return fila_sincronizacao.enqueue(TIPO_AVALIACAO, {'id': 'av-1', 'local': 'Galpão'}, EMAIL, SPREADSHEET_ID, FOLDER_ID)
+
+
+def _gravar_linha(entry):
+    """Simula um envio anterior interrompido depois do append e antes de marcar `linha_gravada`."""
+    row = fila_sincronizacao.build_row(TIPO_AVALIACAO, entry['dados'], {}, entry['criado_em'])
+    GoogleDriveUploader(spreadsheet_id=SPREADSHEET_ID, folder_id=FOLDER_ID).append_data_to_sheet(AVALIACOES_ESCADAS_SHEET_NAME, [row])
+
+
+def test_envio_grava_a_linha_e_o_uso(backend):
+    entry = _enfileirar(backend)
+    assert fila_sincronizacao.flush_queue() == (1, 0)
+    assert [row[0] for row in sheet_rows(backend, SPREADSHEET_ID, AVALIACOES_ESCADAS_SHEET_NAME)[1:]] == ['av-1']
+    eventos = matrix_rows(backend, USAGE_EVENTS_SHEET_NAME)[1:]
+    assert [(row[0], row[2], row[4]) for row in eventos] == [(EMAIL, entry['criado_em'], 'av-1')]
+    assert fila_sincronizacao.get_pending_entries() == []
+
+
+def test_linha_ja_gravada_nao_duplica_e_registra_o_uso(backend):
+    entry = _enfileirar(backend)
+    _gravar_linha(entry)
+    assert fila_sincronizacao.flush_queue() == (1, 0)
+    assert [row[0] for row in sheet_rows(backend, SPREADSHEET_ID, AVALIACOES_ESCADAS_SHEET_NAME)[1:]] == ['av-1']
+    eventos = matrix_rows(backend, USAGE_EVENTS_SHEET_NAME)[1:]
+    assert [(row[0], row[2], row[4]) for row in eventos] == [(EMAIL, entry['criado_em'], 'av-1')]
+
+
+def test_uso_ja_registrado_conta_uma_vez(backend):
+    entry = _enfileirar(backend)
+    # Interrompido também depois de registrar o uso: o reenvio registra de novo com a mesma chave
+    _gravar_linha(entry)
+    registrar_uso(EMAIL, TIPO_AVALIACAO, [entry['criado_em']], [entry['id']])
+    assert fila_sincronizacao.flush_queue() == (1, 0)
+    assert len(matrix_rows(backend, USAGE_EVENTS_SHEET_NAME)[1:]) == 2
+    contadores = get_contadores()
+    assert int(contadores[contadores['email'] == EMAIL]['total_avaliacoes'].iloc[0]) == 1
@@ -0,0 +1,38 @@
+from gdrive.config import USERS_SHEET_NAME
+from gdrive.gdrive_upload import GoogleDriveUploader
+
+from conftest import matrix_rows
+
+EMAIL = 'inspetor@teste.local'
+
+
+def _usuarios_sem_coluna(backend, coluna):
+    """Aba de usuários criada antes de `coluna` existir, com um usuário."""
+    rows = matrix_rows(backend, USERS_SHEET_NAME)
+    header = [column for column in rows[0] if column != coluna]
+    rows[:] = [header, [{'email': EMAIL, 'nome': 'Inspetor', 'status': 'ativo'}.get(column, '') for column in header]]
+    return header
+
+
+def test_update_row_by_key_ignora_coluna_ausente(backend, capsys):
+    header = _usuarios_sem_coluna(backend, 'trial_end_date')
+    uploader = GoogleDriveUploader(is_matrix=True)
+    row_number = uploader.update_row_by_key(USERS_SHEET_NAME, EMAIL, {'status': 'inativo', 'trial_end_date': '2026-12-31'})
+    assert row_number == 2
+    row = matrix_rows(backend, USERS_SHEET_NAME)[1]
+    assert row[header.index('status')] == 'inativo'
+    assert '2026-12-31' not in row
+    assert "trial_end_date" in capsys.readouterr().out
+
+
+def test_update_row_by_key_com_lote_so_agenda_colunas_existentes(backend):
+    _usuarios_sem_coluna(backend, 'trial_end_date')
+    uploader = GoogleDriveUploader(is_matrix=True)
+    batch = uploader.write_batch()
+    assert uploader.update_row_by_key(USERS_SHEET_NAME, EMAIL, {'trial_end_date': '2026-12-31'}, batch=batch) == 2
+    assert batch.commit()['updated_cells'] == 0
+
+
+def test_update_row_by_key_chave_inexistente(backend):
+    uploader = GoogleDriveUploader(is_matrix=True)
+    assert uploader.update_row_by_key(USERS_SHEET_NAME, 'ninguem@teste.local', {'status': 'inativo'}) is None
@@ -0,0 +1,58 @@
+from utils import leases
+from utils.leases import EVENTO_LIBERACAO, EVENTO_PEDIDO
+from gdrive.gdrive_upload import GoogleDriveUploader
+
+
+def _pedido(nonce, em, ttl=60, nome='job'):
+    return [nome, nonce, EVENTO_PEDIDO, str(em), str(em + ttl)]
+
+
+def _liberacao(nonce, em, nome='job'):
+    return [nome, nonce, EVENTO_LIBERACAO, str(em), str(em)]
+
+
+def test_primeiro_pedido_fica_com_o_lease():
+    assert leases._holder([_pedido('a', 100), _pedido('b', 101)], 'job') == 'a'
+
+
+def test_liberacao_deixa_o_proximo_pedido_ganhar():
+    rows = [_pedido('a', 100), _liberacao('a', 110), _pedido('b', 111)]
+    assert leases._holder(rows, 'job') == 'b'
+
+
+def test_pedido_feito_antes_da_liberacao_nao_fica_com_o_lease():
+    rows = [_pedido('a', 100), _pedido('b', 105), _liberacao('a', 110)]
+    assert leases._holder(rows, 'job') is None
+
+
+def test_lease_vencido_passa_para_o_proximo_pedido():
+    assert leases._holder([_pedido('a', 100, ttl=10), _pedido('b', 110)], 'job') == 'b'
+
+
+def test_liberacao_de_quem_nao_e_dono_e_ignorada():
+    assert leases._holder([_pedido('a', 100), _liberacao('b', 101)], 'job') == 'a'
+
+
+def test_outros_nomes_e_linhas_invalidas_sao_ignorados():
+    rows = [_pedido('x', 100, nome='outro'), ['job', 'y', EVENTO_PEDIDO, 'abc', ''], _pedido('a', 101)]
+    assert leases._holder(rows, 'job') == 'a'
+
+
+def test_acquire_e_release_no_backend_fake():
+    uploader = GoogleDriveUploader(is_matrix=True)
+    nonce = leases.acquire(uploader, 'job', 60)
+    assert nonce is not None
+    assert leases.acquire(uploader, 'job', 60) is None
+    assert leases.acquire(uploader, 'outro-job', 60) is not None
+    leases.release(uploader, 'job', nonce)
+    assert leases.acquire(uploader, 'job', 60) is not None
+
+
+def test_held_informa_se_obteve_o_lease():
+    uploader = GoogleDriveUploader(is_matrix=True)
+    with leases.held(uploader, 'job', 60) as obtido:
+        assert obtido
+        with leases.held(uploader, 'job', 60) as concorrente:
+            assert not concorrente
+    with leases.held(uploader, 'job', 60) as obtido:
+        assert obtido
@@ -1,7 +1,14 @@
+import re
 import streamlit as st
 from datetime import datetime
 import pytz
 
+AUDIT_LOG_HEADERS = ['timestamp', 'user_email', 'action', 'details']
+# Ações que também vão para o índice de erros recentes (aba log_erros_recentes)
+ERROR_ACTION_PATTERN = "FALHA|ERRO"
+
+_errors_sheet_ready = False
+
 def log_action(action, details=""):
     """
     Registra uma ação no log de auditoria do sistema
@@ -10,10 +17,11 @@ def log_action(action, details=""):
         action (str): Tipo de ação realizada (ex: "LOGIN_SUCCESS", "AVALIACAO_CRIADA")
         details (str): Detalhes adicionais sobre a ação
     """
+    global _errors_sheet_ready
     try:
         # Importar aqui para evitar circular imports
         from gdrive.gdrive_upload import GoogleDriveUploader
-        from gdrive.config import AUDIT_LOG_SHEET_NAME
+        from gdrive.config import AUDIT_LOG_SHEET_NAME, AUDIT_ERRORS_SHEET_NAME
         from auth.auth_utils import get_user_email
         
         # Obter informações do usuário
@@ -35,6 +43,13 @@ def log_action(action, details=""):
         try:
             matrix_uploader = GoogleDriveUploader(is_matrix=True)
             matrix_uploader.append_data_to_sheet(AUDIT_LOG_SHEET_NAME, [log_row])
+            
+            # Erros também vão para um índice pequeno, lido pelo painel do administrador
+            if re.search(ERROR_ACTION_PATTERN, action, re.IGNORECASE):
+                if not _errors_sheet_ready:
+                    matrix_uploader.ensure_sheet(AUDIT_ERRORS_SHEET_NAME, AUDIT_LOG_HEADERS)
+                    _errors_sheet_ready = True
+                matrix_uploader.append_data_to_sheet(AUDIT_ERRORS_SHEET_NAME, [log_row])
         except Exception as e:
             # Se falhar ao salvar no Google Sheets, registra no console mas não interrompe
             print(f"⚠️ Aviso: Não foi possível salvar log de auditoria: {e}")
@@ -0,0 +1,251 @@
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from gdrive.config import USAGE_EVENTS_COMPACTION_LEASE_SECONDS
+from utils import leases
+
+# Colunas da aba de contadores materializados na planilha matriz. Cada linha vale
+# até `reconciliado_em`; os usos posteriores vêm da aba de eventos de uso.
+CONTADORES_HEADERS = [
+    'email', 'total_avaliacoes', 'total_projetos', 'mes_referencia',
+    'avaliacoes_mes', 'projetos_mes', 'ultima_atividade', 'reconciliado_em'
+]
+_CAMPOS_NUMERICOS = ['total_avaliacoes', 'total_projetos', 'avaliacoes_mes', 'projetos_mes']
+
+# Aba de eventos de uso: só recebe appends (atômicos no Sheets), então gravações
+# simultâneas de réplicas diferentes não se perdem. É somada aos contadores na leitura.
+# `em` é o momento do uso (define o mês); `registrado_em`, o momento do append, que é
+# comparado com `reconciliado_em` (um uso antigo sincronizado depois ainda conta).
+# `chave` (id da avaliação/projeto, quando houver) evita contar duas vezes um uso
+# registrado de novo após um envio interrompido.
+# A reconciliação remove os eventos que já incorporou (`_compactar_eventos`).
+EVENTOS_HEADERS = ['email', 'tipo', 'em', 'registrado_em', 'chave']
+
+# Uma reconciliação por vez no processo; entre réplicas, a compactação dos eventos usa um lease
+_lock = threading.Lock()
+LEASE_COMPACTACAO = 'eventos_uso:compactacao'
+_abas_verificadas = set()
+
+
+def _verificar_aba(matrix_uploader, sheet_name, headers):
+    """Cria a aba no primeiro uso do processo, se ainda não existir."""
+    if sheet_name not in _abas_verificadas:
+        matrix_uploader.ensure_sheet(sheet_name, headers)
+        _abas_verificadas.add(sheet_name)
+
+
+def _inteiro(valor):
+    try:
+        return int(float(valor))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _ler_aba(matrix_uploader, sheet_name, headers):
+    """Lê uma aba da planilha matriz e retorna uma lista de (linha_na_planilha, registro)."""
+    _verificar_aba(matrix_uploader, sheet_name, headers)
+    data = matrix_uploader.get_data_from_sheet(sheet_name)
+    if not data or len(data) < 2:
+        return []
+    header = data[0]
+    registros = []
+    for row_number, row in enumerate(data[1:], start=2):
+        padded = list(row) + [''] * (len(header) - len(row))
+        registros.append((row_number, dict(zip(header, padded))))
+    return registros
+
+
+def _ler_contadores(matrix_uploader):
+    """Lê a aba de contadores e retorna uma lista de (linha_na_planilha, registro)."""
+    from gdrive.config import USAGE_COUNTERS_SHEET_NAME
+    return _ler_aba(matrix_uploader, USAGE_COUNTERS_SHEET_NAME, CONTADORES_HEADERS)
+
+
+def _ler_eventos(matrix_uploader):
+    """Lê a aba de eventos de uso e retorna a lista de registros."""
+    from gdrive.config import USAGE_EVENTS_SHEET_NAME
+    return [registro for _, registro in _ler_aba(matrix_uploader, USAGE_EVENTS_SHEET_NAME, EVENTOS_HEADERS)]
+
+
+def registrar_uso(user_email, tipo, momentos=None, chaves=None):
+    """
+    Registra usos do usuário após salvar avaliações ou projetos (um único append na aba de eventos)
+
+    Args:
+        user_email (str): Email do usuário
+        tipo (str): "avaliacao" ou "projeto"
+        momentos (list): Momento de cada uso ('%Y-%m-%d %H:%M:%S', '' se desconhecido); padrão: um uso agora
+        chaves (list): Id de cada uso (mesma ordem de `momentos`); usos com a mesma chave contam uma vez
+    """
+    try:
+        from gdrive.gdrive_upload import GoogleDriveUploader
+        from gdrive.config import USAGE_EVENTS_SHEET_NAME
+
+        if not user_email:
+            return
+        matrix_uploader = GoogleDriveUploader(is_matrix=True)
+        _verificar_aba(matrix_uploader, USAGE_EVENTS_SHEET_NAME, EVENTOS_HEADERS)
+        agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if momentos is None:
+            momentos = [agora]
+        chaves = chaves or [''] * len(momentos)
+        if momentos:
+            matrix_uploader.append_data_to_sheet(USAGE_EVENTS_SHEET_NAME, [
+                [user_email, tipo, em, agora, chave] for em, chave in zip(momentos, chaves)
+            ])
+
+    except Exception as e:
+        # Falha silenciosa - a reconciliação corrige contadores que ficarem para trás
+        print(f"⚠️ Erro ao atualizar contadores de uso: {e}")
+
+
+def get_contadores():
+    """
+    Retorna os contadores como DataFrame: a aba de contadores somada aos eventos de uso
+    posteriores à última reconciliação de cada usuário (contagens do mês zeradas se o mês virou).
+    """
+    from gdrive.gdrive_upload import GoogleDriveUploader
+
+    matrix_uploader = GoogleDriveUploader(is_matrix=True)
+    registros = [registro for _, registro in _ler_contadores(matrix_uploader)]
+    return _agregar(registros, _ler_eventos(matrix_uploader), datetime.now().strftime('%Y-%m'))
+
+
+def _agregar(registros, eventos, mes_atual):
+    """Soma aos registros da aba de contadores os eventos registrados depois da reconciliação de cada um."""
+    contadores = {}
+    for registro in registros:
+        registro = dict(registro)
+        for campo in _CAMPOS_NUMERICOS:
+            registro[campo] = _inteiro(registro.get(campo))
+        if registro.get('mes_referencia') != mes_atual:
+            registro['avaliacoes_mes'] = registro['projetos_mes'] = 0
+        contadores[registro['email']] = registro
+
+    chaves_vistas = set()
+    for evento in eventos:
+        chave = evento.get('chave')
+        if chave:
+            if chave in chaves_vistas:
+                continue
+            chaves_vistas.add(chave)
+        registro = contadores.get(evento['email'])
+        if registro is None:
+            registro = contadores[evento['email']] = dict(
+                {campo: 0 for campo in _CAMPOS_NUMERICOS},
+                email=evento['email'], mes_referencia=mes_atual, ultima_atividade='', reconciliado_em=''
+            )
+        # Eventos gravados até a reconciliação já estão nos contadores da linha.
+        # Eventos anteriores à coluna `registrado_em` usam o momento do uso.
+        reconciliado_em = registro.get('reconciliado_em') or ''
+        if reconciliado_em and (evento.get('registrado_em') or evento.get('em', '')) <= reconciliado_em:
+            continue
+        em = evento.get('em', '')
+        campo_total, campo_mes = ('total_avaliacoes', 'avaliacoes_mes') if evento['tipo'] == 'avaliacao' else ('total_projetos', 'projetos_mes')
+        registro[campo_total] += 1
+        if em.startswith(mes_atual):
+            registro[campo_mes] += 1
+        registro['ultima_atividade'] = max(registro.get('ultima_atividade') or '', em)
+
+    return pd.DataFrame(list(contadores.values()), columns=CONTADORES_HEADERS)
+
+
+def contar_avaliacoes_mes(user_email):
+    """
+    Número de avaliações do usuário no mês corrente segundo os contadores, somadas as
+    avaliações do mês que ainda aguardam na fila de sincronização (só entram nos
+    contadores depois de enviadas). None se a aba não pôde ser lida ou o usuário
+    ainda não tem linha nela: quem chama usa o histórico local.
+    """
+    # Import local: a fila de sincronização importa este módulo
+    from operations.fila_sincronizacao import TIPO_AVALIACAO, get_pending_entries
+
+    try:
+        df = get_contadores()
+    except Exception as e:
+        print(f"⚠️ Aviso: Não foi possível ler os contadores de uso: {e}")
+        return None
+    linha = df[df['email'] == user_email]
+    if linha.empty:
+        return None
+    mes_atual = datetime.now().strftime('%Y-%m')
+    pendentes = sum(
+        1 for item in get_pending_entries(user_email)
+        if item['tipo'] == TIPO_AVALIACAO and item['criado_em'].startswith(mes_atual)
+    )
+    return int(linha['avaliacoes_mes'].iloc[0]) + pendentes
+
+
+def reconciliar_contadores(users_df):
+    """
+    Recalcula todos os contadores a partir das planilhas dos usuários e reescreve a aba
+
+    Args:
+        users_df (DataFrame): Usuários cadastrados (colunas 'email' e 'spreadsheet_id')
+
+    Returns:
+        int: Número de usuários com contadores gravados
+    """
+    from gdrive.gdrive_upload import GoogleDriveUploader
+    from gdrive.config import USAGE_COUNTERS_SHEET_NAME
+    from operations.estatisticas_escadas import contar_registros_por_usuario
+
+    usuarios = users_df[users_df['spreadsheet_id'].astype(str).str.len() > 0]
+    # Marca tomada antes da leitura: um uso gravado durante a leitura pode ser contado
+    # duas vezes (planilha e evento), mas nunca fica de fora
+    reconciliado_em = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    resumos = contar_registros_por_usuario(usuarios['spreadsheet_id'].tolist())
+    mes_atual = datetime.now().strftime('%Y-%m')
+
+    matrix_uploader = GoogleDriveUploader(is_matrix=True)
+    with _lock:
+        # Usuários cuja planilha não pôde ser lida mantêm os contadores atuais
+        existentes = {registro['email']: registro for _, registro in _ler_contadores(matrix_uploader)}
+
+        linhas = []
+        for _, user in usuarios.iterrows():
+            resumo = resumos.get(user['spreadsheet_id'])
+            if resumo is not None:
+                linhas.append([
+                    user['email'], resumo['avaliacoes'], resumo['projetos'], mes_atual,
+                    resumo['avaliacoes_mes'], resumo['projetos_mes'], resumo['ultima_atividade'], reconciliado_em
+                ])
+            elif user['email'] in existentes:
+                linhas.append([existentes[user['email']].get(col, '') for col in CONTADORES_HEADERS])
+
+        matrix_uploader.overwrite_sheet(USAGE_COUNTERS_SHEET_NAME, pd.DataFrame(linhas, columns=CONTADORES_HEADERS))
+
+        marcas = {linha[0]: linha[-1] for linha in linhas if linha[-1]}
+        with leases.held(matrix_uploader, LEASE_COMPACTACAO, USAGE_EVENTS_COMPACTION_LEASE_SECONDS) as obtido:
+            if obtido:
+                _compactar_eventos(matrix_uploader, marcas)
+    return len(linhas)
+
+
+def _eventos_incorporados(linhas, marcas):
+    """
+    Quantas linhas do início da aba de eventos já estão nos contadores: gravadas até a
+    marca de reconciliação do usuário. A remoção só pode levar um prefixo da aba.
+    """
+    header = linhas[0] if linhas else EVENTOS_HEADERS
+    count = 0
+    for row in linhas[1:]:
+        evento = dict(zip(header, list(row) + [''] * (len(header) - len(row))))
+        marca = marcas.get(evento['email'])
+        if not marca or (evento.get('registrado_em') or evento.get('em', '')) > marca:
+            break
+        count += 1
+    return count
+
+
+def _compactar_eventos(matrix_uploader, marcas):
+    """Remove da aba de eventos o prefixo já incorporado pela reconciliação. Retorna o número de linhas removidas."""
+    from gdrive.config import USAGE_EVENTS_SHEET_NAME
+
+    linhas = matrix_uploader.get_data_from_sheet(USAGE_EVENTS_SHEET_NAME)
+    count = _eventos_incorporados(linhas, marcas)
+    if not count or not matrix_uploader.delete_rows_if_unchanged(USAGE_EVENTS_SHEET_NAME, 2, linhas[1:1 + count]):
+        return 0
+    return count
@@ -0,0 +1,87 @@
+"""
+Leases entre réplicas, gravados na planilha matriz (aba `leases_jobs`).
+
+Os locks de thread só valem dentro de um processo. Para que uma operação que
+altera a planilha matriz (reservas e reabastecimento do pool de ambientes,
+arquivamento do log de auditoria) rode em uma réplica por vez, a réplica anexa
+à aba uma linha pedindo o lease e relê a aba. O append do Sheets é atômico e
+ordenado: todas as réplicas enxergam a mesma sequência de linhas e chegam ao
+mesmo dono. Um pedido só fica com o lease se ele estava livre (liberado ou
+vencido) quando o pedido foi gravado; os demais desistem.
+
+Só se pede o lease quando há trabalho a fazer, então a aba cresce devagar.
+"""
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from gdrive.config import JOB_LEASES_SHEET_NAME
+
+LEASE_HEADERS = ['nome', 'nonce', 'evento', 'em', 'expira_em']
+EVENTO_PEDIDO = 'pedido'
+EVENTO_LIBERACAO = 'liberacao'
+
+_sheet_lock = threading.Lock()
+_aba_verificada = False
+
+
+def _ensure_sheet(uploader):
+    global _aba_verificada
+    with _sheet_lock:
+        if not _aba_verificada:
+            uploader.ensure_sheet(JOB_LEASES_SHEET_NAME, LEASE_HEADERS)
+            _aba_verificada = True
+
+
+def _holder(rows, name):
+    """Nonce do dono do lease depois da última linha da aba, ou None se está livre."""
+    current = None
+    for row in rows:
+        record = dict(zip(LEASE_HEADERS, list(row) + [''] * (len(LEASE_HEADERS) - len(row))))
+        if record['nome'] != name:
+            continue
+        try:
+            at, expires_at = int(record['em']), int(record['expira_em'])
+        except ValueError:
+            continue
+        if record['evento'] == EVENTO_LIBERACAO:
+            if current is not None and current['nonce'] == record['nonce']:
+                current = None
+        elif current is None or at >= current['expira_em']:
+            current = {'nonce': record['nonce'], 'expira_em': expires_at}
+    return current['nonce'] if current is not None else None
+
+
+def acquire(uploader, name, ttl):
+    """
+    Tenta obter o lease `name` por `ttl` segundos na planilha matriz do `uploader`.
+    Retorna o nonce do lease (necessário para liberá-lo) ou None se outra réplica o detém.
+    """
+    _ensure_sheet(uploader)
+    nonce = uuid.uuid4().hex
+    now = int(time.time())
+    uploader.append_data_to_sheet(JOB_LEASES_SHEET_NAME, [[name, nonce, EVENTO_PEDIDO, now, now + ttl]])
+    # A releitura passa pela API: o append acima invalida a aba no cache
+    rows = uploader.get_data_from_sheet(JOB_LEASES_SHEET_NAME)[1:]
+    return nonce if _holder(rows, name) == nonce else None
+
+
+def release(uploader, name, nonce):
+    """Libera o lease. Em caso de falha, o lease vence sozinho ao fim do ttl."""
+    try:
+        now = int(time.time())
+        uploader.append_data_to_sheet(JOB_LEASES_SHEET_NAME, [[name, nonce, EVENTO_LIBERACAO, now, now]])
+    except Exception as e:
+        print(f"⚠️ Aviso: Não foi possível liberar o lease '{name}' (vence sozinho): {e}")
+
+
+@contextmanager
+def held(uploader, name, ttl):
+    """Bloco executado com o lease: `with held(...) as obtido:` (obtido=False se outra réplica o detém)."""
+    nonce = acquire(uploader, name, ttl)
+    try:
+        yield nonce is not None
+    finally:
+        if nonce is not None:
+            release(uploader, name, nonce)
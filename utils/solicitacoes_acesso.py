@@ -0,0 +1,150 @@
+"""
+Índice em memória das solicitações de acesso pendentes, por email.
+
+A aba `solicitacoes_acesso` é lida de forma incremental pelo cache de abas e o
+índice acompanha essa leitura: a cada consulta, só as linhas novas do final da
+aba são examinadas. Quando o cache relê a aba inteira (nova "geração"), o índice
+é reconstruído. As solicitações gravadas por este processo (`add_request`) entram
+no índice pela linha devolvida pelo append, e as aprovações e rejeições feitas
+pelo painel (`resolve_request`) saem dele na hora.
+
+O status é editado no lugar, e a leitura incremental não enxerga a edição feita
+por outra réplica até a próxima releitura completa. Por isso, antes de agir
+sobre uma solicitação, `confirm_pending` relê a linha direto da planilha. Entre a
+conferência e a gravação do status (que na aprovação inclui provisionar o
+ambiente), o painel segura o lease da solicitação (`request_lease`), para que
+dois administradores não resolvam a mesma solicitação ao mesmo tempo.
+"""
+import threading
+from datetime import datetime
+
+import pytz
+
+from gdrive import row_index, sheet_cache
+from gdrive.config import ACCESS_REQUESTS_SHEET_NAME, ACCESS_REQUEST_LEASE_SECONDS
+from gdrive.gdrive_upload import GoogleDriveUploader
+from utils import leases
+
+STATUS_PENDENTE = "Pendente"
+# Coluna 'status' da aba (F)
+STATUS_COLUMN = "F"
+
+_lock = threading.Lock()
+_state = {
+    'spreadsheet_id': None,
+    'generation': None,
+    'header': None,     # cabeçalho da aba na última leitura
+    'scanned': 0,       # linhas da aba (com o cabeçalho) já examinadas
+    'pending': {},      # número da linha -> registro da solicitação pendente
+    'by_email': {},     # email -> números das linhas pendentes desse email
+}
+
+
+def _reset(spreadsheet_id, generation):
+    _state.update(spreadsheet_id=spreadsheet_id, generation=generation, header=None, scanned=0, pending={}, by_email={})
+
+
+def _remove_pending(row_number):
+    record = _state['pending'].pop(row_number, None)
+    if record is None:
+        return
+    rows = _state['by_email'].get(record['email_usuario'], set())
+    rows.discard(row_number)
+    if not rows:
+        _state['by_email'].pop(record['email_usuario'], None)
+
+
+def _sync(uploader):
+    """Atualiza o índice com as linhas que ainda não foram examinadas."""
+    rows = uploader.get_data_from_sheet(ACCESS_REQUESTS_SHEET_NAME)
+    entry = sheet_cache.get_entry(uploader.spreadsheet_id, ACCESS_REQUESTS_SHEET_NAME)
+    generation = entry.generation if entry is not None else None
+
+    with _lock:
+        if (_state['spreadsheet_id'] != uploader.spreadsheet_id or _state['generation'] != generation
+                or len(rows) < _state['scanned']):
+            _reset(uploader.spreadsheet_id, generation)
+        if not rows:
+            return
+        header = _state['header'] = rows[0]
+        for row_number, row in enumerate(rows[max(1, _state['scanned']):], start=max(2, _state['scanned'] + 1)):
+            padded = list(row) + [''] * (len(header) - len(row))
+            record = dict(zip(header, padded))
+            if record.get('status') == STATUS_PENDENTE:
+                _state['pending'][row_number] = record
+                _state['by_email'].setdefault(record.get('email_usuario', ''), set()).add(row_number)
+        _state['scanned'] = len(rows)
+
+
+def get_pending_requests(uploader=None):
+    """Retorna [(linha_na_planilha, registro)] das solicitações pendentes, na ordem da aba."""
+    uploader = uploader or GoogleDriveUploader(is_matrix=True)
+    _sync(uploader)
+    with _lock:
+        return [(row_number, dict(record)) for row_number, record in sorted(_state['pending'].items())]
+
+
+def has_pending_request(user_email, uploader=None):
+    """Indica se o email já tem uma solicitação de acesso pendente."""
+    uploader = uploader or GoogleDriveUploader(is_matrix=True)
+    _sync(uploader)
+    with _lock:
+        return bool(_state['by_email'].get(user_email))
+
+
+def add_request(user_name, user_email, justification, uploader=None):
+    """Grava uma nova solicitação de trial pendente no final da aba."""
+    uploader = uploader or GoogleDriveUploader(is_matrix=True)
+    timestamp = datetime.now(pytz.timezone("America/Sao_Paulo")).strftime('%Y-%m-%d %H:%M:%S')
+    request_row = [timestamp, user_name, user_email, "Solicitação de Trial", justification, STATUS_PENDENTE]
+    result = uploader.append_data_to_sheet(ACCESS_REQUESTS_SHEET_NAME, [request_row])
+    row_number = row_index.parse_first_row((result or {}).get('updates', {}).get('updatedRange'))
+    with _lock:
+        # Só entra direto se o índice já examinou todas as linhas anteriores; senão a
+        # próxima leitura incremental a encontra
+        if (row_number is not None and _state['header'] and _state['spreadsheet_id'] == uploader.spreadsheet_id
+                and _state['scanned'] == row_number - 1):
+            record = dict(zip(_state['header'], request_row))
+            _state['pending'][row_number] = record
+            _state['by_email'].setdefault(user_email, set()).add(row_number)
+            _state['scanned'] = row_number
+
+
+def request_lease(row_number, uploader=None):
+    """Lease entre réplicas de uma solicitação: `with request_lease(linha) as obtido:`."""
+    uploader = uploader or GoogleDriveUploader(is_matrix=True)
+    return leases.held(uploader, f"solicitacao_acesso:{row_number}", ACCESS_REQUEST_LEASE_SECONDS)
+
+
+def confirm_pending(row_number, user_email, uploader=None):
+    """
+    Relê a linha da solicitação na planilha e confirma que ela ainda é do email e está pendente.
+    Se outra réplica já a resolveu, a solicitação sai do índice e retorna False.
+    """
+    uploader = uploader or GoogleDriveUploader(is_matrix=True)
+    header, row = uploader.batch_get([
+        f"{ACCESS_REQUESTS_SHEET_NAME}!A1:Z1", f"{ACCESS_REQUESTS_SHEET_NAME}!A{row_number}:Z{row_number}"
+    ])
+    if header and row:
+        header, row = header[0], row[0]
+        record = dict(zip(header, list(row) + [''] * (len(header) - len(row))))
+        if record.get('email_usuario') == user_email and record.get('status') == STATUS_PENDENTE:
+            return True
+    with _lock:
+        _remove_pending(row_number)
+    return False
+
+
+def resolve_request(row_number, user_email, status, batch):
+    """
+    Grava o status da solicitação (ex.: 'Aprovado', 'Rejeitado') junto com as demais
+    escritas do lote e a retira do índice de pendentes. Se a solicitação já não está
+    pendente na planilha, o lote não é enviado e retorna False.
+    """
+    if not confirm_pending(row_number, user_email, batch.uploader):
+        return False
+    batch.update(ACCESS_REQUESTS_SHEET_NAME, f"{STATUS_COLUMN}{row_number}", [[status]])
+    batch.commit()
+    with _lock:
+        _remove_pending(row_number)
+    return True
@@ -0,0 +1,319 @@
+"""
+Teste de carga do app com várias sessões simultâneas de inspetores simulados.
+
+Cada sessão roda o `main.py` pela API de testes do Streamlit (AppTest) contra o
+backend fake das APIs do Google (gdrive/fake_google.py) e executa, em ordem:
+login, avaliação de uma escada, salvamento no histórico e abertura do histórico.
+
+Uso:
+    python -m utils.teste_carga --sessoes 20 --latencia-ms 80
+
+O relatório traz a latência por ação (p50/p95/p99), a memória retida por sessão
+(tracemalloc) e as chamadas às APIs por ação, medidas em uma sessão isolada antes
+da rodada concorrente para não misturar as contagens. Antes de cada contagem a
+fila local de sincronização é esvaziada, para que as chamadas feitas em segundo
+plano (ex.: upload das imagens) caiam na ação que as gerou.
+
+O AppTest não pode rodar reruns em paralelo no mesmo processo (cada `run()` troca
+o Runtime global do Streamlit e o desfaz ao terminar). Por isso cada sessão da
+rodada concorrente roda em um processo próprio, como uma réplica do app: o
+processo principal serve o backend fake (`fake_google.serve`) e o cache
+compartilhado fica em disco. As sessões partem juntas e a latência de uma ação
+vai do clique ao fim do rerun, incluindo toda espera por recursos compartilhados
+(backend, cota, leases).
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date
+
+# O teste sempre usa o backend fake (com o login simulado liberado) e um backend do matplotlib sem interface gráfica
+os.environ["RQ12BR_GOOGLE_BACKEND"] = "fake"
+os.environ["RQ12BR_ALLOW_SIMULATED_LOGIN"] = "1"
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+# Segredos mínimos da rodada. O superusuário não é nenhum dos inspetores simulados.
+SECRETS_TOML = """[superuser]
+admin_email = "admin@teste-carga.local"
+
+[google_drive]
+backend = "fake"
+"""
+
+if __name__ == "__main__":
+    # Arquivos locais do app (histórico JSON, imagens) e o .streamlit/secrets.toml da rodada ficam
+    # em um diretório temporário. Vem antes do import do Streamlit, que fixa os caminhos dos
+    # segredos a partir do diretório atual.
+    os.chdir(tempfile.mkdtemp(prefix="rq12br-carga-"))
+    os.makedirs(".streamlit")
+    with open(os.path.join(".streamlit", "secrets.toml"), 'w', encoding='utf-8') as f:
+        f.write(SECRETS_TOML)
+    # As sessões em processos separados compartilham o cache como réplicas (herdam estas variáveis)
+    os.environ["RQ12BR_CACHE_BACKEND"] = "disk"
+    os.environ["RQ12BR_CACHE_DIR"] = os.path.abspath("cache")
+
+from streamlit.testing.v1 import AppTest
+
+from auth.auth_utils import invalidate_users_cache
+from config.sheets_config import read_sheets_config
+from gdrive import fake_google
+from gdrive.gdrive_upload import GoogleDriveUploader
+from gdrive.config import USERS_SHEET_NAME, FAKE_BACKEND_ADDRESS_ENV_VAR, FAKE_BACKEND_AUTHKEY_ENV_VAR
+from operations.fila_sincronizacao import flush_queue, get_pending_entries
+
+MAIN_PATH = os.path.join(ROOT_DIR, 'main.py')
+ACOES = ['login', 'avaliar', 'salvar', 'historico']
+# Passadas de envio ao esvaziar a fila local antes de uma contagem
+MAX_PASSADAS_FILA = 5
+# O AppTest instala o script do app como __main__; o spawn dos processos das sessões precisa deste módulo
+_MODULO_PRINCIPAL = sys.modules.get('__main__')
+
+
+def preparar_usuarios(quantidade, plano='pro'):
+    """Cria no backend fake um ambiente (planilha + pasta) e um usuário ativo para cada sessão."""
+    backend = fake_google.get_backend()
+    sheets_config = read_sheets_config()
+    usuarios, linhas = [], []
+    for numero in range(1, quantidade + 1):
+        email = f"inspetor{numero}@teste-carga.local"
+        nome = f"Inspetor {numero}"
+        spreadsheet_id = backend.new_id('planilha')
+        folder_id = backend.new_id('pasta')
+        backend.seed_folder(folder_id, f"SFIA - Arquivos de {nome}")
+        backend.seed_spreadsheet(spreadsheet_id, f"ISF IA - Dados de {nome}", sheets_config)
+        usuarios.append({'email': email, 'nome': nome})
+        linhas.append([email, nome, 'editor', plano, 'ativo', spreadsheet_id, folder_id, date.today().isoformat(), '', '', '', ''])
+    GoogleDriveUploader(is_matrix=True).append_data_to_sheet(USERS_SHEET_NAME, linhas)
+    # Como na aprovação pelo painel: o diretório de usuários em cache não conhece os novos usuários
+    invalidate_users_cache()
+    return usuarios
+
+
+def _clicar(app, rotulo):
+    botao = next((b for b in app.button if b.label == rotulo), None)
+    if botao is None:
+        raise RuntimeError(f"Botão '{rotulo}' não encontrado na tela.")
+    botao.click()
+
+
+def _selecionar_menu(app, opcao):
+    menu = next((s for s in app.sidebar.selectbox if s.label == "Selecione uma opção:"), None)
+    if menu is None:
+        raise RuntimeError("Menu lateral não encontrado na tela.")
+    menu.select(opcao)
+
+
+def executar_sessao(usuario, timeout, ao_medir=None):
+    """
+    Executa o roteiro de um inspetor e retorna (app, [(acao, segundos, erro)]).
+    `ao_medir(acao)` é chamado antes de cada ação (usado para contar chamadas às APIs).
+    """
+    app = AppTest.from_file(MAIN_PATH, default_timeout=timeout)
+    app.session_state['usuario_simulado'] = usuario
+    preparos = {
+        'login': lambda: None,
+        'avaliar': lambda: _clicar(app, "Avaliar Conformidade"),
+        'salvar': lambda: _clicar(app, "Salvar no Histórico"),
+        'historico': lambda: _selecionar_menu(app, "Histórico de Avaliações"),
+    }
+    medicoes = []
+    for acao in ACOES:
+        if ao_medir:
+            ao_medir(acao)
+        erro = None
+        inicio = time.perf_counter()
+        try:
+            preparos[acao]()
+            app.run()
+            if app.exception:
+                erro = app.exception[0].message
+        except Exception as e:
+            erro = str(e)
+        medicoes.append((acao, time.perf_counter() - inicio, erro))
+        if erro:
+            break  # As próximas ações dependem desta
+    if ao_medir:
+        ao_medir(None)
+    return app, medicoes
+
+
+def esvaziar_fila():
+    """Envia as gravações pendentes na fila local deste processo. Retorna quantas ficaram pendentes."""
+    for _ in range(MAX_PASSADAS_FILA):
+        if not get_pending_entries():
+            return 0
+        flush_queue()
+    return len(get_pending_entries())
+
+
+def medir_chamadas_por_acao(usuario, timeout):
+    """Roda uma sessão isolada (neste processo) e conta as chamadas ao backend fake feitas em cada ação."""
+    backend = fake_google.get_backend()
+    chamadas = {}
+    estado = {'acao': None, 'antes': {}}
+
+    def ao_medir(acao):
+        # O envio em segundo plano da ação anterior entra na contagem dela
+        if esvaziar_fila():
+            print(f"⚠️ Aviso: A fila de sincronização não esvaziou após '{estado['acao']}'; a contagem pode vazar para a próxima ação.")
+        agora = backend.get_call_counts()
+        if estado['acao']:
+            chamadas[estado['acao']] = {
+                metodo: total - estado['antes'].get(metodo, 0)
+                for metodo, total in agora.items() if total - estado['antes'].get(metodo, 0)
+            }
+        estado.update(acao=acao, antes=agora)
+
+    _, medicoes = executar_sessao(usuario, timeout, ao_medir)
+    return chamadas, medicoes
+
+
+def percentil(valores, p):
+    """Percentil pelo método do posto mais próximo (valores não vazios)."""
+    ordenados = sorted(valores)
+    posto = max(1, -(-len(ordenados) * p // 100))
+    return ordenados[int(posto) - 1]
+
+
+def _processo_sessao(indice, usuario, timeout, endereco, chave, largada, resultados):
+    """Corpo de cada processo da rodada concorrente: uma sessão contra o backend servido pelo processo principal."""
+    os.environ[FAKE_BACKEND_ADDRESS_ENV_VAR] = endereco
+    os.environ[FAKE_BACKEND_AUTHKEY_ENV_VAR] = chave
+    # Histórico local e fila de sincronização próprios, como o disco de uma réplica
+    diretorio = os.path.abspath(f"sessao-{indice}")
+    os.makedirs(diretorio, exist_ok=True)
+    os.chdir(diretorio)
+    try:
+        # Aquecimento fora da medição: a tela de login importa o app, como em uma réplica já no ar
+        AppTest.from_file(MAIN_PATH, default_timeout=timeout).run()
+        tracemalloc.start()
+        memoria_base, _ = tracemalloc.get_traced_memory()
+        largada.wait(timeout=timeout)
+        app, medicoes = executar_sessao(usuario, timeout)
+        memoria_atual, memoria_pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # As gravações da sessão chegam ao backend antes de o processo terminar
+        esvaziar_fila()
+        resultados.put((indice, medicoes, memoria_atual - memoria_base, memoria_pico - memoria_base))
+    except Exception as e:
+        resultados.put((indice, [(ACOES[0], 0.0, f"Processo da sessão falhou: {e}")], 0, 0))
+
+
+def executar_carga(sessoes, timeout):
+    """
+    Roda cada sessão em um processo próprio, todas ao mesmo tempo, contra o backend fake deste processo.
+    Retorna (medições, bytes retidos por sessão, pico por sessão, chamadas).
+    """
+    usuarios = preparar_usuarios(sessoes)
+    backend = fake_google.get_backend()
+    endereco, chave = fake_google.serve()
+
+    contexto = multiprocessing.get_context('spawn')
+    # Este processo também espera a largada, para contar as chamadas só a partir dela
+    largada = contexto.Barrier(sessoes + 1)
+    resultados = contexto.Queue()
+    processos = [
+        contexto.Process(target=_processo_sessao, args=(indice, usuario, timeout, endereco, chave, largada, resultados))
+        for indice, usuario in enumerate(usuarios)
+    ]
+    instalado = sys.modules.get('__main__')
+    sys.modules['__main__'] = _MODULO_PRINCIPAL
+    try:
+        for processo in processos:
+            processo.start()
+    finally:
+        sys.modules['__main__'] = instalado
+    try:
+        largada.wait(timeout=60 + timeout)
+    except threading.BrokenBarrierError:
+        print("⚠️ Aviso: Nem todas as sessões chegaram à largada; elas aparecem como erro no relatório.")
+    chamadas_antes = sum(backend.get_call_counts().values())
+
+    coletados = {}
+    # Importar o app em cada processo leva alguns segundos antes da largada
+    prazo = time.monotonic() + 60 + timeout * len(ACOES)
+    while len(coletados) < sessoes and time.monotonic() < prazo:
+        try:
+            indice, medicoes, memoria, pico = resultados.get(timeout=1)
+            coletados[indice] = (medicoes, memoria, pico)
+        except queue.Empty:
+            if not any(processo.is_alive() for processo in processos):
+                break
+    for processo in processos:
+        processo.join(timeout=5)
+        if processo.is_alive():
+            processo.terminate()
+    for indice in range(sessoes):
+        if indice not in coletados:
+            coletados[indice] = ([(ACOES[0], 0.0, "Processo da sessão não respondeu.")], 0, 0)
+
+    medicoes = [medicao for medicoes_sessao, _, _ in coletados.values() for medicao in medicoes_sessao]
+    chamadas = sum(backend.get_call_counts().values()) - chamadas_antes
+    memoria_por_sessao = sum(memoria for _, memoria, _ in coletados.values()) / sessoes
+    pico_por_sessao = sum(pico for _, _, pico in coletados.values()) / sessoes
+    return medicoes, memoria_por_sessao, pico_por_sessao, chamadas
+
+
+def imprimir_relatorio(medicoes, memoria_por_sessao, pico_por_sessao, chamadas_totais, chamadas_por_acao, sessoes):
+    print(f"\n=== Teste de carga: {sessoes} sessões simultâneas (um processo por sessão) ===\n")
+    print(f"{'ação':<10} {'n':>4} {'erros':>6} {'p50 (s)':>9} {'p95 (s)':>9} {'p99 (s)':>9} {'chamadas API':>13}")
+    for acao in ACOES:
+        tempos = [segundos for nome, segundos, erro in medicoes if nome == acao and not erro]
+        erros = sum(1 for nome, _, erro in medicoes if nome == acao and erro)
+        chamadas = sum(chamadas_por_acao.get(acao, {}).values())
+        if tempos:
+            print(f"{acao:<10} {len(tempos):>4} {erros:>6} {percentil(tempos, 50):>9.3f} "
+                  f"{percentil(tempos, 95):>9.3f} {percentil(tempos, 99):>9.3f} {chamadas:>13}")
+        else:
+            print(f"{acao:<10} {0:>4} {erros:>6} {'-':>9} {'-':>9} {'-':>9} {chamadas:>13}")
+
+    print(f"\nMemória retida por sessão: {memoria_por_sessao / 1024 / 1024:.2f} MiB "
+          f"(pico: {pico_por_sessao / 1024 / 1024:.2f} MiB)")
+    if medicoes:
+        print(f"Chamadas às APIs na rodada concorrente: {chamadas_totais} "
+              f"({chamadas_totais / len(medicoes):.1f} por ação)")
+
+    print("\nChamadas por ação (sessão isolada):")
+    for acao in ACOES:
+        detalhes = ", ".join(f"{metodo}={total}" for metodo, total in sorted(chamadas_por_acao.get(acao, {}).items()))
+        print(f"  {acao:<10} {detalhes or '-'}")
+
+    erros = sorted({erro for _, _, erro in medicoes if erro})
+    if erros:
+        print("\nErros encontrados:")
+        for erro in erros[:10]:
+            print(f"  - {erro}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do RQ12BR com sessões simultâneas simuladas.")
+    parser.add_argument('--sessoes', type=int, default=10, help="Número de sessões simultâneas")
+    parser.add_argument('--latencia-ms', type=float, default=50.0, help="Latência simulada de cada chamada às APIs")
+    parser.add_argument('--taxa-erros', type=float, default=0.0, help="Fração de chamadas que falham com 503")
+    parser.add_argument('--cota-por-minuto', type=int, default=0, help="Cota de chamadas por minuto (0 = sem limite)")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Tempo máximo (s) de cada rerun")
+    args = parser.parse_args()
+
+    fake_google.configure(latency_ms=args.latencia_ms, error_rate=args.taxa_erros, requests_per_minute=args.cota_por_minuto)
+
+    usuario_isolado = preparar_usuarios(1)[0]
+    chamadas_por_acao, medicoes_isoladas = medir_chamadas_por_acao(usuario_isolado, args.timeout)
+    falhas = [erro for _, _, erro in medicoes_isoladas if erro]
+    if falhas:
+        print(f"⚠️ Aviso: A sessão isolada falhou ({falhas[0]}); as contagens por ação estão incompletas.")
+
+    medicoes, memoria, pico, chamadas = executar_carga(args.sessoes, args.timeout)
+    imprimir_relatorio(medicoes, memoria, pico, chamadas, chamadas_por_acao, args.sessoes)
+
+
+if __name__ == "__main__":
+    main()